@@ -1,12 +1,37 @@
 import os
 import logging
-from dotenv import load_dotenv
 
-load_dotenv()
+# Module attributes holding the API keys, and their environment variables
+API_KEYS = {
+    "GMAPS_API_KEY": "GMAPS_API_KEY",
+    "TRIP_API_KEY": "TRIP_API_KEY",
+    "LLM_KEY": "OPEN_AI_KEY",
+}
 
-GMAPS_API_KEY = os.getenv("GMAPS_API_KEY")
-TRIP_API_KEY = os.getenv("TRIP_API_KEY")
-LLM_KEY = os.getenv("OPEN_AI_KEY")
 
-# Define log level
-logging.basicConfig(level=logging.INFO)
+def __getattr__(name: str):
+    """
+    Read an API key on first access, so the .env file is only loaded by the modules
+    calling a provider
+    @param name:
+    @return:
+    """
+    if name not in API_KEYS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    value = os.getenv(API_KEYS[name])
+    globals()[name] = value
+
+    return value
+
+
+def setup_logging(level: int = logging.INFO):
+    """
+    Define the log level, to be called by the applications using the library
+    @param level:
+    @return:
+    """
+    logging.basicConfig(level=level)
@@ -1,18 +1,27 @@
-from typing import List
+import logging
+from typing import Dict, List, Tuple
 
-import mrpt
 import numpy as np
-from fastembed import TextEmbedding
 
 from dataclasses import dataclass
 
+from place_index.deduplication.embedding_cache import EmbeddingCache
+from place_index.deduplication.parallel_embedding import ParallelEmbedder
+from place_index.deduplication.reranker import Reranker
+from place_index.deduplication.spatial_index import GridIndex, haversine
+from place_index.deduplication.vector_index import VectorIndex
+from place_index.deduplication.vector_store import VectorStore
 from place_index.generic_places import Restaurant
 
+DEFAULT_MODEL = "BAAI/bge-small-en-v1.5"
+
 
 @dataclass
 class QueryResult:
     match: str
     distance: float
+    # Index of the earlier place of the batch matched, -1 if the match is a stored place
+    batch_match: int = -1
 
     @classmethod
     def from_json(cls, json):
@@ -24,55 +33,613 @@ class VectorDb:
     Class to handle the deduplication of restaurants using a vector database
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        ann_threshold: int = 5000,
+        target_recall: float = 0.95,
+        batch_size: int = 256,
+        model_name: str = DEFAULT_MODEL,
+        cache_path: str | None = None,
+        cache_max_entries: int = 1_000_000,
+        blocking_radius: float | None = 250,
+        store: VectorStore | None = None,
+        workers: int = 0,
+        k: int = 1,
+        reranker: Reranker | None = None,
+        default_country_code: str | None = None,
+    ):
         # Use the default model to perform text embedding
-        self.embedding_memory: List[dict] = []
-        self.embedding_model = TextEmbedding()
+        self.index = VectorIndex(
+            ann_threshold=ann_threshold,
+            target_recall=target_recall,
+            store=store,
+            ann_k=k,
+        )
+        # With k > 1, the k nearest neighbours are re-ranked with the other signals of
+        # the places. The composite score can be lower than the embedding distance, so
+        # the match threshold has to be calibrated with the weights of the reranker
+        self.k = k
+        self.reranker = (
+            (
+                reranker
+                or Reranker(
+                    radius=blocking_radius or 250,
+                    default_country_code=default_country_code,
+                )
+            )
+            if k > 1
+            else None
+        )
+        self.model_name = model_name
+        self._embedding_model = None
+        self.batch_size = batch_size
+        # Embed large batches with a pool of worker processes
+        self.workers = workers
+        self._parallel_embedder: ParallelEmbedder | None = None
+        self.cache = (
+            EmbeddingCache(cache_path, model_name, max_entries=cache_max_entries)
+            if cache_path
+            else None
+        )
+
+        # Only places closer than the blocking radius are compared, places without
+        # coordinates are compared with every place
+        self.blocking_radius = blocking_radius
+        self.spatial_index = GridIndex(cell_size_meters=blocking_radius or 250)
+        # The coordinates of places of a reopened store are unknown
+        self.unlocated_rows: List[int] = list(range(len(self.index)))
+        self.deferred: List[Tuple[Restaurant, str]] = []
+
+    @property
+    def embedding_model(self):
+        """
+        Embedding model, loaded (or downloaded) on the first embedding
+        @return:
+        """
+        if self._embedding_model is None:
+            from fastembed import TextEmbedding
+
+            logging.debug(f"Loading embedding model {self.model_name}")
+            self._embedding_model = TextEmbedding(model_name=self.model_name)
+
+        return self._embedding_model
+
+    @property
+    def parallel_embedder(self) -> ParallelEmbedder | None:
+        """
+        Pool of embedding workers, started on the first large batch
+        @return: None if the places are embedded in the current process
+        """
+        if self._parallel_embedder is None and self.workers > 0:
+            self._parallel_embedder = ParallelEmbedder(
+                self.model_name, self.workers, chunk_size=self.batch_size
+            )
+
+        return self._parallel_embedder
+
+    @staticmethod
+    def embedding_text(restaurant: Restaurant) -> str:
+        return f"{restaurant.name} + {restaurant.contact.address}"
 
     def embed_restaurants(self, restaurant: Restaurant):
+        if self.cache is not None:
+            return self.embed_batch([restaurant])[0]
+
         embedded_vector_place_name = list(
-            self.embedding_model.embed(
-                f"{restaurant.name} + {restaurant.contact.address}"
-            )
+            self.embedding_model.embed(self.embedding_text(restaurant))
         )[0]
 
         return np.array(embedded_vector_place_name).astype(np.float32)
 
-    def add_restaurant(self, restaurant: Restaurant):
+    def embed_batch(self, restaurants: List[Restaurant]) -> np.ndarray:
+        """
+        Embed several restaurants with a single call to the embedding model
+        @param restaurants:
+        @return: matrix with one embedding per row
+        """
+        if not restaurants:
+            return np.empty((0, 0), dtype=np.float32)
+
+        return self.embed_cached(
+            [self.embedding_text(restaurant) for restaurant in restaurants]
+        )
+
+    def embed_cached(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed several texts, through the embedding cache if there is one
+        @param texts:
+        @return: matrix with one embedding per row
+        """
+        if self.cache is None:
+            return self.embed_texts(texts)
+
+        vectors, missing = self.cache.get_many(texts)
+        if not missing:
+            return vectors
+
+        missing_texts = [texts[idx] for idx in missing]
+        missing_vectors = self.embed_texts(missing_texts)
+        self.cache.put_many(missing_texts, missing_vectors)
+
+        if len(missing) == len(texts):
+            return missing_vectors
+
+        vectors[missing] = missing_vectors
+        return vectors
+
+    def flush(self):
+        """
+        Persist the embedding cache and the vector store, if they are backed by files
+        @return:
+        """
+        self.embed_deferred()
+
+        if self.index.store.path is not None:
+            self.index.store.flush()
+
+        if self.cache is not None:
+            self.cache.flush()
+            logging.debug(
+                f"Embedding cache: {self.cache.hits} hits, {self.cache.misses} misses"
+            )
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed several texts with a single call to the embedding model
+        @param texts:
+        @return: matrix with one embedding per row
+        """
+        if self.workers > 0 and len(texts) > self.batch_size:
+            return self.parallel_embedder.embed(texts)
+
+        embedded_vectors = self.embedding_model.embed(texts, batch_size=self.batch_size)
+
+        return np.array(list(embedded_vectors)).astype(np.float32)
+
+    def add_restaurant(
+        self,
+        restaurant: Restaurant,
+        vector: np.ndarray = None,
+        defer: bool = False,
+        key: str | None = None,
+    ):
         """
         Add a place_index to the vector db
         @param restaurant:
+        @param vector: embedding of the restaurant, computed if not provided
+        @param defer: postpone the embedding until the next search, to embed places in batches
+        @param key: key of the place in the merger, its name by default
         @return:
         """
-        self.embedding_memory.append(
-            {
-                "embedded_vector": self.embed_restaurants(restaurant),
-                "place_index": restaurant.name,
-            }
+        key = restaurant.name if key is None else key
+        if vector is None and defer:
+            self.deferred.append((restaurant, key))
+            return
+
+        if vector is None:
+            vector = self.embed_restaurants(restaurant)
+
+        self._add_vectors([(restaurant, key)], np.asarray(vector).reshape(1, -1))
+
+    def embed_deferred(self, restaurants: List[Restaurant] | None = None) -> np.ndarray:
+        """
+        Embed and add the deferred places, along with other places in the same model call
+        @param restaurants: places to embed with the deferred ones
+        @return: embeddings of `restaurants`
+        """
+        restaurants = restaurants or []
+        if not self.deferred:
+            return self.embed_batch(restaurants)
+
+        deferred, self.deferred = self.deferred, []
+        everything = [restaurant for restaurant, _ in deferred] + restaurants
+        if (
+            self.workers > 0
+            and self.cache is None
+            and len(everything) > self.batch_size
+        ):
+            # The deferred places are inserted straight from the shared memory matrix
+            texts = [self.embedding_text(restaurant) for restaurant in everything]
+            with self.parallel_embedder.shared_embeddings(texts) as vectors:
+                self._add_vectors(deferred, vectors[: len(deferred)])
+                return vectors[len(deferred) :].copy()
+
+        vectors = self.embed_batch(everything)
+        self._add_vectors(deferred, vectors[: len(deferred)])
+
+        return vectors[len(deferred) :]
+
+    def _add_vectors(
+        self, restaurants: List[Tuple[Restaurant, str]], vectors: np.ndarray
+    ):
+        rows = self.index.add_batch(vectors, [key for _, key in restaurants])
+
+        for row, (restaurant, key) in zip(rows.tolist(), restaurants):
+            self._index_row(row, restaurant, key)
+
+    def _index_row(self, row: int, restaurant: Restaurant, key: str):
+        """
+        Index the coordinates and re-ranking signals of a stored place
+        @param row: row of the place in the vector index
+        @param restaurant:
+        @param key: key of the place in the merger
+        @return:
+        """
+        if self.blocking_radius is not None and restaurant.has_location():
+            self.spatial_index.add(row, restaurant.latitude, restaurant.longitude)
+        else:
+            self.unlocated_rows.append(row)
+
+        if self.reranker is not None:
+            self.reranker.add(row, restaurant, key)
+
+    def restore_restaurants(self, restaurants: Dict[str, Restaurant]):
+        """
+        Rebuild the spatial index and re-ranking signals of a reopened store
+        @param restaurants: stored places, by key, every stored vector must have one
+        @return:
+        """
+        self.spatial_index = GridIndex(cell_size_meters=self.blocking_radius or 250)
+        self.unlocated_rows = []
+        if self.reranker is not None:
+            self.reranker = self.reranker.empty()
+
+        missing = [key for key in self.index.keys if key not in restaurants]
+        if missing:
+            raise ValueError(
+                f"{len(missing)} stored vectors have no place (ex: {missing[0]}), "
+                f"the vector store does not belong to these places"
+            )
+
+        for row, key in enumerate(self.index.keys):
+            self._index_row(row, restaurants[key], key)
+
+    def update_restaurant(self, key: str, restaurant: Restaurant):
+        """
+        Refresh the re-ranking signals of a stored place, after a merge
+        @param key:
+        @param restaurant:
+        @return:
+        """
+        if self.reranker is not None:
+            self.reranker.update(key, restaurant)
+
+    def close(self):
+        """
+        Stop the embedding workers, if any
+        @return:
+        """
+        if self._parallel_embedder is not None:
+            self._parallel_embedder.close()
+            self._parallel_embedder = None
+
+    def search(self, restaurant: Restaurant, vector: np.ndarray) -> Tuple[int, float]:
+        """
+        Get the best stored place, among the places nearby if the place is located.
+        Without reranker, this is the nearest place. Otherwise the k nearest places are
+        re-ranked and the distance is the composite score of the best one.
+        @param restaurant:
+        @param vector: embedding of the restaurant
+        @return: row and distance of the best place, (-1, inf) if there is no candidate
+        """
+        if self.blocking_radius is None or not restaurant.has_location():
+            if self.reranker is None:
+                return self.index.search(vector)
+            rows, distances = self.index.search_batch_k(vector, self.k)
+            return self.reranker.rerank(restaurant, rows[0], distances[0])
+
+        nearby_rows, _ = self.spatial_index.within_radius(
+            restaurant.latitude, restaurant.longitude, self.blocking_radius
+        )
+        candidates = np.concatenate(
+            [nearby_rows, np.array(self.unlocated_rows, dtype=np.int64)]
         )
 
+        if self.reranker is None:
+            return self.index.search_among(vector, candidates)
+
+        rows, distances = self.index.search_among_k(vector, candidates, self.k)
+        return self.reranker.rerank(restaurant, rows, distances)
+
+    def rerank_batch(
+        self, restaurants: List[Restaurant], rows: np.ndarray, distances: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Re-rank the k nearest places of a batch of places
+        @param restaurants:
+        @param rows: k rows per place, -1 for missing candidates
+        @param distances: k embedding distances per place
+        @return: best row and composite score per place
+        """
+        best_rows = np.full(len(restaurants), -1, dtype=np.int64)
+        best_scores = np.full(len(restaurants), np.inf, dtype=np.float32)
+        for idx, restaurant in enumerate(restaurants):
+            best_rows[idx], best_scores[idx] = self.reranker.rerank(
+                restaurant, rows[idx], distances[idx]
+            )
+
+        return best_rows, best_scores
+
+    def search_batch(
+        self, restaurants: List[Restaurant], vectors: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the best stored place of a batch of places, over the whole index
+        @param restaurants:
+        @param vectors: embeddings of the places
+        @return: best row and distance per place
+        """
+        if self.reranker is None:
+            return self.index.search_batch(vectors)
+
+        rows, distances = self.index.search_batch_k(vectors, self.k)
+        return self.rerank_batch(restaurants, rows, distances)
+
     def get_restaurant(self, restaurant: Restaurant) -> QueryResult:
         """
         Get a place_index from the vector db
         @param restaurant:
         @return:
         """
-        if len(self.embedding_memory) == 0:
+        vector = self.embed_deferred([restaurant])[0] if self.deferred else None
+        if len(self.index) == 0:
             return QueryResult("", 1)
 
-        embedded_vector_place_name = self.embed_restaurants(restaurant)
-        embedded_vectors = [
-            self.embedding_memory[i]["embedded_vector"]
-            for i in range(len(self.embedding_memory))
-        ]
-        index = mrpt.MRPTIndex(np.array(embedded_vectors).astype(np.float32))
-        indexes, distances = index.exact_search(
-            embedded_vector_place_name, 1, return_distances=True
-        )
+        if vector is None:
+            vector = self.embed_restaurants(restaurant)
+
+        row, distance = self.search(restaurant, vector)
+        if row < 0:
+            return QueryResult("", 1)
 
         return QueryResult.from_json(
             {
-                "match": self.embedding_memory[indexes[0]]["place_index"],
-                "distance": distances[0].astype(float),
+                "match": self.index.keys[row],
+                "distance": distance,
             }
         )
+
+    @staticmethod
+    def nearest_previous(
+        vectors: np.ndarray,
+        chunk_size: int = 1024,
+        coordinates: np.ndarray | None = None,
+        radius: float | None = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        For each row, get the nearest row among the previous ones
+        @param vectors:
+        @param chunk_size: number of rows per distance matrix, bounds the memory used
+        @param coordinates: latitude and longitude of each row, nan when unknown
+        @param radius: rows further than this radius (in meters) are not candidates
+        @return: rows and euclidean distances, -1 and inf for the first row
+        """
+        rows = np.full(len(vectors), -1, dtype=np.int64)
+        distances = np.full(len(vectors), np.inf, dtype=np.float32)
+        norms = np.einsum("ij,ij->i", vectors, vectors)
+
+        for chunk_start in range(1, len(vectors), chunk_size):
+            chunk_end = min(chunk_start + chunk_size, len(vectors))
+            chunk = vectors[chunk_start:chunk_end]
+            previous = vectors[:chunk_end]
+
+            squared = (
+                norms[np.newaxis, :chunk_end]
+                - 2 * chunk @ previous.T
+                + norms[chunk_start:chunk_end, np.newaxis]
+            )
+            # Only rows inserted before the current one are candidates
+            squared[
+                np.arange(chunk_end - chunk_start)[:, np.newaxis] + chunk_start
+                <= np.arange(chunk_end)[np.newaxis, :]
+            ] = np.inf
+
+            if coordinates is not None and radius is not None:
+                geo_distances = haversine(
+                    coordinates[chunk_start:chunk_end, 0, np.newaxis],
+                    coordinates[chunk_start:chunk_end, 1, np.newaxis],
+                    coordinates[np.newaxis, :chunk_end, 0],
+                    coordinates[np.newaxis, :chunk_end, 1],
+                )
+                # Unknown coordinates give nan distances, which are kept as candidates
+                squared[geo_distances > radius] = np.inf
+
+            best = np.argmin(squared, axis=1)
+            best_distances = squared[np.arange(len(chunk)), best]
+            rows[chunk_start:chunk_end] = np.where(np.isinf(best_distances), -1, best)
+            distances[chunk_start:chunk_end] = np.sqrt(np.maximum(best_distances, 0))
+
+        return rows, distances
+
+    @staticmethod
+    def coordinates(restaurants: List[Restaurant]) -> np.ndarray:
+        """
+        Get the coordinates of places
+        @param restaurants:
+        @return: latitude and longitude of each place, nan when unknown
+        """
+        return np.array(
+            [
+                (
+                    (restaurant.latitude, restaurant.longitude)
+                    if restaurant.has_location()
+                    else (np.nan, np.nan)
+                )
+                for restaurant in restaurants
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+
+    def search_index(
+        self, restaurants: List[Restaurant], vectors: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the best stored place of each place of a batch, with blocking
+        @param restaurants:
+        @param vectors: embeddings of the places
+        @return: best row and distance per place, -1 and inf when there is no candidate
+        """
+        if self.blocking_radius is None:
+            return self.search_batch(restaurants, vectors)
+
+        index_rows = np.full(len(restaurants), -1, dtype=np.int64)
+        index_distances = np.full(len(restaurants), np.inf, dtype=np.float32)
+        coordinates = self.coordinates(restaurants)
+
+        unlocated = np.flatnonzero(np.isnan(coordinates[:, 0]))
+        if len(unlocated) > 0:
+            index_rows[unlocated], index_distances[unlocated] = self.search_batch(
+                [restaurants[idx] for idx in unlocated.tolist()], vectors[unlocated]
+            )
+
+        # Located places only have a handful of candidates nearby
+        for idx in np.flatnonzero(~np.isnan(coordinates[:, 0])).tolist():
+            index_rows[idx], index_distances[idx] = self.search(
+                restaurants[idx], vectors[idx]
+            )
+
+        return index_rows, index_distances
+
+    def batch_reranker(self, restaurants: List[Restaurant]) -> Reranker | None:
+        """
+        Get a reranker holding the signals of the places of a batch, by index in the batch
+        @param restaurants:
+        @return: None if the places are not re-ranked
+        """
+        if self.reranker is None:
+            return None
+
+        reranker = self.reranker.empty()
+        for row, restaurant in enumerate(restaurants):
+            reranker.add(row, restaurant, str(row))
+
+        return reranker
+
+    def batch_edges(
+        self, restaurants: List[Restaurant], vectors: np.ndarray, match_threshold: float
+    ) -> Dict[Tuple[int, int], float]:
+        """
+        Get the candidate matches between the places of a batch: each place is compared
+        with its k nearest places of the batch (nearby, if blocking is enabled), and the
+        pairs scoring under the threshold are kept
+        @param restaurants:
+        @param vectors: embeddings of the places
+        @param match_threshold: distance (or composite score) under which two places match
+        @return: score of each pair of matching places, by (lowest, highest) index
+        """
+        edges: Dict[Tuple[int, int], float] = {}
+        if len(restaurants) < 2:
+            return edges
+
+        # The batch is indexed on its own, a place being its own nearest neighbour
+        k = self.k + 1
+        batch_index = VectorIndex(
+            ann_threshold=self.index.ann_threshold,
+            target_recall=self.index.target_recall,
+            ann_k=k,
+        )
+        batch_index.add_batch(vectors, [str(idx) for idx in range(len(restaurants))])
+        reranker = self.batch_reranker(restaurants)
+
+        rows = np.full((len(restaurants), k), -1, dtype=np.int64)
+        distances = np.full((len(restaurants), k), np.inf, dtype=np.float32)
+        coordinates = self.coordinates(restaurants)
+        located = ~np.isnan(coordinates[:, 0])
+        if self.blocking_radius is None:
+            located[:] = False
+
+        unlocated = np.flatnonzero(~located)
+        if len(unlocated) > 0:
+            rows[unlocated], distances[unlocated] = batch_index.search_batch_k(
+                vectors[unlocated], k
+            )
+
+        if located.any():
+            spatial_index = GridIndex(cell_size_meters=self.blocking_radius)
+            for idx in np.flatnonzero(located).tolist():
+                spatial_index.add(idx, coordinates[idx, 0], coordinates[idx, 1])
+
+            for idx in np.flatnonzero(located).tolist():
+                nearby_rows, _ = spatial_index.within_radius(
+                    coordinates[idx, 0], coordinates[idx, 1], self.blocking_radius
+                )
+                candidates = np.concatenate([nearby_rows, unlocated])
+                found_rows, found_distances = batch_index.search_among_k(
+                    vectors[idx], candidates, k
+                )
+                rows[idx, : len(found_rows)] = found_rows
+                distances[idx, : len(found_rows)] = found_distances
+
+        for idx, restaurant in enumerate(restaurants):
+            valid = (rows[idx] >= 0) & (rows[idx] != idx)
+            candidate_rows = rows[idx][valid]
+            scores = distances[idx][valid].astype(np.float64)
+            if reranker is not None and len(candidate_rows) > 0:
+                scores = reranker.scores(restaurant, candidate_rows, scores)
+
+            for row, score in zip(candidate_rows.tolist(), scores.tolist()):
+                if score < match_threshold:
+                    edge = (min(idx, row), max(idx, row))
+                    edges[edge] = min(edges.get(edge, score), score)
+
+        return edges
+
+    def get_restaurants(
+        self, restaurants: List[Restaurant], match_threshold: float
+    ) -> Tuple[List[QueryResult], np.ndarray]:
+        """
+        Resolve the matches of a batch of restaurants, against the vector db and against
+        the restaurants of the batch inserted before them.
+        A restaurant matching an earlier restaurant of the batch gets the match of that
+        restaurant, or the index of that restaurant in the batch (`batch_match`) if it was
+        not matched itself, as its key is only known once it is inserted.
+        Candidates of the batch are re-ranked as the stored ones, so that both are
+        compared on the same scale.
+        @param restaurants:
+        @param match_threshold: distance under which two restaurants are the same place
+        @return: one query result per restaurant and the embeddings of the batch
+        """
+        vectors = self.embed_deferred(restaurants)
+        if len(restaurants) == 0:
+            return [], vectors
+
+        index_rows, index_distances = self.search_index(restaurants, vectors)
+        coordinates = (
+            None if self.blocking_radius is None else self.coordinates(restaurants)
+        )
+
+        batch_rows, batch_distances = self.nearest_previous(
+            vectors, coordinates=coordinates, radius=self.blocking_radius
+        )
+        # Earlier places of the batch are scored as the stored places they compete with
+        reranker = self.batch_reranker(restaurants)
+        batch_scores = batch_distances.astype(np.float64)
+        if reranker is not None:
+            for idx in np.flatnonzero(batch_rows >= 0).tolist():
+                batch_scores[idx] = reranker.scores(
+                    restaurants[idx], batch_rows[idx : idx + 1], batch_distances[idx]
+                )[0]
+
+        results: List[QueryResult] = []
+        for idx, restaurant in enumerate(restaurants):
+            result = QueryResult("", 1)
+            if index_rows[idx] >= 0:
+                result = QueryResult(
+                    self.index.keys[index_rows[idx]], float(index_distances[idx])
+                )
+
+            previous = batch_rows[idx]
+            if previous >= 0 and batch_scores[idx] < result.distance:
+                previous_result = results[previous]
+                if previous_result.distance < match_threshold:
+                    result = QueryResult(
+                        previous_result.match,
+                        float(batch_scores[idx]),
+                        previous_result.batch_match,
+                    )
+                else:
+                    result = QueryResult("", float(batch_scores[idx]), previous)
+
+            results.append(result)
+
+        return results, vectors
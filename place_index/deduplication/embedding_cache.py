@@ -0,0 +1,255 @@
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+from unidecode import unidecode
+
+KEY_SIZE = 16
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a text before hashing it: transliterate to ascii, fold case and whitespaces
+    @param text:
+    @return:
+    """
+    return re.sub(r"\s+", " ", unidecode(text).lower()).strip()
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of text embeddings.
+
+    Entries are keyed by a hash of the normalized text and the model id. Vectors are
+    stored in a memory-mapped float32 file, the keys and their last access in a compact
+    index file. When `max_entries` is reached, the least recently used entries are evicted.
+    """
+
+    VECTORS_FILE = "embeddings.f32"
+    INDEX_FILE = "index.npz"
+
+    def __init__(
+        self,
+        path: str,
+        model_id: str,
+        max_entries: int = 1_000_000,
+        eviction_ratio: float = 0.1,
+    ):
+        self.path = path
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.eviction_ratio = eviction_ratio
+        self.hits = 0
+        self.misses = 0
+
+        self.dim = 0
+        self._slots: Dict[bytes, int] = {}
+        self._slot_keys: List[bytes | None] = []
+        self._free_slots: List[int] = []
+        self._last_used = np.zeros(0, dtype=np.uint64)
+        self._clock = 0
+        self._vectors: np.memmap | None = None
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, text: str):
+        return self.key(text) in self._slots
+
+    def key(self, text: str) -> bytes:
+        """
+        Get the cache key of a text
+        @param text:
+        @return:
+        """
+        return hashlib.blake2b(
+            f"{self.model_id}\0{normalize_text(text)}".encode(), digest_size=KEY_SIZE
+        ).digest()
+
+    def _load(self):
+        """
+        Load the key index and map the vector file, if a cache already exists on disk
+        @return:
+        """
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+
+        with np.load(index_path) as index:
+            self.dim = int(index["dim"])
+            keys = index["keys"]
+            last_used = index["last_used"]
+
+        capacity = len(keys)
+        self._open_vectors(capacity)
+        self._last_used = last_used.astype(np.uint64)
+        self._clock = int(last_used.max(initial=0))
+
+        empty_key = bytes(KEY_SIZE)
+        for slot, key in enumerate(keys):
+            key = key.tobytes()
+            if key == empty_key:
+                self._slot_keys.append(None)
+                self._free_slots.append(slot)
+            else:
+                self._slot_keys.append(key)
+                self._slots[key] = slot
+
+        logging.debug(f"Loaded {len(self._slots)} cached embeddings from {self.path}")
+
+    def _open_vectors(self, capacity: int):
+        """
+        Map the vector file, growing it to `capacity` rows if needed
+        @param capacity:
+        @return:
+        """
+        vectors_path = os.path.join(self.path, self.VECTORS_FILE)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+
+        with open(vectors_path, "ab") as vectors_file:
+            vectors_file.truncate(
+                max(capacity * self.dim * 4, os.path.getsize(vectors_path))
+            )
+
+        self._vectors = np.memmap(
+            vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def _grow(self, needed: int):
+        """
+        Make room for `needed` new entries, by growing the files or evicting entries
+        @param needed:
+        @return:
+        """
+        if len(self._free_slots) >= needed:
+            return
+
+        capacity = len(self._slot_keys)
+        if capacity < self.max_entries:
+            new_capacity = min(
+                max(capacity * 2, capacity + needed, 1024), self.max_entries
+            )
+            self._open_vectors(new_capacity)
+            self._last_used = np.concatenate(
+                [self._last_used, np.zeros(new_capacity - capacity, dtype=np.uint64)]
+            )
+            self._slot_keys.extend([None] * (new_capacity - capacity))
+            self._free_slots.extend(range(new_capacity - 1, capacity - 1, -1))
+
+        if len(self._free_slots) < needed:
+            self._evict(needed - len(self._free_slots))
+
+    def _evict(self, needed: int):
+        """
+        Evict the least recently used entries, at least `needed` of them
+        @param needed:
+        @return:
+        """
+        used_slots = np.array(list(self._slots.values()))
+        # Entries touched by the current operation are never evicted
+        used_slots = used_slots[self._last_used[used_slots] < self._clock]
+        to_evict = min(
+            max(needed, int(self.max_entries * self.eviction_ratio)), len(used_slots)
+        )
+        oldest = used_slots[
+            np.argpartition(self._last_used[used_slots], to_evict - 1)[:to_evict]
+        ]
+
+        for slot in oldest.tolist():
+            del self._slots[self._slot_keys[slot]]
+            self._slot_keys[slot] = None
+            self._free_slots.append(slot)
+
+        logging.debug(f"Evicted {len(oldest)} embeddings from the cache")
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Get the cached embeddings of several texts
+        @param texts:
+        @return: matrix of embeddings (rows of missing texts are left empty) and indexes of missing texts
+        """
+        self._clock += 1
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        missing = []
+
+        for idx, text in enumerate(texts):
+            slot = self._slots.get(self.key(text))
+            if slot is None:
+                missing.append(idx)
+                continue
+
+            vectors[idx] = self._vectors[slot]
+            self._last_used[slot] = self._clock
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        return vectors, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """
+        Store the embeddings of several texts
+        @param texts:
+        @param vectors:
+        @return:
+        """
+        if len(texts) == 0:
+            return
+
+        if self.dim == 0:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dimension mismatch: expected {self.dim}, got {vectors.shape[1]}"
+            )
+
+        # A batch larger than the cache only keeps its last entries
+        texts = texts[-self.max_entries :]
+        vectors = vectors[-self.max_entries :]
+        keys = [self.key(text) for text in texts]
+
+        # Refresh the entries already cached so the eviction keeps them
+        self._clock += 1
+        for key in keys:
+            if key in self._slots:
+                self._last_used[self._slots[key]] = self._clock
+
+        self._grow(len({key for key in keys if key not in self._slots}))
+
+        for key, vector in zip(keys, vectors):
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._free_slots.pop()
+                self._slots[key] = slot
+                self._slot_keys[slot] = key
+
+            self._vectors[slot] = vector
+            self._last_used[slot] = self._clock
+
+    def flush(self):
+        """
+        Write the cache to the disk
+        @return:
+        """
+        if self._vectors is None:
+            return
+
+        self._vectors.flush()
+        empty_key = bytes(KEY_SIZE)
+        keys = np.frombuffer(
+            b"".join(key or empty_key for key in self._slot_keys), dtype=f"V{KEY_SIZE}"
+        )
+
+        # Write to a temporary file first so a crash never leaves a truncated index
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        temporary_path = index_path + ".tmp.npz"
+        np.savez(temporary_path, dim=self.dim, keys=keys, last_used=self._last_used)
+        os.replace(temporary_path, index_path)
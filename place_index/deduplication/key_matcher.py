@@ -0,0 +1,180 @@
+import re
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+from urllib.parse import urlparse
+
+from place_index.deduplication.spatial_index import haversine
+from place_index.generic_places import Restaurant
+
+# Second level domains under which the registrable domain has three labels
+COMPOUND_SUFFIXES = {
+    "co.uk",
+    "org.uk",
+    "ac.uk",
+    "com.au",
+    "net.au",
+    "co.jp",
+    "co.nz",
+    "com.br",
+    "com.mx",
+    "com.tr",
+    "co.za",
+    "com.cn",
+}
+
+# Websites shared by many unrelated places, useless to identify a place
+GENERIC_DOMAINS = {
+    "facebook.com",
+    "instagram.com",
+    "google.com",
+    "tripadvisor.com",
+    "thefork.com",
+    "ubereats.com",
+    "deliveroo.com",
+    "linktr.ee",
+}
+
+
+def normalize_phone(phone: str, default_country_code: str | None = None) -> str | None:
+    """
+    Normalize a phone number to the E.164 format (+<country code><number>)
+    @param phone:
+    @param default_country_code: country code of national numbers (ex: "33"), they are ignored if None
+    @return: the normalized number, None if it cannot be normalized
+    """
+    if not phone:
+        return None
+
+    digits = re.sub(r"\D", "", phone)
+    stripped = phone.strip()
+
+    if stripped.startswith("+"):
+        normalized = digits
+    elif digits.startswith("00"):
+        normalized = digits[2:]
+    elif default_country_code is not None:
+        normalized = default_country_code + digits.lstrip("0")
+    else:
+        return None
+
+    # E.164 numbers have at most 15 digits, very short ones are not real phone numbers
+    if not 8 <= len(normalized) <= 15:
+        return None
+
+    return "+" + normalized
+
+
+def registrable_domain(url: str) -> str | None:
+    """
+    Get the registrable domain of a website (ex: https://www.paris.example.co.uk/menu -> example.co.uk)
+    @param url:
+    @return: the domain, None if the url has no host
+    """
+    if not url:
+        return None
+
+    host = urlparse(url if "//" in url else f"//{url}").hostname
+    if not host:
+        return None
+
+    labels = host.lower().rstrip(".").split(".")
+    if len(labels) < 2:
+        return None
+
+    size = 3 if ".".join(labels[-2:]) in COMPOUND_SUFFIXES else 2
+    return ".".join(labels[-size:])
+
+
+class KeyMatcher:
+    """
+    Exact matching of places on deterministic keys: normalized phone number,
+    website domain and provider URIs.
+
+    Provider URIs identify a single place. Phone numbers and domains can be shared by
+    the branches of a chain, so a hit on them is only accepted when the key belongs to a
+    single place and both places are less than `max_distance` meters apart (when located).
+    """
+
+    def __init__(
+        self, default_country_code: str | None = None, max_distance: float = 250
+    ):
+        self.default_country_code = default_country_code
+        self.max_distance = max_distance
+        self.uris: Dict[str, str] = {}
+        self.phones: Dict[str, Set[str]] = defaultdict(set)
+        self.domains: Dict[str, Set[str]] = defaultdict(set)
+        self.locations: Dict[str, Tuple[float, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def keys(self, restaurant: Restaurant) -> Tuple[List[str], str | None, str | None]:
+        """
+        Get the keys of a place
+        @param restaurant:
+        @return: provider URIs, normalized phone and website domain
+        """
+        uris = [
+            uri
+            for uri in (
+                restaurant.contact.gmaps_uri,
+                restaurant.contact.tripadvisor_uri,
+            )
+            if uri
+        ]
+        phone = normalize_phone(restaurant.contact.phone, self.default_country_code)
+        domain = registrable_domain(restaurant.contact.website)
+        if domain in GENERIC_DOMAINS:
+            domain = None
+
+        return uris, phone, domain
+
+    def add(self, restaurant: Restaurant, key: str):
+        """
+        Register the keys of a place (after an insert or a merge)
+        @param restaurant:
+        @param key: key of the place in the merger
+        @return:
+        """
+        uris, phone, domain = self.keys(restaurant)
+        for uri in uris:
+            self.uris[uri] = key
+        if phone:
+            self.phones[phone].add(key)
+        if domain:
+            self.domains[domain].add(key)
+        if restaurant.has_location():
+            self.locations[key] = (restaurant.latitude, restaurant.longitude)
+
+    def _is_nearby(self, restaurant: Restaurant, key: str) -> bool:
+        if not restaurant.has_location() or key not in self.locations:
+            return True
+
+        latitude, longitude = self.locations[key]
+        return (
+            haversine(restaurant.latitude, restaurant.longitude, latitude, longitude)
+            <= self.max_distance
+        )
+
+    def match(self, restaurant: Restaurant) -> str | None:
+        """
+        Get the place sharing a deterministic key with a place
+        @param restaurant:
+        @return: key of the matched place, None if there is no exact match
+        """
+        uris, phone, domain = self.keys(restaurant)
+
+        for uri in uris:
+            if uri in self.uris:
+                self.hits += 1
+                return self.uris[uri]
+
+        for value, index in ((phone, self.phones), (domain, self.domains)):
+            matches = index.get(value, set()) if value else set()
+            if len(matches) == 1:
+                (key,) = matches
+                if self._is_nearby(restaurant, key):
+                    self.hits += 1
+                    return key
+
+        self.misses += 1
+        return None
@@ -0,0 +1,154 @@
+import logging
+import multiprocessing
+import os
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Callable, Iterator, List
+
+import numpy as np
+
+# Model of the current worker process, loaded once by the pool initializer
+_worker_model = None
+
+
+def load_model(model_name: str, threads: int):
+    """
+    Load the fastembed model of a worker
+    @param model_name:
+    @param threads: number of ONNX runtime threads of the worker
+    @return:
+    """
+    from fastembed import TextEmbedding
+
+    return TextEmbedding(model_name=model_name, threads=threads)
+
+
+def _init_worker(model_loader: Callable, model_name: str, threads: int):
+    global _worker_model
+    _worker_model = model_loader(model_name, threads)
+
+
+def _embedding_dim() -> int:
+    return len(next(iter(_worker_model.embed(["dimension probe"]))))
+
+
+def _embed_chunk(
+    memory_name: str, shape: tuple, start: int, texts: List[str], batch_size: int
+) -> int:
+    """
+    Embed a chunk of texts and write the vectors to their rows of the shared matrix
+    @param memory_name: name of the shared memory block holding the matrix
+    @param shape: shape of the whole matrix
+    @param start: first row of the chunk
+    @param texts:
+    @param batch_size:
+    @return: number of embedded texts
+    """
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        matrix = np.ndarray(shape, dtype=np.float32, buffer=memory.buf)
+        for offset, vector in enumerate(
+            _worker_model.embed(texts, batch_size=batch_size)
+        ):
+            matrix[start + offset] = vector
+        del matrix
+    finally:
+        memory.close()
+
+    return len(texts)
+
+
+class ParallelEmbedder:
+    """
+    Embed texts with a pool of worker processes, each holding its own model.
+
+    Texts are split in chunks embedded by the workers, which write the vectors straight
+    into a shared memory matrix: vectors are never pickled back to the main process.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: int | None = None,
+        chunk_size: int = 256,
+        threads_per_worker: int = 1,
+        model_loader: Callable = load_model,
+    ):
+        """
+        @param model_name:
+        @param workers: number of worker processes, one per cpu by default
+        @param chunk_size: number of texts embedded per task
+        @param threads_per_worker:
+        @param model_loader: module-level function loading the model of a worker from
+        its name and number of threads, it is pickled to the spawned workers
+        """
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+
+        # Spawned workers do not inherit the ONNX runtime threads of the main process
+        context = multiprocessing.get_context("spawn")
+        self.pool = context.Pool(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(model_loader, model_name, threads_per_worker),
+        )
+        self.dim = self.pool.apply(_embedding_dim)
+
+        logging.info(f"Started {self.workers} embedding workers for {model_name}")
+
+    @contextmanager
+    def shared_embeddings(self, texts: List[str]) -> Iterator[np.ndarray]:
+        """
+        Embed texts in parallel, the matrix is backed by shared memory and only valid
+        inside the context, so it can be consumed without any copy
+        @param texts:
+        @return: matrix with one embedding per row
+        """
+        shape = (len(texts), self.dim)
+        memory = shared_memory.SharedMemory(
+            create=True, size=max(len(texts) * self.dim * 4, 1)
+        )
+        try:
+            jobs = [
+                self.pool.apply_async(
+                    _embed_chunk,
+                    (
+                        memory.name,
+                        shape,
+                        start,
+                        texts[start : start + self.chunk_size],
+                        self.chunk_size,
+                    ),
+                )
+                for start in range(0, len(texts), self.chunk_size)
+            ]
+            for job in jobs:
+                job.get()
+
+            matrix = np.ndarray(shape, dtype=np.float32, buffer=memory.buf)
+            try:
+                yield matrix
+            finally:
+                # The shared memory cannot be closed while a view on it exists
+                del matrix
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts in parallel
+        @param texts:
+        @return: matrix with one embedding per row
+        """
+        with self.shared_embeddings(texts) as matrix:
+            return matrix.copy()
+
+    def close(self):
+        """
+        Stop the worker processes
+        @return:
+        """
+        self.pool.close()
+        self.pool.join()
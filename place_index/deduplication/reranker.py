@@ -0,0 +1,197 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from place_index.deduplication.key_matcher import normalize_phone, registrable_domain
+from place_index.deduplication.spatial_index import haversine
+from place_index.generic_places import Restaurant
+
+
+@dataclass
+class RerankWeights:
+    """
+    Weights of the signals of the composite score, on the scale of the embedding distance
+    """
+
+    embedding: float = 1.0
+    geo: float = 0.1
+    phone: float = 0.15
+    website: float = 0.1
+    types: float = 0.05
+
+
+class Reranker:
+    """
+    Re-rank the nearest neighbours of a place with several signals.
+
+    The signals of every stored place are kept column-wise, by row of the vector index.
+    The composite score is a distance: the weighted embedding distance, plus the
+    normalized geographic distance, minus the phone, website and type agreements.
+    """
+
+    def __init__(
+        self,
+        weights: RerankWeights | None = None,
+        radius: float = 250,
+        default_country_code: str | None = None,
+    ):
+        self.weights = weights or RerankWeights()
+        self.radius = radius
+        # Country code of national phone numbers, as for the key matcher
+        self.default_country_code = default_country_code
+
+        self.latitudes: List[float] = []
+        self.longitudes: List[float] = []
+        self.phones: List[str | None] = []
+        self.domains: List[str | None] = []
+        self.types: List[frozenset] = []
+        self.rows_by_key: Dict[str, int] = {}
+
+    def empty(self) -> "Reranker":
+        """
+        Get a reranker with the same settings, without any stored place
+        @return:
+        """
+        return Reranker(self.weights, self.radius, self.default_country_code)
+
+    def signals(
+        self, restaurant: Restaurant
+    ) -> Tuple[float, float, str, str, frozenset]:
+        """
+        Extract the signals of a place
+        @param restaurant:
+        @return: latitude, longitude, normalized phone, website domain and types
+        """
+        return (
+            restaurant.latitude if restaurant.latitude is not None else np.nan,
+            restaurant.longitude if restaurant.longitude is not None else np.nan,
+            normalize_phone(restaurant.contact.phone, self.default_country_code),
+            registrable_domain(restaurant.contact.website),
+            frozenset(str(place_type).lower() for place_type in restaurant.types),
+        )
+
+    def add(self, row: int, restaurant: Restaurant, key: str):
+        """
+        Store the signals of a place, rows must be added in order
+        @param row: row of the place in the vector index
+        @param restaurant:
+        @param key: key of the place in the merger (names are not unique)
+        @return:
+        """
+        # Rows stored before the reranker was created (ex: reopened store) have no signal
+        while len(self.phones) < row:
+            self.latitudes.append(np.nan)
+            self.longitudes.append(np.nan)
+            self.phones.append(None)
+            self.domains.append(None)
+            self.types.append(frozenset())
+
+        latitude, longitude, phone, domain, types = self.signals(restaurant)
+        self.latitudes.append(latitude)
+        self.longitudes.append(longitude)
+        self.phones.append(phone)
+        self.domains.append(domain)
+        self.types.append(types)
+        self.rows_by_key[key] = row
+
+    def update(self, key: str, restaurant: Restaurant):
+        """
+        Refresh the signals of a stored place, after a merge
+        @param key:
+        @param restaurant:
+        @return:
+        """
+        row = self.rows_by_key.get(key)
+        if row is None:
+            return
+
+        (
+            self.latitudes[row],
+            self.longitudes[row],
+            self.phones[row],
+            self.domains[row],
+            self.types[row],
+        ) = self.signals(restaurant)
+
+    @staticmethod
+    def agreement(value, candidates: np.ndarray) -> np.ndarray:
+        """
+        1 when both values are known and equal, -1 when both are known and different, 0 otherwise
+        @param value:
+        @param candidates:
+        @return:
+        """
+        if value is None:
+            return np.zeros(len(candidates))
+
+        known = candidates != None  # noqa: E711, element-wise comparison
+        equal = candidates == value
+        return np.where(known, np.where(equal, 1.0, -1.0), 0.0)
+
+    def scores(
+        self, restaurant: Restaurant, rows: np.ndarray, distances: np.ndarray
+    ) -> np.ndarray:
+        """
+        Composite scores of candidates, lower is better
+        @param restaurant:
+        @param rows: rows of the candidates
+        @param distances: embedding distances of the candidates
+        @return:
+        """
+        latitude, longitude, phone, domain, types = self.signals(restaurant)
+        row_list = rows.tolist()
+
+        geo_distances = haversine(
+            latitude,
+            longitude,
+            np.array([self.latitudes[row] for row in row_list]),
+            np.array([self.longitudes[row] for row in row_list]),
+        )
+        # Unknown coordinates are neither a good nor a bad sign
+        geo_scores = np.nan_to_num(np.minimum(geo_distances / self.radius, 1), nan=0)
+
+        phone_scores = self.agreement(
+            phone, np.array([self.phones[row] for row in row_list], dtype=object)
+        )
+        website_scores = self.agreement(
+            domain, np.array([self.domains[row] for row in row_list], dtype=object)
+        )
+        type_scores = np.array(
+            [
+                (
+                    len(types & self.types[row]) / len(types | self.types[row])
+                    if types and self.types[row]
+                    else 0
+                )
+                for row in row_list
+            ]
+        )
+
+        return (
+            self.weights.embedding * np.asarray(distances, dtype=np.float64)
+            + self.weights.geo * geo_scores
+            - self.weights.phone * phone_scores
+            - self.weights.website * website_scores
+            - self.weights.types * type_scores
+        )
+
+    def rerank(
+        self, restaurant: Restaurant, rows: np.ndarray, distances: np.ndarray
+    ) -> Tuple[int, float]:
+        """
+        Get the best candidate of a place
+        @param restaurant:
+        @param rows: rows of the candidates, -1 for missing candidates
+        @param distances: embedding distances of the candidates
+        @return: row and composite score of the best candidate, (-1, inf) if there is none
+        """
+        valid = rows >= 0
+        rows, distances = rows[valid], distances[valid]
+        if len(rows) == 0:
+            return -1, float("inf")
+
+        scores = self.scores(restaurant, rows, distances)
+        best = int(np.argmin(scores))
+
+        return int(rows[best]), float(scores[best])
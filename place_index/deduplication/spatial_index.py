@@ -0,0 +1,105 @@
+import math
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_METERS = 6_371_000
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180
+
+
+def haversine(latitude_1, longitude_1, latitude_2, longitude_2):
+    """
+    Great-circle distance in meters, works on scalars and broadcast numpy arrays
+    @param latitude_1:
+    @param longitude_1:
+    @param latitude_2:
+    @param longitude_2:
+    @return:
+    """
+    latitude_1, longitude_1, latitude_2, longitude_2 = map(
+        np.radians, (latitude_1, longitude_1, latitude_2, longitude_2)
+    )
+    half_chord = (
+        np.sin((latitude_2 - latitude_1) / 2) ** 2
+        + np.cos(latitude_1)
+        * np.cos(latitude_2)
+        * np.sin((longitude_2 - longitude_1) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(half_chord, 1)))
+
+
+class GridIndex:
+    """
+    Spatial index bucketing points into a regular latitude / longitude grid
+    """
+
+    def __init__(self, cell_size_meters: float = 250):
+        self.cell_size = cell_size_meters / METERS_PER_DEGREE
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.latitudes: Dict[int, float] = {}
+        self.longitudes: Dict[int, float] = {}
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def add(self, item: int, latitude: float, longitude: float):
+        """
+        Add a point to the index
+        @param item: identifier of the point
+        @param latitude:
+        @param longitude:
+        @return:
+        """
+        self.cells[self._cell(latitude, longitude)].append(item)
+        self.latitudes[item] = latitude
+        self.longitudes[item] = longitude
+
+    def within_radius(
+        self, latitude: float, longitude: float, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the points within a radius
+        @param latitude:
+        @param longitude:
+        @param radius: radius in meters
+        @return: identifiers of the points and their distance in meters
+        """
+        center_latitude, center_longitude = self._cell(latitude, longitude)
+        # A grid cell is narrower in meters along the longitude as we move away from the equator
+        latitude_span = math.ceil(radius / METERS_PER_DEGREE / self.cell_size)
+        longitude_span = math.ceil(
+            radius
+            / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+            / self.cell_size
+        )
+
+        items = []
+        for cell_latitude in range(
+            center_latitude - latitude_span, center_latitude + latitude_span + 1
+        ):
+            for cell_longitude in range(
+                center_longitude - longitude_span, center_longitude + longitude_span + 1
+            ):
+                items += self.cells.get((cell_latitude, cell_longitude), [])
+
+        if not items:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        items = np.array(items, dtype=np.int64)
+        distances = haversine(
+            latitude,
+            longitude,
+            np.array([self.latitudes[item] for item in items.tolist()]),
+            np.array([self.longitudes[item] for item in items.tolist()]),
+        )
+        in_radius = distances <= radius
+
+        return items[in_radius], distances[in_radius]
@@ -0,0 +1,183 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Iterable, List, Set, Tuple
+
+from place_index.deduplication.embedding_cache import normalize_text
+from place_index.deduplication.spatial_index import GridIndex
+from place_index.generic_places import Restaurant
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Get the character trigrams of a normalized text, padded so short words still have some
+    @param text:
+    @return:
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return set()
+
+    padded = f"  {normalized} "
+    return {padded[idx : idx + 3] for idx in range(len(padded) - 2)}
+
+
+def numbers(text: str) -> Set[str]:
+    """
+    Get the numbers of a text, places only differing by a number are different places
+    @param text:
+    @return:
+    """
+    return set(re.findall(r"\d+", text))
+
+
+def jaccard(first: Set[str], second: Set[str]) -> float:
+    if not first or not second:
+        return 0
+    return len(first & second) / len(first | second)
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to the items containing them
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        self.sizes: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def add(self, item: int, text: str):
+        """
+        Index the trigrams of a text
+        @param item: identifier of the text
+        @param text:
+        @return:
+        """
+        item_trigrams = trigrams(text)
+        for trigram in item_trigrams:
+            self.postings[trigram].append(item)
+        self.sizes[item] = len(item_trigrams)
+
+    def candidates(
+        self, text: str, among: Iterable[int] | None = None, limit: int = 10
+    ) -> List[Tuple[int, float]]:
+        """
+        Get the items sharing trigrams with a text, by decreasing Jaccard similarity
+        @param text:
+        @param among: only consider these items, all items if None
+        @param limit: maximum number of candidates
+        @return: items and their Jaccard similarity with the text
+        """
+        query_trigrams = trigrams(text)
+        allowed = None if among is None else set(among)
+
+        shared: Dict[int, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for item in self.postings.get(trigram, []):
+                if allowed is None or item in allowed:
+                    shared[item] += 1
+
+        scores = [
+            (item, count / (len(query_trigrams) + self.sizes[item] - count))
+            for item, count in shared.items()
+        ]
+        scores.sort(key=lambda score: score[1], reverse=True)
+
+        return scores[:limit]
+
+
+class LexicalDecision(Enum):
+    NEW = "new"
+    MATCH = "match"
+    AMBIGUOUS = "ambiguous"
+
+
+@dataclass
+class LexicalResult:
+    decision: LexicalDecision
+    match: str
+    score: float
+
+
+class LexicalPrefilter:
+    """
+    Cheap lexical screening of places before the embedding search.
+
+    Names of nearby places are compared through a trigram index: a place sharing no
+    trigram with any nearby place is new, a place whose name (with the same numbers)
+    and address are both close enough to a nearby place is a match, and only the other
+    places need an embedding.
+    """
+
+    def __init__(
+        self,
+        match_score: float = 0.85,
+        address_score: float = 0.5,
+        radius: float = 250,
+    ):
+        self.match_score = match_score
+        self.address_score = address_score
+        self.radius = radius
+
+        self.names = TrigramIndex()
+        self.spatial_index = GridIndex(cell_size_meters=radius)
+        self.keys: List[str] = []
+        self.addresses: List[Set[str]] = []
+        self.name_numbers: List[Set[str]] = []
+        self.unlocated: Set[int] = set()
+
+    def add(self, restaurant: Restaurant, key: str):
+        """
+        Index a new place
+        @param restaurant:
+        @param key: key of the place in the merger
+        @return:
+        """
+        item = len(self.keys)
+        self.keys.append(key)
+        self.addresses.append(trigrams(restaurant.contact.address or ""))
+        self.name_numbers.append(numbers(restaurant.name))
+        self.names.add(item, restaurant.name)
+
+        if restaurant.has_location():
+            self.spatial_index.add(item, restaurant.latitude, restaurant.longitude)
+        else:
+            self.unlocated.add(item)
+
+    def check(self, restaurant: Restaurant) -> LexicalResult:
+        """
+        Screen a place against the indexed places
+        @param restaurant:
+        @return:
+        """
+        among = None
+        if restaurant.has_location():
+            nearby, _ = self.spatial_index.within_radius(
+                restaurant.latitude, restaurant.longitude, self.radius
+            )
+            among = set(nearby.tolist()) | self.unlocated
+
+        candidates = self.names.candidates(restaurant.name, among=among)
+        if not candidates:
+            return LexicalResult(LexicalDecision.NEW, "", 0)
+
+        address = trigrams(restaurant.contact.address or "")
+        name_numbers = numbers(restaurant.name)
+        for item, score in candidates:
+            if score < self.match_score:
+                break
+
+            # A missing address cannot contradict the name
+            if name_numbers == self.name_numbers[item] and (
+                not address
+                or not self.addresses[item]
+                or jaccard(address, self.addresses[item]) >= self.address_score
+            ):
+                return LexicalResult(LexicalDecision.MATCH, self.keys[item], score)
+
+        item, score = candidates[0]
+        return LexicalResult(LexicalDecision.AMBIGUOUS, self.keys[item], score)
@@ -0,0 +1,250 @@
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+from place_index.deduplication.vector_store import VectorStore
+
+
+class VectorIndex:
+    """
+    Long-lived nearest neighbour index supporting incremental inserts.
+
+    Vectors are kept by a VectorStore, in a single matrix that grows by doubling.
+    Small indexes are searched exactly; once the index holds more than `ann_threshold`
+    float32 vectors, an autotuned MRPT index is built over the stored prefix and the
+    vectors inserted since the last build (the tail) are searched exactly.
+    Quantized stores are always searched exactly, directly over the quantized matrix.
+    """
+
+    def __init__(
+        self,
+        initial_capacity: int = 1024,
+        ann_threshold: int = 5000,
+        target_recall: float = 0.95,
+        rebuild_ratio: float = 0.25,
+        store: VectorStore | None = None,
+        chunk_size: int = 65536,
+        ann_k: int = 1,
+    ):
+        self.ann_threshold = ann_threshold
+        self.ann_k = ann_k
+        self.target_recall = target_recall
+        self.rebuild_ratio = rebuild_ratio
+        self.chunk_size = chunk_size
+        self.store = store or VectorStore(initial_capacity=initial_capacity)
+
+        self._ann_index = None
+        self._ann_vectors: np.ndarray | None = None
+        self._ann_size = 0
+
+    def __len__(self):
+        return self.store.size
+
+    @property
+    def size(self) -> int:
+        return self.store.size
+
+    @property
+    def keys(self) -> List[str]:
+        return self.store.keys
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """
+        View over the stored vectors (without the unused capacity)
+        @return:
+        """
+        return self.store.matrix
+
+    def add(self, vector: np.ndarray, key: str) -> int:
+        """
+        Add a vector to the index
+        @param vector:
+        @param key:
+        @return: row of the inserted vector
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        return int(self.add_batch(vector, [key])[0])
+
+    def add_batch(self, vectors: np.ndarray, keys: List[str]) -> np.ndarray:
+        """
+        Add several vectors to the index with a single copy
+        @param vectors:
+        @param keys:
+        @return: rows of the inserted vectors
+        """
+        rows = self.store.append(vectors, keys)
+        if len(rows) > 0:
+            self._maybe_rebuild_ann()
+
+        return rows
+
+    def _maybe_rebuild_ann(self):
+        """
+        Build or rebuild the approximate index once the exactly-searched tail gets too large
+        @return:
+        """
+        # MRPT only works on float32 matrices
+        if self.size < self.ann_threshold or self.store.dtype != "float32":
+            return
+
+        tail = self.size - self._ann_size
+        if self._ann_index is not None and tail <= self._ann_size * self.rebuild_ratio:
+            return
+
+        logging.debug(f"Building approximate index over {self.size} vectors")
+
+        # Rows of an append-only matrix never change, so the prefix view can be shared
+        self._ann_vectors = self.store.matrix
+        # Only imported once an index is large enough to need it
+        import mrpt
+
+        self._ann_index = mrpt.MRPTIndex(self._ann_vectors)
+        self._ann_index.build_autotune_sample(self.target_recall, self.ann_k)
+        self._ann_size = self.size
+
+    def _exact_search_batch(
+        self, queries: np.ndarray, query_norms: np.ndarray, start: int, k: int = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute force search of encoded queries over the stored vectors starting at row `start`
+        @param queries: queries encoded by the store
+        @param query_norms: squared norms of the queries
+        @param start:
+        @param k: number of neighbours
+        @return: rows and distances of the k nearest vectors of each query, sorted by distance
+        """
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        matrix = self.store.matrix
+        norms = self.store.norms
+
+        # Stream over the matrix by chunks of rows, so quantized matrices are only
+        # converted to float32 a chunk at a time
+        for chunk_start in range(start, self.size, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, self.size)
+            chunk = np.asarray(matrix[chunk_start:chunk_end], dtype=np.float32)
+            squared = (
+                norms[np.newaxis, chunk_start:chunk_end]
+                - 2 * queries @ chunk.T
+                + query_norms[:, np.newaxis]
+            )
+
+            chunk_k = min(k, chunk_end - chunk_start)
+            best = np.argpartition(squared, chunk_k - 1, axis=1)[:, :chunk_k]
+            best_distances = np.sqrt(
+                np.maximum(np.take_along_axis(squared, best, axis=1), 0)
+            )
+            rows, distances = keep_top_k(
+                rows, distances, chunk_start + best, best_distances, k
+            )
+
+        return rows, distances
+
+    def search(self, query: np.ndarray) -> Tuple[int, float]:
+        """
+        Get the nearest neighbour of a vector
+        @param query:
+        @return: row and euclidean distance of the nearest vector, (-1, inf) if the index is empty
+        """
+        rows, distances = self.search_batch(np.asarray(query).reshape(1, -1))
+        return int(rows[0]), float(distances[0])
+
+    def search_among(self, query: np.ndarray, rows: np.ndarray) -> Tuple[int, float]:
+        """
+        Get the nearest neighbour of a vector among a subset of rows
+        @param query:
+        @param rows: candidate rows
+        @return: row and euclidean distance of the nearest vector, (-1, inf) if there is no candidate
+        """
+        best_rows, best_distances = self.search_among_k(query, rows, 1)
+        if len(best_rows) == 0:
+            return -1, float("inf")
+
+        return int(best_rows[0]), float(best_distances[0])
+
+    def search_among_k(
+        self, query: np.ndarray, rows: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the k nearest neighbours of a vector among a subset of rows
+        @param query:
+        @param rows: candidate rows
+        @param k:
+        @return: rows and euclidean distances of the nearest vectors, sorted by distance
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+
+        encoded, query_norms = self.store.encode_queries(query)
+        candidates = np.asarray(self.store.matrix[rows], dtype=np.float32)
+        squared = self.store.norms[rows] - 2 * candidates @ encoded[0] + query_norms[0]
+        best = np.argsort(squared)[:k]
+
+        return rows[best], np.sqrt(np.maximum(squared[best], 0))
+
+    def search_batch(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the nearest neighbour of each row of a query matrix
+        @param queries:
+        @return: rows and euclidean distances of the nearest vectors, -1 and inf when not found
+        """
+        rows, distances = self.search_batch_k(queries, 1)
+        return rows[:, 0], distances[:, 0]
+
+    def search_batch_k(
+        self, queries: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the k nearest neighbours of each row of a query matrix.
+        The approximate index is tuned for `ann_k` neighbours, larger k are searched exactly.
+        @param queries:
+        @param k:
+        @return: rows and euclidean distances of the nearest vectors sorted by distance,
+        -1 and inf when not found
+        """
+        encoded, query_norms = self.store.encode_queries(queries)
+
+        if self._ann_index is None or k > self.ann_k:
+            return self._exact_search_batch(encoded, query_norms, 0, k)
+
+        rows, distances = self._exact_search_batch(
+            encoded, query_norms, self._ann_size, k
+        )
+
+        ann_rows, ann_distances = self._ann_index.ann(
+            encoded, k=k, return_distances=True
+        )
+        ann_rows = ann_rows.reshape(len(encoded), -1).astype(np.int64)
+        ann_distances = ann_distances.reshape(len(encoded), -1).astype(np.float32)
+        ann_distances[ann_rows < 0] = np.inf
+
+        return keep_top_k(rows, distances, ann_rows, ann_distances, k)
+
+
+def keep_top_k(
+    rows: np.ndarray,
+    distances: np.ndarray,
+    new_rows: np.ndarray,
+    new_distances: np.ndarray,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge two sets of neighbours of the same queries, keeping the k nearest
+    @param rows:
+    @param distances:
+    @param new_rows:
+    @param new_distances:
+    @param k:
+    @return: rows and distances of the k nearest neighbours, sorted by distance
+    """
+    all_rows = np.concatenate([rows, new_rows], axis=1)
+    all_distances = np.concatenate([distances, new_distances], axis=1)
+    order = np.argsort(all_distances, axis=1, kind="stable")[:, :k]
+
+    return (
+        np.take_along_axis(all_rows, order, axis=1),
+        np.take_along_axis(all_distances, order, axis=1),
+    )
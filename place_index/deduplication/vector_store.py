@@ -0,0 +1,332 @@
+import json
+import logging
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+SUPPORTED_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+INT8_MAX = 127
+
+
+class VectorStore:
+    """
+    Storage of the vectors of a VectorIndex, in a single matrix growing by doubling.
+
+    The matrix lives in memory, or in a memory-mapped file when a path is given.
+    Vectors can be stored as float32, float16 or int8 (scalar quantization with a
+    per-dimension scale), optionally after a PCA projection to fewer dimensions.
+    The keys of the vectors are kept in a parallel list.
+    """
+
+    VECTORS_FILE = "vectors.bin"
+    KEYS_FILE = "keys.npy"
+    NORMS_FILE = "norms.npy"
+    METADATA_FILE = "metadata.json"
+    PROJECTION_FILE = "projection.npz"
+
+    def __init__(
+        self,
+        path: str | None = None,
+        dtype: str = "float32",
+        initial_capacity: int = 1024,
+    ):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(
+                f"Unsupported dtype {dtype}, expected one of {list(SUPPORTED_DTYPES)}"
+            )
+
+        self.path = path
+        self.dtype = dtype
+        self.initial_capacity = initial_capacity
+
+        self.keys: List[str] = []
+        self.size = 0
+        self.input_dim = 0
+        self.dim = 0
+        self._matrix: np.ndarray | None = None
+        self._norms = np.empty(0, dtype=np.float32)
+
+        # Optional PCA projection and int8 scale, set by fit()
+        self.mean: np.ndarray | None = None
+        self.components: np.ndarray | None = None
+        self.scale: np.ndarray | None = None
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        View over the stored (projected and quantized) vectors
+        @return:
+        """
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=SUPPORTED_DTYPES[self.dtype])
+        return self._matrix[: self.size]
+
+    @property
+    def norms(self) -> np.ndarray:
+        """
+        Squared norms of the decoded stored vectors
+        @return:
+        """
+        return self._norms[: self.size]
+
+    def fit(self, sample: np.ndarray, projection_dim: int | None = None):
+        """
+        Fit the PCA projection and the int8 scale on a sample of vectors.
+        Must be called before the first vector is stored.
+        @param sample:
+        @param projection_dim: number of dimensions kept by the PCA, no projection if None
+        @return:
+        """
+        if self.size > 0:
+            raise RuntimeError("The store must be fitted before adding vectors")
+
+        sample = np.asarray(sample, dtype=np.float32)
+        self.input_dim = sample.shape[1]
+
+        if projection_dim is not None:
+            self.mean = sample.mean(axis=0)
+            _, _, right_vectors = np.linalg.svd(sample - self.mean, full_matrices=False)
+            self.components = np.ascontiguousarray(right_vectors[:projection_dim].T)
+
+        projected = self.project(sample)
+        self.scale = np.maximum(np.abs(projected).max(axis=0), 1e-6) / INT8_MAX
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Apply the PCA projection, if any
+        @param vectors:
+        @return:
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.components is None:
+            return vectors
+        return (vectors - self.mean) @ self.components
+
+    def _scale(self, dim: int) -> np.ndarray:
+        # Embeddings are normalized, so their components fit in [-1, 1] without fitting
+        if self.scale is None:
+            self.scale = np.full(dim, 1 / INT8_MAX, dtype=np.float32)
+        return self.scale
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Project and quantize vectors to the stored representation
+        @param vectors:
+        @return:
+        """
+        projected = self.project(vectors)
+        if self.dtype != "int8":
+            return projected.astype(SUPPORTED_DTYPES[self.dtype])
+
+        scale = self._scale(projected.shape[1])
+        return np.clip(np.rint(projected / scale), -INT8_MAX, INT8_MAX).astype(np.int8)
+
+    def decode(self, stored: np.ndarray) -> np.ndarray:
+        """
+        Convert stored vectors back to float32 (in the projected space)
+        @param stored:
+        @return:
+        """
+        decoded = np.asarray(stored, dtype=np.float32)
+        if self.dtype == "int8":
+            decoded = decoded * self.scale
+        return decoded
+
+    def encode_queries(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Prepare queries for a search over the stored matrix
+        @param queries:
+        @return: queries to multiply with the stored matrix and their squared norms
+        """
+        projected = self.project(np.atleast_2d(queries))
+        norms = np.einsum("ij,ij->i", projected, projected)
+        if self.dtype == "int8":
+            # q . (scale * x) == (q * scale) . x, so the int8 matrix is used as is
+            projected = projected * self._scale(projected.shape[1])
+
+        return np.ascontiguousarray(projected, dtype=np.float32), norms
+
+    def _allocate(self, capacity: int):
+        """
+        Allocate (or grow) the matrix and the norms to `capacity` vectors
+        @param capacity:
+        @return:
+        """
+        dtype = SUPPORTED_DTYPES[self.dtype]
+        if self.path is None:
+            matrix = np.empty((capacity, self.dim), dtype=dtype)
+        else:
+            vectors_path = os.path.join(self.path, self.VECTORS_FILE)
+            with open(vectors_path, "ab") as vectors_file:
+                vectors_file.truncate(capacity * self.dim * np.dtype(dtype).itemsize)
+            matrix = np.memmap(
+                vectors_path, dtype=dtype, mode="r+", shape=(capacity, self.dim)
+            )
+
+        # The previous buffer stays alive as long as an ANN index references its prefix
+        if self._matrix is not None and self.path is None:
+            matrix[: self.size] = self._matrix[: self.size]
+        self._matrix = matrix
+
+        norms = np.empty(capacity, dtype=np.float32)
+        norms[: self.size] = self._norms[: self.size]
+        self._norms = norms
+
+    def append(self, vectors: np.ndarray, keys: List[str]) -> np.ndarray:
+        """
+        Store vectors at the end of the matrix
+        @param vectors: float32 vectors, one per row
+        @param keys:
+        @return: rows of the stored vectors
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) != len(keys):
+            raise ValueError("The number of vectors and keys should be the same")
+        if len(vectors) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        if self.input_dim == 0:
+            self.input_dim = vectors.shape[1]
+        elif vectors.shape[1] != self.input_dim:
+            raise ValueError(
+                f"Vector dimension mismatch: expected {self.input_dim}, got {vectors.shape[1]}"
+            )
+
+        encoded = self.encode(vectors)
+        if self._matrix is None:
+            self.dim = encoded.shape[1]
+            self._allocate(max(self.initial_capacity, len(vectors)))
+
+        capacity = self._matrix.shape[0]
+        if self.size + len(vectors) > capacity:
+            while capacity < self.size + len(vectors):
+                capacity *= 2
+            self._allocate(capacity)
+
+        rows = np.arange(self.size, self.size + len(vectors))
+        decoded = self.decode(encoded)
+        self._matrix[self.size : self.size + len(vectors)] = encoded
+        self._norms[self.size : self.size + len(vectors)] = np.einsum(
+            "ij,ij->i", decoded, decoded
+        )
+        self.keys.extend(keys)
+        self.size += len(vectors)
+
+        return rows
+
+    def flush(self):
+        """
+        Write the store to its directory
+        @return:
+        """
+        if self.path is None:
+            raise RuntimeError("Only a store backed by a directory can be flushed")
+
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+
+        self._write_index(
+            self.path, 0 if self._matrix is None else self._matrix.shape[0]
+        )
+
+    def _write_index(self, path: str, capacity: int):
+        """
+        Write the keys, norms, projection and metadata of the store to a directory
+        @param path:
+        @param capacity: number of rows of the vector file
+        @return:
+        """
+        np.save(os.path.join(path, self.KEYS_FILE), np.array(self.keys, dtype=str))
+        np.save(os.path.join(path, self.NORMS_FILE), self.norms)
+        np.savez(
+            os.path.join(path, self.PROJECTION_FILE),
+            **{
+                name: value
+                for name, value in [
+                    ("mean", self.mean),
+                    ("components", self.components),
+                    ("scale", self.scale),
+                ]
+                if value is not None
+            },
+        )
+        with open(os.path.join(path, self.METADATA_FILE), "w") as metadata_file:
+            json.dump(
+                {
+                    "dtype": self.dtype,
+                    "size": self.size,
+                    "input_dim": self.input_dim,
+                    "dim": self.dim,
+                    "capacity": capacity,
+                },
+                metadata_file,
+            )
+
+    def save(self, path: str):
+        """
+        Write a copy of the store to a directory, without its unused capacity.
+        A store backed by this directory is only flushed.
+        @param path:
+        @return:
+        """
+        if self.path is not None and os.path.abspath(path) == os.path.abspath(
+            self.path
+        ):
+            self.flush()
+            return
+
+        os.makedirs(path, exist_ok=True)
+        # The vectors may be memory-mapped from this file (copy-on-write store), they
+        # are written to a new file replacing it
+        vectors_path = os.path.join(path, self.VECTORS_FILE)
+        self.matrix.tofile(f"{vectors_path}.tmp")
+        os.replace(f"{vectors_path}.tmp", vectors_path)
+        self._write_index(path, self.size if self._matrix is not None else 0)
+
+    @classmethod
+    def open(cls, path: str, copy_on_write: bool = False) -> "VectorStore":
+        """
+        Open a store previously flushed to a directory, the vectors are memory-mapped
+        @param path:
+        @param copy_on_write: leave the directory unchanged, the store then lives in
+        memory (new vectors included) and is only written by save
+        @return:
+        """
+        with open(os.path.join(path, cls.METADATA_FILE)) as metadata_file:
+            metadata = json.load(metadata_file)
+
+        store = cls(path=None if copy_on_write else path, dtype=metadata["dtype"])
+        store.input_dim = metadata["input_dim"]
+        store.dim = metadata["dim"]
+
+        with np.load(os.path.join(path, cls.PROJECTION_FILE)) as projection:
+            store.mean = projection["mean"] if "mean" in projection else None
+            store.components = (
+                projection["components"] if "components" in projection else None
+            )
+            store.scale = projection["scale"] if "scale" in projection else None
+
+        store.keys = np.load(os.path.join(path, cls.KEYS_FILE)).tolist()
+        if metadata["capacity"] > 0 and copy_on_write:
+            # Modified pages are private to the process, the file is never written
+            store._matrix = np.memmap(
+                os.path.join(path, cls.VECTORS_FILE),
+                dtype=SUPPORTED_DTYPES[store.dtype],
+                mode="c",
+                shape=(metadata["capacity"], store.dim),
+            )
+            store._norms = np.empty(metadata["capacity"], dtype=np.float32)
+        elif metadata["capacity"] > 0:
+            store._allocate(metadata["capacity"])
+
+        if metadata["capacity"] > 0:
+            store.size = metadata["size"]
+            store._norms[: store.size] = np.load(os.path.join(path, cls.NORMS_FILE))
+
+        logging.debug(f"Opened vector store {path} with {store.size} vectors")
+
+        return store
@@ -0,0 +1,66 @@
+import gzip
+import io
+import json
+import logging
+from typing import IO, Iterable, Iterator
+
+from place_index.generic_places import Restaurant
+
+# Compact separators, and no escaping of non ascii characters
+ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def open_text(path: str, mode: str) -> IO[str]:
+    """
+    Open a text file, compressed with gzip (.gz) or zstandard (.zst) depending on its extension
+    @param path:
+    @param mode: "r" or "w"
+    @return:
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, f"{mode}t", encoding="utf-8")
+
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                "zstandard is required for .zst files, install place-index[zstd]"
+            ) from e
+
+        return io.TextIOWrapper(
+            zstandard.open(path, f"{mode}b"), encoding="utf-8", newline="\n"
+        )
+
+    return open(path, mode, encoding="utf-8", newline="\n")
+
+
+def export_places(places: Iterable[Restaurant], path: str) -> int:
+    """
+    Write places to a NDJSON file, one place per line, without holding them all in memory
+    @param places:
+    @param path: compressed if it ends with .gz or .zst
+    @return: number of written places
+    """
+    count = 0
+    with open_text(path, "w") as places_file:
+        for place in places:
+            places_file.write(ENCODER.encode(place.to_json()))
+            places_file.write("\n")
+            count += 1
+
+    logging.info(f"Exported {count} places to {path}")
+
+    return count
+
+
+def load_places(path: str) -> Iterator[Restaurant]:
+    """
+    Read the places of a NDJSON file lazily, one place at a time
+    @param path: compressed if it ends with .gz or .zst
+    @return:
+    """
+    with open_text(path, "r") as places_file:
+        for line in places_file:
+            if line.strip():
+                yield Restaurant.from_json(json.loads(line))
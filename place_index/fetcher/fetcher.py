@@ -1,7 +1,11 @@
 import logging
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Tuple
 
+import requests
+
 from place_index.fetcher.provider import ProviderSource
 from place_index.generic_places import Restaurant
 from place_index.gmaps.gmaps_api_handler import (
@@ -14,63 +18,100 @@ from place_index.tripadvisor.tripadvisor_api_handler import (
 )
 
 
+# Maximum number of coordinates searched by a fetch, to bound the cost of the API calls
+MAX_COORDINATES = 10
+
+
 class Provider(ABC):
     @abstractmethod
-    def fetch(self, coordinates: List[int], distance: int) -> dict[int, Restaurant]:
+    def fetch_one(
+        self, latitude: float, longitude: float, distance: int
+    ) -> dict[int, Restaurant]:
+        """
+        Fetch the places around one point. Called concurrently by the fetcher, so it
+        must not share mutable state between calls
+        @param latitude:
+        @param longitude:
+        @param distance:
+        @return:
+        """
         pass
 
-
-class TripadvisorProvider(Provider):
     def fetch(
-        self, coordinates: Tuple[int, int], distance: int
+        self, coordinates: List[Tuple[float, float]], distance: int
     ) -> dict[int, Restaurant]:
         """
-        Fetch the data from the tripadvisor provider
+        Fetch the places around several points, one point after the other
         @param coordinates:
         @param distance:
         @return:
         """
-        tripadvisor_restaurants = {}
-        tripadvisor_api_handler = TripadvisorApiHandler()
-        for idx, (latitude, longitude) in enumerate(coordinates[:10]):
-            places = tripadvisor_api_handler.fetch_all(latitude, longitude, distance)
-            local_restaurants = tripadvisor_place_handler(places)
-            tripadvisor_restaurants.update(local_restaurants)
+        restaurants = {}
+        for latitude, longitude in coordinates[:MAX_COORDINATES]:
+            restaurants.update(self.fetch_one(latitude, longitude, distance))
 
-        return tripadvisor_restaurants
+        return restaurants
 
 
-class GoogleMapsProvider(Provider):
-    def fetch(
-        self, coordinates: Tuple[int, int], distance: int
+class TripadvisorProvider(Provider):
+    def __init__(self, max_in_flight: int = 4):
+        """
+        @param max_in_flight: maximum number of concurrent requests to the tripadvisor
+        api, shared by every point fetched at once
+        """
+        self.max_in_flight = max_in_flight
+        self.request_slots = threading.BoundedSemaphore(max_in_flight)
+
+    def fetch_one(
+        self, latitude: float, longitude: float, distance: int
     ) -> dict[int, Restaurant]:
         """
-        Fetch the data from the gmaps place provider
-        @param coordinates:
+        Fetch the data from the tripadvisor provider
+        @param latitude:
+        @param longitude:
         @param distance:
         @return:
         """
-        gmaps_restaurants = {}
-        gmaps_api = GooglePlacesApi()
-        for idx, (latitude, longitude) in enumerate(coordinates[:10]):
-            response = gmaps_api.google_api_wrapper(latitude, longitude, distance)
-            if not response.ok:
-                logging.warning(
-                    f"Google Maps API request failed: {response.status_code}"
-                )
-                continue
+        # The handler counts the errors of its calls, so each call has its own
+        places = TripadvisorApiHandler(
+            self.max_in_flight, self.request_slots
+        ).fetch_all(latitude, longitude, distance)
+        return tripadvisor_place_handler(places)
 
-            restaurants = gmaps_place_nearby_handler(response)
 
-            for restaurant in restaurants:
-                gmaps_restaurants[restaurant.id] = restaurant
+class GoogleMapsProvider(Provider):
+    def __init__(self):
+        self.gmaps_api = GooglePlacesApi()
+
+    def fetch_one(
+        self, latitude: float, longitude: float, distance: int
+    ) -> dict[int, Restaurant]:
+        """
+        Fetch the data from the gmaps place provider
+        @param latitude:
+        @param longitude:
+        @param distance:
+        @return:
+        """
+        response = self.gmaps_api.google_api_wrapper(latitude, longitude, distance)
+        if not response.ok:
+            logging.warning(f"Google Maps API request failed: {response.status_code}")
+            return {}
 
-        return gmaps_restaurants
+        return {
+            restaurant.id: restaurant
+            for restaurant in gmaps_place_nearby_handler(response)
+        }
 
 
 class Fetcher:
-    def __init__(self, *providers: ProviderSource):
+    def __init__(self, *providers: ProviderSource, max_concurrency: int = 4):
+        """
+        @param providers:
+        @param max_concurrency: maximum number of concurrent requests to each provider
+        """
         self.providers: List[Provider] = []
+        self.max_concurrency = max_concurrency
         for provider in providers:
             self.add_provider(provider)
 
@@ -86,21 +127,56 @@ class Fetcher:
             case ProviderSource.GOOGLE_MAPS:
                 self.providers.append(GoogleMapsProvider())
             case ProviderSource.TRIPADVISOR:
-                self.providers.append(TripadvisorProvider())
+                self.providers.append(TripadvisorProvider(self.max_concurrency))
             case _:
                 logging.warning(f"Unknown provider: {provider.value}")
 
-    def fetch_all(self, coordinates) -> dict[int, Restaurant]:
+    def fetch_all(
+        self, coordinates: List[Tuple[float, float]], distance: int = 100
+    ) -> dict[int, Restaurant]:
         """
-        Fetch all the data place from the loaded providers
+        Fetch all the data place from the loaded providers. Every provider and point is
+        fetched concurrently, with at most `max_concurrency` requests per provider. The
+        results are merged in the order of the providers and points, as if they were
+        fetched one after the other
+        @param coordinates: points to search around, the first MAX_COORDINATES only
+        @param distance: search radius around each point, in meters
         @return:
         """
         if not self.providers:
             logging.warning("No providers added to fetcher.")
 
-        results = {}
-        for provider in self.providers:
-            logging.info(f"Fetching data from provider: {provider.__class__.__name__}")
-            results.update(provider.fetch(coordinates, 100))
+        coordinates = list(coordinates)[:MAX_COORDINATES]
+        executors = [
+            ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix=provider.__class__.__name__,
+            )
+            for provider in self.providers
+        ]
+        try:
+            futures: List[List[Future]] = [
+                [
+                    executor.submit(provider.fetch_one, latitude, longitude, distance)
+                    for latitude, longitude in coordinates
+                ]
+                for provider, executor in zip(self.providers, executors)
+            ]
+
+            results = {}
+            for provider, provider_futures in zip(self.providers, futures):
+                logging.info(
+                    f"Fetching data from provider: {provider.__class__.__name__}"
+                )
+                for (latitude, longitude), future in zip(coordinates, provider_futures):
+                    try:
+                        results.update(future.result())
+                    except requests.RequestException as error:
+                        logging.error(
+                            f"{provider.__class__.__name__} request around ({latitude}, {longitude}) failed: {error}"
+                        )
+        finally:
+            for executor in executors:
+                executor.shutdown(cancel_futures=True)
 
         return results
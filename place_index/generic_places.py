@@ -1,10 +1,41 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, Iterable, List
 
 from place_index.metadatas import PriceLevel, Atmosphere
 
+# Bit of each price level and atmosphere in the bitsets of a place
+PRICE_LEVEL_BITS: Dict[PriceLevel, int] = {
+    level: 1 << bit for bit, level in enumerate(PriceLevel)
+}
+ATMOSPHERE_BITS: Dict[Atmosphere, int] = {
+    atmosphere: 1 << bit for bit, atmosphere in enumerate(Atmosphere)
+}
 
-@dataclass
+
+def to_bitset(values: Iterable, bits: Dict) -> int:
+    """
+    Pack enum values in a bitset, unknown values are ignored
+    :param values: enum members or their values
+    :param bits: bit of each enum member
+    :return:
+    """
+    bitset = 0
+    for value in values:
+        bitset |= bits.get(value, 0)
+    return bitset
+
+
+def from_bitset(bitset: int, bits: Dict) -> List:
+    """
+    Unpack a bitset to enum members, in the declaration order of the enum
+    :param bitset:
+    :param bits: bit of each enum member
+    :return:
+    """
+    return [member for member, bit in bits.items() if bitset & bit]
+
+
+@dataclass(slots=True)
 class Contact:
     phone: str
     email: str
@@ -15,49 +46,272 @@ class Contact:
     specific_uri: str
 
 
-@dataclass
+class FeatureFlag:
+    """
+    Boolean attribute stored as one bit of the mask of Features
+    """
+
+    def __init__(self, bit: int):
+        self.bit = 1 << bit
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return bool(instance.mask & self.bit)
+
+    def __set__(self, instance, value: bool):
+        if value:
+            instance.mask |= self.bit
+        else:
+            instance.mask &= ~self.bit
+
+
 class Features:
-    credit_card: bool
-    serve_alcohol: bool
-    is_accessible: bool
-    takeout: bool
-    seating: bool
-    wifi: bool
-    reservation: bool
-    parking: bool
-    dog_allowed: bool
-
-
-@dataclass
+    """
+    Features of a place, packed in an int bitmask so that merging is a single OR
+    """
+
+    __slots__ = ("mask",)
+
+    FLAGS = (
+        "credit_card",
+        "serve_alcohol",
+        "is_accessible",
+        "takeout",
+        "seating",
+        "wifi",
+        "reservation",
+        "parking",
+        "dog_allowed",
+    )
+
+    credit_card = FeatureFlag(0)
+    serve_alcohol = FeatureFlag(1)
+    is_accessible = FeatureFlag(2)
+    takeout = FeatureFlag(3)
+    seating = FeatureFlag(4)
+    wifi = FeatureFlag(5)
+    reservation = FeatureFlag(6)
+    parking = FeatureFlag(7)
+    dog_allowed = FeatureFlag(8)
+
+    def __init__(
+        self,
+        credit_card: bool = False,
+        serve_alcohol: bool = False,
+        is_accessible: bool = False,
+        takeout: bool = False,
+        seating: bool = False,
+        wifi: bool = False,
+        reservation: bool = False,
+        parking: bool = False,
+        dog_allowed: bool = False,
+    ):
+        self.mask = 0
+        flags = (
+            credit_card,
+            serve_alcohol,
+            is_accessible,
+            takeout,
+            seating,
+            wifi,
+            reservation,
+            parking,
+            dog_allowed,
+        )
+        for bit, value in enumerate(flags):
+            if value:
+                self.mask |= 1 << bit
+
+    @classmethod
+    def from_mask(cls, mask: int) -> "Features":
+        features = cls()
+        features.mask = mask
+        return features
+
+    @classmethod
+    def from_json(cls, json):
+        return cls(**json)
+
+    def to_json(self) -> Dict[str, bool]:
+        return {flag: getattr(self, flag) for flag in self.FLAGS}
+
+    def __or__(self, other: "Features") -> "Features":
+        return Features.from_mask(self.mask | other.mask)
+
+    def __ior__(self, other: "Features") -> "Features":
+        self.mask |= other.mask
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, Features):
+            return NotImplemented
+        return self.mask == other.mask
+
+    __hash__ = None
+
+    def __repr__(self):
+        flags = ", ".join(f"{flag}={getattr(self, flag)}" for flag in self.FLAGS)
+        return f"Features({flags})"
+
+
+@dataclass(slots=True)
 class Reviews:
     rating: float
     lang: str
     title: str
     content: str
     publication_date: str | None
+    author: str = ""
+    provider: str = ""
 
 
-@dataclass
 class Restaurant:
-    id: str
-    name: str
-    rating: float
-    types: list
-    price_level: List[PriceLevel]
-    atmosphere_target: List[Atmosphere]
-    contact: Contact
-    features: Features
-    reviews: List[Reviews]
-    number_of_reviews: int
+    """
+    Place merged from the providers.
+
+    Instances are slotted. The price levels and atmospheres are stored as bitsets
+    (`price_level_bits` and `atmosphere_bits`); `price_level` and `atmosphere_target`
+    convert them from and to lists of enum members.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "rating",
+        "types",
+        "price_level_bits",
+        "atmosphere_bits",
+        "contact",
+        "features",
+        "reviews",
+        "number_of_reviews",
+        "latitude",
+        "longitude",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        rating: float,
+        types: list,
+        price_level: List[PriceLevel],
+        atmosphere_target: List[Atmosphere],
+        contact: Contact,
+        features: Features,
+        reviews: List[Reviews],
+        number_of_reviews: int,
+        latitude: float | None = None,
+        longitude: float | None = None,
+    ):
+        self.id = id
+        self.name = name
+        self.rating = rating
+        self.types = types
+        self.price_level = price_level
+        self.atmosphere_target = atmosphere_target
+        self.contact = contact
+        self.features = features
+        self.reviews = reviews
+        self.number_of_reviews = number_of_reviews
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @property
+    def price_level(self) -> List[PriceLevel]:
+        return from_bitset(self.price_level_bits, PRICE_LEVEL_BITS)
+
+    @price_level.setter
+    def price_level(self, price_level: Iterable[PriceLevel]):
+        self.price_level_bits = to_bitset(price_level, PRICE_LEVEL_BITS)
+
+    @property
+    def atmosphere_target(self) -> List[Atmosphere]:
+        return from_bitset(self.atmosphere_bits, ATMOSPHERE_BITS)
+
+    @atmosphere_target.setter
+    def atmosphere_target(self, atmosphere_target: Iterable[Atmosphere]):
+        self.atmosphere_bits = to_bitset(atmosphere_target, ATMOSPHERE_BITS)
+
+    def __eq__(self, other):
+        if not isinstance(other, Restaurant):
+            return NotImplemented
+        return all(
+            getattr(self, attribute) == getattr(other, attribute)
+            for attribute in self.__slots__
+        )
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Restaurant(id={self.id!r}, name={self.name!r}, rating={self.rating!r})"
 
     @classmethod
     def from_json(cls, json):
-        new_instance = cls(**json)
-        new_instance.contact = Contact(**json["contact"])
-        new_instance.features = Features(**json["features"])
-        new_instance.reviews = [Reviews(**review) for review in json["reviews"]]
+        return cls(
+            id=json["id"],
+            name=json["name"],
+            rating=json["rating"],
+            types=json["types"],
+            price_level=json["price_level"],
+            atmosphere_target=json["atmosphere_target"],
+            contact=Contact(**json["contact"]),
+            features=Features.from_json(json["features"]),
+            reviews=[Reviews(**review) for review in json["reviews"]],
+            number_of_reviews=json["number_of_reviews"],
+            latitude=json.get("latitude"),
+            longitude=json.get("longitude"),
+        )
+
+    def to_json(self) -> dict:
+        """
+        Convert the place to a JSON compatible dict, the format read by from_json
+        :return:
+        """
+        contact = self.contact
+        return {
+            "id": self.id,
+            "name": self.name,
+            "rating": self.rating,
+            "types": list(self.types),
+            "price_level": [level.value for level in self.price_level],
+            "atmosphere_target": [
+                atmosphere.value for atmosphere in self.atmosphere_target
+            ],
+            "contact": {
+                "phone": contact.phone,
+                "email": contact.email,
+                "website": contact.website,
+                "address": contact.address,
+                "gmaps_uri": contact.gmaps_uri,
+                "tripadvisor_uri": contact.tripadvisor_uri,
+                "specific_uri": contact.specific_uri,
+            },
+            "features": self.features.to_json(),
+            "reviews": [
+                {
+                    "rating": review.rating,
+                    "lang": review.lang,
+                    "title": review.title,
+                    "content": review.content,
+                    "publication_date": review.publication_date,
+                    "author": review.author,
+                    "provider": review.provider,
+                }
+                for review in self.reviews
+            ],
+            "number_of_reviews": self.number_of_reviews,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+        }
 
-        return new_instance
+    def has_location(self) -> bool:
+        """
+        Check if the place_index coordinates are known
+        :return:
+        """
+        return self.latitude is not None and self.longitude is not None
 
     def is_exploitable(self):
         """
@@ -76,5 +330,5 @@ class Restaurant:
             and self.price_level != PriceLevel.UNKNOWN
             and len(self.types) > 0
             and len(self.reviews) > 0
-            and any(self.features.__dict__.values())
+            and self.features.mask != 0
         )
@@ -27,6 +27,7 @@ class PlacesGoogleFields:
             "places.rating",
             "places.priceLevel",
             "places.formattedAddress",
+            "places.location",
             "places.types",
             "places.priceRange",
             "places.paymentOptions",
@@ -1,4 +1,5 @@
 from place_index.generic_places import Restaurant, Contact, Features, Reviews
+from place_index.fetcher.provider import ProviderSource
 from place_index.metadatas import PriceLevel, Atmosphere
 
 gmaps_price_level_mapper = {
@@ -103,7 +104,7 @@ def gmaps_place_convertor(gmaps_place: dict) -> Restaurant:
             "internationalPhoneNumber", gmaps_place.get("nationalPhoneNumber", "")
         ),
         email="",
-        website=gmaps_place.get("website", ""),
+        website=gmaps_place.get("websiteUri", ""),
         address=gmaps_place.get("formattedAddress", ""),
         gmaps_uri=gmaps_place.get("googleMapsUri", ""),
         tripadvisor_uri="",
@@ -129,11 +130,15 @@ def gmaps_place_convertor(gmaps_place: dict) -> Restaurant:
             title="",
             content=review["text"].get("text", ""),
             publication_date=review.get("publishTime", ""),
+            author=review.get("authorAttribution", {}).get("displayName", ""),
+            provider=ProviderSource.GOOGLE_MAPS.value,
         )
         for review in gmaps_place.get("reviews", [])
         if "text" in review
     ]
 
+    place_location = gmaps_place.get("location", {})
+
     restaurant_atmosphere = [
         value for key, value in ATMOSPHERE_MAPPER.items() if gmaps_place.get(key, False)
     ]
@@ -149,4 +154,6 @@ def gmaps_place_convertor(gmaps_place: dict) -> Restaurant:
         reviews=place_reviews,
         atmosphere_target=restaurant_atmosphere,
         number_of_reviews=gmaps_place.get("userRatingCount", 0),
+        latitude=place_location.get("latitude", None),
+        longitude=place_location.get("longitude", None),
     )
@@ -0,0 +1,83 @@
+from collections import defaultdict
+from typing import Dict, Hashable, List
+
+
+class UnionFind:
+    """
+    Disjoint sets over the integers [0, size), with path halving and union by size.
+
+    Nodes can be anchored to an existing place: two sets anchored to different places
+    are never united, so a cluster folds into at most one existing place.
+    """
+
+    def __init__(self, size: int):
+        self.parents = list(range(size))
+        self.sizes = [1] * size
+        self.anchors: Dict[int, Hashable] = {}
+
+    def find(self, node: int) -> int:
+        """
+        Get the root of the set of a node
+        @param node:
+        @return:
+        """
+        while self.parents[node] != node:
+            self.parents[node] = self.parents[self.parents[node]]
+            node = self.parents[node]
+        return node
+
+    def anchor(self, node: int, anchor: Hashable) -> bool:
+        """
+        Anchor the set of a node to an existing place
+        @param node:
+        @param anchor:
+        @return: False if the set is already anchored to another place
+        """
+        root = self.find(node)
+        if self.anchors.get(root, anchor) != anchor:
+            return False
+
+        self.anchors[root] = anchor
+        return True
+
+    def anchor_of(self, node: int) -> Hashable | None:
+        return self.anchors.get(self.find(node))
+
+    def union(self, first: int, second: int) -> bool:
+        """
+        Unite the sets of two nodes
+        @param first:
+        @param second:
+        @return: False if the nodes were already together or anchored to different places
+        """
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return False
+
+        first_anchor, second_anchor = self.anchors.get(first), self.anchors.get(second)
+        if first_anchor is not None and second_anchor is not None:
+            if first_anchor != second_anchor:
+                return False
+
+        if self.sizes[first] < self.sizes[second]:
+            first, second = second, first
+
+        self.parents[second] = first
+        self.sizes[first] += self.sizes[second]
+        anchor = first_anchor if first_anchor is not None else second_anchor
+        if anchor is not None:
+            self.anchors[first] = anchor
+        self.anchors.pop(second, None)
+
+        return True
+
+    def clusters(self) -> List[List[int]]:
+        """
+        Get the sets, each sorted by node
+        @return:
+        """
+        clusters: Dict[int, List[int]] = defaultdict(list)
+        for node in range(len(self.parents)):
+            clusters[self.find(node)].append(node)
+
+        return list(clusters.values())
@@ -1,10 +1,15 @@
+import asyncio
+import hashlib
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Tuple
 
-from openai import OpenAI, AuthenticationError, APIConnectionError
+from place_index.merger.tag_cache import TagMergeCache
 
-from place_index import LLM_KEY
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+DEFAULT_MODEL = "deepseek-chat"
 
 
 @dataclass
@@ -12,9 +17,38 @@ class ExpectedAnswer:
     tags: List[str]
 
 
+@dataclass
+class ExpectedBatchAnswer:
+    results: List[ExpectedAnswer]
+
+    @classmethod
+    def from_json(cls, json_content: dict):
+        return cls(
+            results=[ExpectedAnswer(**result) for result in json_content["results"]]
+        )
+
+
 class LLMHandler:
-    def __init__(self):
-        self.client = OpenAI(base_url="https://api.deepseek.com", api_key=LLM_KEY)
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        api_key: str | None = None,
+        model: str = DEFAULT_MODEL,
+        pairs_per_request: int = 8,
+        max_concurrency: int = 4,
+        cache_path: str | None = None,
+        cache_max_entries: int = 100_000,
+    ):
+        from openai import OpenAI
+        from place_index import LLM_KEY
+
+        self.base_url = base_url
+        self.api_key = api_key or LLM_KEY
+        self.client = OpenAI(base_url=base_url, api_key=self.api_key)
+        # Several tag pairs are packed in a single prompt, and a bounded number of
+        # prompts are in flight at the same time
+        self.pairs_per_request = pairs_per_request
+        self.max_concurrency = max_concurrency
         self.merge_tags_prompt = """
         I will provide you with two lists of tags from different sources. These tags describe the type of cuisine or food offered by a place_index.
         Your task is to merge these lists into a single, cohesive list by selecting the most appropriate tags while avoiding redundancies or duplicates.
@@ -25,8 +59,37 @@ class LLMHandler:
 
         Expected OUTPUT JSON object: {tags: List[str]}
         """
+        self.merge_tags_batch_prompt = """
+        I will provide you with a JSON object {pairs: [{list_1: List[str], list_2: List[str]}]}.
+        Each pair holds two lists of tags from different sources. These tags describe the type of cuisine or food offered by a place_index.
+        Your task is to merge each pair, independently of the other pairs, into a single, cohesive list by selecting the most appropriate tags while avoiding redundancies or duplicates.
+        Ensure that each final list is coherent and accurately represents the style of cuisine or type of place_index.
+        The names of the tags should be uniform, starting with a capital letter and using spaces where necessary.
+        You should remove "point of interest" and "establishment", "place_index" and "food" from the tags:
+        exemple: "Italian place_index" -> "Italian"
 
-        self.model = "deepseek-chat"
+        Expected OUTPUT JSON object: {results: [{tags: List[str]}]}, with one result per pair, in the same order as the pairs
+        """
+
+        self.model = model
+        self.cache = (
+            TagMergeCache(cache_path, self.version, max_entries=cache_max_entries)
+            if cache_path
+            else None
+        )
+
+    @property
+    def version(self) -> str:
+        """
+        Version of the prompts and model, cached merges of another version are not reused
+        @return:
+        """
+        return hashlib.blake2b(
+            "\0".join(
+                [self.model, self.merge_tags_prompt, self.merge_tags_batch_prompt]
+            ).encode(),
+            digest_size=8,
+        ).hexdigest()
 
     def merge_tags(self, tags_1: List[str], tags_2: List[str]) -> List[str]:
         """
@@ -35,6 +98,13 @@ class LLMHandler:
         @param tags_2:
         @return:
         """
+        if self.cache is not None:
+            (cached_tags,), _ = self.cache.get_many([(tags_1, tags_2)])
+            if cached_tags is not None:
+                return cached_tags
+
+        from openai import AuthenticationError, APIConnectionError
+
         try:
             llm_answer = self.client.beta.chat.completions.parse(
                 model=self.model,
@@ -56,4 +126,195 @@ class LLMHandler:
             raise Exception("Error connecting to the LLM API.", e)
 
         json_content = json.loads(llm_answer.choices[0].message.content)
-        return ExpectedAnswer(**json_content).tags
+        tags = ExpectedAnswer(**json_content).tags
+        if self.cache is not None:
+            self.cache.put_many([(tags_1, tags_2)], [tags])
+
+        return tags
+
+    async def _merge_tags_request(
+        self,
+        client,
+        semaphore: asyncio.Semaphore,
+        pairs: List[Tuple[List[str], List[str]]],
+    ) -> List[List[str] | None]:
+        """
+        Merge several pairs of tag lists with a single request to the LLM
+        @param client: asynchronous OpenAI client
+        @param semaphore: bounds the number of requests in flight
+        @param pairs:
+        @return: merged tags of each pair, None when the request failed or the answer
+        is unusable
+        """
+        from openai import (
+            APIConnectionError,
+            AuthenticationError,
+            InternalServerError,
+            RateLimitError,
+        )
+
+        content = json.dumps(
+            {
+                "pairs": [
+                    {"list_1": tags_1, "list_2": tags_2} for tags_1, tags_2 in pairs
+                ]
+            }
+        )
+        async with semaphore:
+            try:
+                llm_answer = await client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": self.merge_tags_batch_prompt},
+                        {"role": "user", "content": content},
+                    ],
+                    response_format={"type": "json_object"},
+                )
+            except AuthenticationError as e:
+                raise Exception("Invalid LLM API key provided.", e)
+            except (
+                APIConnectionError,
+                RateLimitError,
+                InternalServerError,
+            ) as e:
+                # Transient errors (including timeouts) only lose the pairs of the request
+                logging.error(f"LLM merge of {len(pairs)} tag pairs failed: {e}")
+                return [None] * len(pairs)
+
+        try:
+            answer = ExpectedBatchAnswer.from_json(
+                json.loads(llm_answer.choices[0].message.content)
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            logging.warning(f"Invalid LLM answer for {len(pairs)} tag pairs: {e}")
+            return [None] * len(pairs)
+
+        if len(answer.results) != len(pairs):
+            logging.warning(
+                f"The LLM merged {len(answer.results)} tag pairs instead of {len(pairs)}"
+            )
+            return [None] * len(pairs)
+
+        return [result.tags for result in answer.results]
+
+    async def _send_batch(
+        self, pairs: List[Tuple[List[str], List[str]]]
+    ) -> List[List[str] | None]:
+        """
+        Merge pairs of tag lists, `pairs_per_request` pairs per prompt, with at most
+        `max_concurrency` requests in flight. A request failing with a transient error
+        only loses its own pairs, authentication and other errors are raised
+        @param pairs:
+        @return: merged tags of each pair, None when the answer is unusable
+        """
+        from openai import AsyncOpenAI
+
+        chunks = [
+            pairs[start : start + self.pairs_per_request]
+            for start in range(0, len(pairs), self.pairs_per_request)
+        ]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with AsyncOpenAI(base_url=self.base_url, api_key=self.api_key) as client:
+            answers = await asyncio.gather(
+                *(
+                    self._merge_tags_request(client, semaphore, chunk)
+                    for chunk in chunks
+                )
+            )
+
+        return [tags for answer in answers for tags in answer]
+
+    @staticmethod
+    def _run(coroutine):
+        """
+        Run a coroutine from synchronous code. Inside a running event loop, it is run
+        by a separate thread with its own loop, the calling thread waiting for it
+        @param coroutine:
+        @return: result of the coroutine
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    def _cached_merges(
+        self, pairs: List[Tuple[List[str], List[str]]]
+    ) -> Tuple[List[List[str] | None], List[List[int]]]:
+        """
+        Look up the merges of pairs of tag lists in the cache
+        @param pairs:
+        @return: merged tags of each pair (None if missing), and the indexes of the
+        missing pairs, grouped by pair (pairs repeated in the batch are only sent once)
+        """
+        if self.cache is None:
+            return [None] * len(pairs), [[idx] for idx in range(len(pairs))]
+
+        results, missing = self.cache.get_many(pairs)
+        missing_by_key: Dict[bytes, List[int]] = {}
+        for idx in missing:
+            missing_by_key.setdefault(self.cache.key(*pairs[idx]), []).append(idx)
+
+        return results, list(missing_by_key.values())
+
+    def _store_merges(
+        self,
+        pairs: List[Tuple[List[str], List[str]]],
+        results: List[List[str] | None],
+        missing: List[List[int]],
+        merged_tags: List[List[str] | None],
+    ):
+        """
+        Fill the results with the merges sent to the LLM, and cache them
+        @param pairs:
+        @param results: merged tags of each pair, completed in place
+        @param missing: indexes of the pairs sent, as given by _cached_merges
+        @param merged_tags: merged tags of each pair sent
+        @return:
+        """
+        for indexes, tags in zip(missing, merged_tags):
+            for idx in indexes:
+                results[idx] = tags
+
+        if self.cache is not None:
+            self.cache.put_many([pairs[indexes[0]] for indexes in missing], merged_tags)
+            logging.debug(
+                f"Tag merge cache: {self.cache.hits} hits, {self.cache.misses} misses"
+            )
+
+    async def merge_tags_batch_async(
+        self, pairs: List[Tuple[List[str], List[str]]]
+    ) -> List[List[str] | None]:
+        """
+        Merge pairs of tag lists concurrently, from asynchronous code
+        @param pairs:
+        @return: merged tags of each pair, None when the answer is unusable
+        """
+        results, missing = self._cached_merges(pairs)
+        if missing:
+            merged_tags = await self._send_batch(
+                [pairs[indexes[0]] for indexes in missing]
+            )
+            self._store_merges(pairs, results, missing, merged_tags)
+
+        return results
+
+    def merge_tags_batch(
+        self, pairs: List[Tuple[List[str], List[str]]]
+    ) -> List[List[str] | None]:
+        """
+        Merge pairs of tag lists concurrently, from synchronous code. Inside an event
+        loop, merge_tags_batch_async does not block the loop
+        @param pairs:
+        @return: merged tags of each pair, None when the answer is unusable
+        """
+        results, missing = self._cached_merges(pairs)
+        if missing:
+            merged_tags = self._run(
+                self._send_batch([pairs[indexes[0]] for indexes in missing])
+            )
+            self._store_merges(pairs, results, missing, merged_tags)
+
+        return results
@@ -1,40 +1,334 @@
+import gzip
+import json
 import logging
-from typing import Dict, List, TypedDict
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, TypedDict
+
+import numpy as np
 
 from place_index.deduplication.deduplication import VectorDb, QueryResult
+from place_index.deduplication.key_matcher import KeyMatcher
+from place_index.deduplication.trigram_index import LexicalDecision, LexicalPrefilter
+from place_index.deduplication.vector_store import VectorStore
 from place_index.fetcher.provider import ProviderSource
+from place_index.deduplication.spatial_index import haversine
+from place_index.merger.clustering import UnionFind
 from place_index.merger.llm_handler import LLMHandler
+from place_index.merger.place_registry import PlaceRegistry
+from place_index.merger.review_store import ReviewStore
+from place_index.merger.tag_canonicalizer import TagCanonicalizer
 from place_index.generic_places import Restaurant
 
 
+# Version of the snapshot layout written by Merger.save
+SNAPSHOT_VERSION = 2
+
+
 class PlaceSource(TypedDict):
     gmaps_id: str
     tripadvisor_id: str
     source_provider: ProviderSource
 
 
-class Merger:
-    places: Dict[str, Restaurant] = {}
-    merged_places: Dict[str, PlaceSource] = {}
-    vector_db = VectorDb()
+def place_source_to_json(source: PlaceSource) -> Dict:
+    """
+    Serialize the provenance of a merged place, the provider by its value
+    :param source:
+    :return:
+    """
+    provider = source["source_provider"]
+    return {**source, "source_provider": None if provider is None else provider.value}
+
 
-    def __init__(self, use_llm: bool = False):
+def place_source_from_json(json_source: Dict) -> PlaceSource:
+    """
+    Deserialize the provenance of a merged place written by place_source_to_json
+    :param json_source:
+    :return:
+    """
+    provider = json_source["source_provider"]
+    return PlaceSource(
+        gmaps_id=json_source["gmaps_id"],
+        tripadvisor_id=json_source["tripadvisor_id"],
+        source_provider=None if provider is None else ProviderSource(provider),
+    )
+
+
+@dataclass
+class TagMergeJob:
+    restaurant: Restaurant
+    existing_tags: List[str]
+    new_tags: List[str]
+
+
+class Merger:
+    def __init__(
+        self,
+        use_llm: bool = False,
+        vector_db: VectorDb | None = None,
+        key_matcher: KeyMatcher | None = None,
+        lexical_prefilter: LexicalPrefilter | None = None,
+        use_lexical_prefilter: bool = True,
+        llm_handler: LLMHandler | None = None,
+        tag_canonicalizer: TagCanonicalizer | None = None,
+        canonicalize_tags: bool = True,
+        review_store: ReviewStore | None = None,
+        registry: PlaceRegistry | None = None,
+    ):
+        # The embedding model is only loaded by the first search needing an embedding
+        self.vector_db = vector_db or VectorDb()
+        self.key_matcher = key_matcher or KeyMatcher()
+        # The reranker normalizes national phone numbers like the key matcher
+        reranker = self.vector_db.reranker
+        if reranker is not None and reranker.default_country_code is None:
+            reranker.default_country_code = self.key_matcher.default_country_code
+        # Merged places by internal key, with lookups by provider id, URI and phone
+        self.registry = registry or PlaceRegistry(self.key_matcher.default_country_code)
+        self.merged_places: Dict[str, PlaceSource] = {}
+        self.lexical_prefilter = (
+            (lexical_prefilter or LexicalPrefilter()) if use_lexical_prefilter else None
+        )
         self.use_llm = use_llm
-        self.llm_handler = LLMHandler() if use_llm else None
+        self.llm_handler = (llm_handler or LLMHandler()) if use_llm else None
+        self.tag_canonicalizer = (
+            (tag_canonicalizer or TagCanonicalizer()) if canonicalize_tags else None
+        )
+        self.review_store = review_store or ReviewStore()
+        # LLM tag merges waiting to be sent, by place
+        self.tag_merge_jobs: Dict[int, TagMergeJob] = {}
         self.match_threshold = 0.35
 
-    def add_restaurants(self, restaurants: Dict[int, Restaurant]):
+    @property
+    def places(self) -> Dict[str, Restaurant]:
+        return self.registry.places
+
+    def close(self):
+        """
+        Embed and persist the deferred places, then stop the embedding workers, if any
+        :return:
+        """
+        self.vector_db.flush()
+        self.vector_db.close()
+
+    def __enter__(self) -> "Merger":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def known_match(self, restaurant: Restaurant) -> str | None:
+        """
+        Get the merged place of a provider record already registered, or of a place
+        sharing a deterministic key with it
+        :param restaurant:
+        :return: key of the merged place, None if there is no exact match
+        """
+        key = self.registry.resolve(restaurant)
+        if key is not None:
+            return key
+
+        return self.key_matcher.match(restaurant)
+
+    def add_restaurants(
+        self,
+        restaurants: Dict[int, Restaurant],
+        bulk: bool = True,
+        cluster: bool = False,
+    ):
         """
         Add a list of restaurants to the merger
         :param restaurants:
+        :param bulk: embed and match the whole batch at once instead of place by place
+        :param cluster: merge the batch by clustering, independently of the order of the places
         :return:
         """
-        for restaurant in restaurants.values():
-            self.add_restaurant(restaurant)
+        if cluster:
+            self.cluster_restaurants(list(restaurants.values()))
+            return
+
+        if not bulk:
+            for restaurant in restaurants.values():
+                self.add_restaurant(restaurant)
+            self.vector_db.flush()
+            self.merge_pending_tags()
+            return
+
+        # Places resolved by a deterministic key or by the lexical prefilter skip the embedding
+        batch = [
+            restaurant
+            for restaurant in restaurants.values()
+            if not self.resolve_without_embedding(restaurant)
+        ]
+
+        query_results, vectors = self.vector_db.get_restaurants(
+            batch, self.match_threshold
+        )
+
+        # Key of the merged place of each place of the batch, for the matches against
+        # earlier places of the batch
+        keys: List[str] = []
+        for restaurant, query_result, vector in zip(batch, query_results, vectors):
+            if query_result.batch_match >= 0:
+                query_result = QueryResult(
+                    keys[query_result.batch_match], query_result.distance
+                )
+
+            key_match = self.known_match(restaurant)
+            if key_match is not None:
+                key = self.merge_restaurant(restaurant, QueryResult(key_match, 0))
+            elif query_result.distance < self.match_threshold:
+                key = self.merge_restaurant(restaurant, query_result)
+            else:
+                key = self.insert_restaurant(restaurant, query_result, vector)
+            keys.append(key)
+
+        self.vector_db.flush()
+        self.merge_pending_tags()
+
+    def key_edges(self, restaurants: List[Restaurant]) -> Dict[Tuple[int, int], float]:
+        """
+        Get the pairs of places of a batch sharing a deterministic key: a provider URI,
+        or a phone number or website domain of exactly two nearby places (like the
+        single owner check of the key matcher, so the branches of a chain are not joined)
+        :param restaurants:
+        :return: score (0) of each pair of matching places, by (lowest, highest) index
+        """
+        uris: Dict[str, List[int]] = defaultdict(list)
+        shared_keys: Dict[str, List[int]] = defaultdict(list)
+        for idx, restaurant in enumerate(restaurants):
+            restaurant_uris, phone, domain = self.key_matcher.keys(restaurant)
+            for uri in restaurant_uris:
+                uris[uri].append(idx)
+            for key in (phone, domain):
+                if key:
+                    shared_keys[key].append(idx)
+
+        edges: Dict[Tuple[int, int], float] = {}
+        for indexes in uris.values():
+            for idx in indexes[1:]:
+                edges[(indexes[0], idx)] = 0
+
+        for indexes in shared_keys.values():
+            if len(indexes) != 2:
+                continue
+
+            first_place, second_place = (restaurants[idx] for idx in indexes)
+            if (
+                first_place.has_location()
+                and second_place.has_location()
+                and haversine(
+                    first_place.latitude,
+                    first_place.longitude,
+                    second_place.latitude,
+                    second_place.longitude,
+                )
+                <= self.key_matcher.max_distance
+            ):
+                edges[(indexes[0], indexes[1])] = 0
+
+        return edges
+
+    def cluster_restaurants(self, restaurants: List[Restaurant]):
+        """
+        Merge a batch of places by clustering: the candidate matches of the batch (with
+        the existing places and between the places of the batch) are computed first, then
+        the clusters of matching places are folded, each into its existing place or into
+        a new place. The result does not depend on the order of the places.
+        :param restaurants:
+        :return:
+        """
+        vectors = self.vector_db.embed_deferred(restaurants)
+        if not restaurants:
+            self.vector_db.flush()
+            return
+
+        # Edges are (score, kind, place id, other id) so ties are broken by place ids
+        edges: List[Tuple[float, int, str, str, int, int | str]] = []
+
+        index_rows, index_scores = self.vector_db.search_index(restaurants, vectors)
+        for idx, restaurant in enumerate(restaurants):
+            key_match = self.known_match(restaurant)
+            if key_match is not None:
+                edges.append((0, 0, restaurant.id, key_match, idx, key_match))
+            elif index_rows[idx] >= 0 and index_scores[idx] < self.match_threshold:
+                match = self.vector_db.index.keys[index_rows[idx]]
+                edges.append(
+                    (float(index_scores[idx]), 0, restaurant.id, match, idx, match)
+                )
+
+        batch_edges = self.vector_db.batch_edges(
+            restaurants, vectors, self.match_threshold
+        )
+        for (first, second), score in self.key_edges(restaurants).items():
+            batch_edges[(first, second)] = min(
+                score, batch_edges.get((first, second), score)
+            )
+        for (first, second), score in batch_edges.items():
+            first_id, second_id = sorted(
+                [restaurants[first].id, restaurants[second].id]
+            )
+            edges.append((score, 1, first_id, second_id, first, second))
+
+        # Strongest edges first, a cluster never joins two existing places
+        union_find = UnionFind(len(restaurants))
+        best_scores = [1.0] * len(restaurants)
+        for score, kind, _, _, first, second in sorted(
+            edges, key=lambda edge: edge[:4]
+        ):
+            joined = (
+                union_find.anchor(first, second)
+                if kind == 0
+                else union_find.union(first, second)
+            )
+            if joined:
+                best_scores[first] = min(best_scores[first], score)
+                if kind == 1:
+                    best_scores[second] = min(best_scores[second], score)
+
+        for cluster in union_find.clusters():
+            members = sorted(cluster, key=lambda idx: restaurants[idx].id)
+            match = union_find.anchor_of(members[0])
+            if match is None:
+                # The most reviewed place of a new cluster becomes the merged place
+                representative = min(
+                    members,
+                    key=lambda idx: (
+                        -restaurants[idx].number_of_reviews,
+                        restaurants[idx].id,
+                    ),
+                )
+                members.remove(representative)
+                match = self.insert_restaurant(
+                    restaurants[representative],
+                    QueryResult("", 1),
+                    vectors[representative],
+                )
+
+            for idx in members:
+                self.merge_restaurant(
+                    restaurants[idx], QueryResult(match, best_scores[idx])
+                )
+
+        logging.info(
+            f"Clustered {len(restaurants)} places with {len(edges)} candidate edges"
+        )
+
+        self.vector_db.flush()
+        self.merge_pending_tags()
 
     def merge_tags(self, existing_restaurant: Restaurant, new_restaurant: Restaurant):
-        if self.use_llm:
-            new_tags = self.llm_handler.merge_tags(
+        """
+        Merge the tags of two restaurants, as canonical tags unless canonicalization is
+        disabled. With the LLM, this merge is kept until the queued LLM merge is applied
+        by merge_pending_tags
+        @param existing_restaurant:
+        @param new_restaurant:
+        @return:
+        """
+        if self.tag_canonicalizer is not None:
+            new_tags = self.tag_canonicalizer.merge(
                 existing_restaurant.types, new_restaurant.types
             )
         else:
@@ -42,11 +336,84 @@ class Merger:
                 existing_restaurant.types, new_restaurant.types
             )
 
+        if self.use_llm:
+            job = self.tag_merge_jobs.get(id(existing_restaurant))
+            if job is None:
+                self.tag_merge_jobs[id(existing_restaurant)] = TagMergeJob(
+                    existing_restaurant,
+                    list(existing_restaurant.types),
+                    list(new_restaurant.types),
+                )
+            else:
+                job.new_tags = self.merge_list_unique(
+                    job.new_tags, new_restaurant.types
+                )
+
         logging.debug(
             f"Merging tags: {existing_restaurant.types} with {new_restaurant.types} -> {new_tags}"
         )
         existing_restaurant.types = new_tags
 
+    def merge_pending_tags(self):
+        """
+        Send the queued tag merges to the LLM, in batches of concurrent requests, and
+        apply the merged tags to the places
+        @return:
+        """
+        if not self.tag_merge_jobs:
+            return
+
+        jobs = self._take_tag_merge_jobs()
+        self._apply_merged_tags(
+            jobs,
+            self.llm_handler.merge_tags_batch(
+                [(job.existing_tags, job.new_tags) for job in jobs]
+            ),
+        )
+
+    async def merge_pending_tags_async(self):
+        """
+        Send the queued tag merges to the LLM from asynchronous code, without blocking
+        the running event loop, and apply the merged tags to the places
+        @return:
+        """
+        if not self.tag_merge_jobs:
+            return
+
+        jobs = self._take_tag_merge_jobs()
+        self._apply_merged_tags(
+            jobs,
+            await self.llm_handler.merge_tags_batch_async(
+                [(job.existing_tags, job.new_tags) for job in jobs]
+            ),
+        )
+
+    def _take_tag_merge_jobs(self) -> List[TagMergeJob]:
+        """
+        Empty the queue of tag merges
+        @return: the queued tag merges
+        """
+        jobs = list(self.tag_merge_jobs.values())
+        self.tag_merge_jobs = {}
+        return jobs
+
+    def _apply_merged_tags(
+        self, jobs: List[TagMergeJob], merged_tags: List[List[str] | None]
+    ):
+        """
+        Apply the tags merged by the LLM to the places
+        @param jobs:
+        @param merged_tags: merged tags of each job, None when the LLM merge failed
+        @return:
+        """
+        for job, tags in zip(jobs, merged_tags):
+            # The union of the tags is kept when the LLM answer is unusable
+            if tags is not None:
+                job.restaurant.types = tags
+        self.registry.version += 1
+
+        logging.info(f"Merged the tags of {len(jobs)} places with the LLM")
+
     @staticmethod
     def merge_contacts(existing_restaurant: Restaurant, new_restaurant: Restaurant):
         """
@@ -75,6 +442,18 @@ class Merger:
             or new_restaurant.contact.tripadvisor_uri
         )
 
+    @staticmethod
+    def merge_location(existing_restaurant: Restaurant, new_restaurant: Restaurant):
+        """
+        Keep the coordinates of the existing place, or take the new ones if unknown
+        @param existing_restaurant:
+        @param new_restaurant:
+        @return:
+        """
+        if not existing_restaurant.has_location():
+            existing_restaurant.latitude = new_restaurant.latitude
+            existing_restaurant.longitude = new_restaurant.longitude
+
     @staticmethod
     def merge_list_unique(first_list: List, second_list: List) -> List:
         """
@@ -93,48 +472,22 @@ class Merger:
         @param new_restaurant:
         @return:
         """
-        existing_restaurant.features.credit_card = (
-            existing_restaurant.features.credit_card
-            or new_restaurant.features.credit_card
-        )
-        existing_restaurant.features.serve_alcohol = (
-            existing_restaurant.features.serve_alcohol
-            or new_restaurant.features.serve_alcohol
-        )
-        existing_restaurant.features.is_accessible = (
-            existing_restaurant.features.is_accessible
-            or new_restaurant.features.is_accessible
-        )
-        existing_restaurant.features.takeout = (
-            existing_restaurant.features.takeout or new_restaurant.features.takeout
-        )
-        existing_restaurant.features.seating = (
-            existing_restaurant.features.seating or new_restaurant.features.seating
-        )
-        existing_restaurant.features.wifi = (
-            existing_restaurant.features.wifi or new_restaurant.features.wifi
-        )
-        existing_restaurant.features.reservation = (
-            existing_restaurant.features.reservation
-            or new_restaurant.features.reservation
-        )
-        existing_restaurant.features.parking = (
-            existing_restaurant.features.parking or new_restaurant.features.parking
-        )
-        existing_restaurant.features.dog_allowed = (
-            existing_restaurant.features.dog_allowed
-            or new_restaurant.features.dog_allowed
-        )
+        existing_restaurant.features |= new_restaurant.features
 
-    @staticmethod
-    def merge_reviews(existing_restaurant: Restaurant, new_restaurant: Restaurant):
+    def merge_reviews(
+        self, existing_restaurant: Restaurant, new_restaurant: Restaurant, key: str
+    ):
         """
-        Merge the reviews of two restaurants
+        Merge the reviews of two restaurants, without duplicates and within the
+        retention policy of the review store
         @param existing_restaurant:
         @param new_restaurant:
+        @param key: key of the existing restaurant
         @return:
         """
-        existing_restaurant.reviews += new_restaurant.reviews
+        existing_restaurant.reviews = self.review_store.merge(
+            key, existing_restaurant.reviews, new_restaurant.reviews
+        )
 
     @staticmethod
     def get_provider_type(restaurant: Restaurant) -> ProviderSource:
@@ -168,6 +521,112 @@ class Merger:
 
         return rating * existing_rating_ratio + new_rating * restaurant_rating_ratio
 
+    def merge_restaurant(
+        self, restaurant: Restaurant, query_result: QueryResult
+    ) -> str:
+        """
+        Merge a place into the existing place it matched
+        @param restaurant:
+        @param query_result:
+        @return: key of the existing place
+        """
+        existing_restaurant = self.places[query_result.match]
+        logging.info(
+            f"Found a match with {existing_restaurant.name} with {restaurant.name}. Distance: {query_result.distance}"
+            f"Address: {existing_restaurant.contact.address} -> {restaurant.contact.address}"
+        )
+
+        self.merge_tags(existing_restaurant, restaurant)
+        self.merge_contacts(existing_restaurant, restaurant)
+        self.merge_location(existing_restaurant, restaurant)
+        self.merge_features(existing_restaurant, restaurant)
+        self.merge_reviews(existing_restaurant, restaurant, query_result.match)
+
+        existing_restaurant.atmosphere_bits |= restaurant.atmosphere_bits
+        existing_restaurant.price_level_bits |= restaurant.price_level_bits
+
+        existing_restaurant.rating = self.merge_rating(
+            existing_restaurant.rating,
+            restaurant.rating,
+            existing_restaurant.number_of_reviews,
+            restaurant.number_of_reviews,
+        )
+
+        existing_restaurant.number_of_reviews += restaurant.number_of_reviews
+
+        self.key_matcher.add(existing_restaurant, query_result.match)
+        self.registry.register(query_result.match, restaurant)
+        self.vector_db.update_restaurant(query_result.match, existing_restaurant)
+
+        source_provider = self.get_provider_type(restaurant)
+        self.merged_places[restaurant.id] = PlaceSource(
+            gmaps_id=existing_restaurant.contact.gmaps_uri,
+            tripadvisor_id=existing_restaurant.contact.tripadvisor_uri,
+            source_provider=source_provider,
+        )
+
+        return query_result.match
+
+    def insert_restaurant(
+        self,
+        restaurant: Restaurant,
+        query_result: QueryResult,
+        vector: np.ndarray = None,
+        defer: bool = False,
+    ) -> str:
+        """
+        Insert a place without relevant match as a new place
+        @param restaurant:
+        @param query_result:
+        @param vector: embedding of the place, computed if not provided
+        @param defer: postpone the embedding of the place until the next search
+        @return: key of the new place
+        """
+        logging.debug(
+            f"Adding {restaurant.name} to the database, no relevant match found. Distance: {query_result.distance}"
+        )
+
+        if self.tag_canonicalizer is not None:
+            restaurant.types = self.tag_canonicalizer.merge(restaurant.types, [])
+        key = self.registry.insert(restaurant)
+        restaurant.reviews = self.review_store.merge(key, [], restaurant.reviews)
+
+        self.vector_db.add_restaurant(restaurant, vector, defer=defer, key=key)
+        self.key_matcher.add(restaurant, key)
+        if self.lexical_prefilter is not None:
+            self.lexical_prefilter.add(restaurant, key)
+
+        return key
+
+    def resolve_without_embedding(self, restaurant: Restaurant) -> bool:
+        """
+        Merge or insert a place using deterministic keys and the lexical prefilter only
+        :param restaurant:
+        :return: True if the place was resolved, False if it needs an embedding search
+        """
+        key_match = self.known_match(restaurant)
+        if key_match is not None:
+            self.merge_restaurant(restaurant, QueryResult(key_match, 0))
+            return True
+
+        if self.lexical_prefilter is None:
+            return False
+
+        lexical_result = self.lexical_prefilter.check(restaurant)
+        match lexical_result.decision:
+            case LexicalDecision.MATCH:
+                self.merge_restaurant(
+                    restaurant,
+                    QueryResult(lexical_result.match, 1 - lexical_result.score),
+                )
+                return True
+            case LexicalDecision.NEW:
+                # The embedding is only computed when a later search needs it
+                self.insert_restaurant(restaurant, QueryResult("", 1), defer=True)
+                return True
+
+        return False
+
     def add_restaurant(self, restaurant: Restaurant):
         """
         Add a place to the merger
@@ -176,46 +635,112 @@ class Merger:
         """
         logging.debug(f"Trying to add {restaurant.name}")
 
+        if self.resolve_without_embedding(restaurant):
+            return
+
         query_result: QueryResult = self.vector_db.get_restaurant(restaurant)
 
         if query_result.distance < self.match_threshold:
-            existing_restaurant = self.places[query_result.match]
-            logging.info(
-                f"Found a match with {existing_restaurant.name} with {restaurant.name}. Distance: {query_result.distance}"
-                f"Address: {existing_restaurant.contact.address} -> {restaurant.contact.address}"
-            )
+            self.merge_restaurant(restaurant, query_result)
+        else:
+            self.insert_restaurant(restaurant, query_result)
 
-            self.merge_tags(existing_restaurant, restaurant)
-            self.merge_contacts(existing_restaurant, restaurant)
-            self.merge_features(existing_restaurant, restaurant)
-            self.merge_reviews(existing_restaurant, restaurant)
+    def save(self, path: str):
+        """
+        Write a snapshot of the merger to a directory: the places and their provenance
+        (gzipped JSON) and the vector store (raw vectors, memory-mapped on load)
+        :param path:
+        :return:
+        """
+        self.vector_db.flush()
+        self.merge_pending_tags()
 
-            existing_restaurant.atmosphere_target = self.merge_list_unique(
-                existing_restaurant.atmosphere_target, restaurant.atmosphere_target
-            )
-            existing_restaurant.price_level = self.merge_list_unique(
-                existing_restaurant.price_level, restaurant.price_level
+        os.makedirs(path, exist_ok=True)
+        self.vector_db.index.store.save(os.path.join(path, "vectors"))
+
+        with gzip.open(os.path.join(path, "places.json.gz"), "wt") as places_file:
+            json.dump(
+                {
+                    "places": {
+                        key: restaurant.to_json()
+                        for key, restaurant in self.places.items()
+                    },
+                    "merged_places": {
+                        place_id: place_source_to_json(source)
+                        for place_id, source in self.merged_places.items()
+                    },
+                    "registry": self.registry.to_json(),
+                },
+                places_file,
             )
 
-            existing_restaurant.rating = self.merge_rating(
-                existing_restaurant.rating,
-                restaurant.rating,
-                existing_restaurant.number_of_reviews,
-                restaurant.number_of_reviews,
+        # Written last, a snapshot without metadata is incomplete
+        with open(os.path.join(path, "metadata.json"), "w") as metadata_file:
+            json.dump(
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "model_name": self.vector_db.model_name,
+                    "places": len(self.places),
+                    "vectors": len(self.vector_db.index),
+                },
+                metadata_file,
             )
 
-            existing_restaurant.number_of_reviews += restaurant.number_of_reviews
+        logging.info(f"Saved {len(self.places)} places to {path}")
+
+    @classmethod
+    def load(
+        cls, path: str, vector_db_options: Dict | None = None, **merger_options
+    ) -> "Merger":
+        """
+        Resume a merger from a snapshot written by save. The vectors are memory-mapped
+        copy-on-write: the snapshot is left unchanged until it is saved again.
+        :param path:
+        :param vector_db_options: options of the VectorDb of the merger
+        :param merger_options: options of the merger
+        :return:
+        """
+        with open(os.path.join(path, "metadata.json")) as metadata_file:
+            metadata = json.load(metadata_file)
 
-            source_provider = self.get_provider_type(restaurant)
-            self.merged_places[restaurant.id] = PlaceSource(
-                gmaps_id=existing_restaurant.contact.gmaps_uri,
-                tripadvisor_id=existing_restaurant.contact.tripadvisor_uri,
-                source_provider=source_provider,
+        if metadata["version"] != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot version {metadata['version']}, expected {SNAPSHOT_VERSION}"
             )
-        else:
-            logging.debug(
-                f"Adding {restaurant.name} to the database, no relevant match found. Distance: {query_result.distance}"
+
+        vector_db_options = dict(vector_db_options or {})
+        model_name = vector_db_options.setdefault("model_name", metadata["model_name"])
+        if model_name != metadata["model_name"]:
+            raise ValueError(
+                f"The snapshot was embedded with {metadata['model_name']}, not {model_name}"
             )
 
-            self.vector_db.add_restaurant(restaurant)
-            self.places[restaurant.name] = restaurant
+        store = VectorStore.open(os.path.join(path, "vectors"), copy_on_write=True)
+        merger = cls(
+            vector_db=VectorDb(store=store, **vector_db_options), **merger_options
+        )
+
+        with gzip.open(os.path.join(path, "places.json.gz"), "rt") as places_file:
+            snapshot = json.load(places_file)
+
+        merger.registry.restore(
+            {
+                key: Restaurant.from_json(restaurant)
+                for key, restaurant in snapshot["places"].items()
+            },
+            snapshot["registry"],
+        )
+        merger.merged_places = {
+            place_id: place_source_from_json(source)
+            for place_id, source in snapshot["merged_places"].items()
+        }
+
+        for key, restaurant in merger.places.items():
+            merger.key_matcher.add(restaurant, key)
+            if merger.lexical_prefilter is not None:
+                merger.lexical_prefilter.add(restaurant, key)
+        merger.vector_db.restore_restaurants(merger.places)
+
+        logging.info(f"Loaded {len(merger.places)} places from {path}")
+
+        return merger
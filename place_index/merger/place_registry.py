@@ -0,0 +1,147 @@
+from collections import defaultdict
+from typing import Dict, Iterator, List, Set
+
+from place_index.deduplication.key_matcher import normalize_phone
+from place_index.generic_places import Restaurant
+
+
+class PlaceRegistry:
+    """
+    Merged places by stable internal key, with secondary hash indexes on the provider
+    records they were merged from.
+
+    Each merged place gets a key when it is inserted ("place-<n>"), which does not
+    change when other records are merged into it nor when places share a name. The ids,
+    URIs and normalized phone numbers of every provider record registered are indexed,
+    so resolving a provider record to its merged place is a dict lookup.
+    """
+
+    def __init__(self, default_country_code: str | None = None):
+        self.default_country_code = default_country_code
+        self.places: Dict[str, Restaurant] = {}
+        self.provider_ids: Dict[str, str] = {}
+        self.uris: Dict[str, str] = {}
+        # A phone number can be shared by several places (ex: branches of a chain)
+        self.phones: Dict[str, Set[str]] = defaultdict(set)
+        self.next_id = 0
+        # Incremented by every insert or merge, to rebuild the indexes built on the places
+        self.version = 0
+
+    def __len__(self):
+        return len(self.places)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.places
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.places)
+
+    def __getitem__(self, key: str) -> Restaurant:
+        return self.places[key]
+
+    def insert(self, restaurant: Restaurant) -> str:
+        """
+        Add a new merged place and index its provider record
+        @param restaurant:
+        @return: key of the place
+        """
+        key = f"place-{self.next_id}"
+        self.next_id += 1
+        self.places[key] = restaurant
+        self.register(key, restaurant)
+
+        return key
+
+    def register(self, key: str, restaurant: Restaurant):
+        """
+        Index the provider ids, URIs and phone of a record of a merged place (after an
+        insert or a merge). The indexes are only extended, the previous records of the
+        place are still resolved to it
+        @param key: key of the merged place
+        @param restaurant: provider record, or the merged place itself
+        @return:
+        """
+        self.version += 1
+        if restaurant.id:
+            self.provider_ids[restaurant.id] = key
+        for uri in (restaurant.contact.gmaps_uri, restaurant.contact.tripadvisor_uri):
+            if uri:
+                self.uris[uri] = key
+
+        phone = normalize_phone(restaurant.contact.phone, self.default_country_code)
+        if phone:
+            self.phones[phone].add(key)
+
+    def by_provider_id(self, provider_id: str) -> Restaurant | None:
+        """
+        Get the merged place of a Google Maps place id or TripAdvisor location id
+        @param provider_id:
+        @return:
+        """
+        key = self.provider_ids.get(provider_id)
+        return None if key is None else self.places[key]
+
+    def by_uri(self, uri: str) -> Restaurant | None:
+        """
+        Get the merged place of a Google Maps or TripAdvisor URI
+        @param uri:
+        @return:
+        """
+        key = self.uris.get(uri)
+        return None if key is None else self.places[key]
+
+    def by_phone(self, phone: str) -> List[Restaurant]:
+        """
+        Get the merged places of a phone number, in any format
+        @param phone:
+        @return:
+        """
+        normalized = normalize_phone(phone, self.default_country_code)
+        if not normalized:
+            return []
+
+        return [self.places[key] for key in sorted(self.phones.get(normalized, ()))]
+
+    def resolve(self, restaurant: Restaurant) -> str | None:
+        """
+        Get the merged place of a provider record from its provider id or URIs, for
+        example a record fetched again by a re-crawl
+        @param restaurant:
+        @return: key of the merged place, None if the record is unknown
+        """
+        if restaurant.id in self.provider_ids:
+            return self.provider_ids[restaurant.id]
+
+        for uri in (restaurant.contact.gmaps_uri, restaurant.contact.tripadvisor_uri):
+            if uri in self.uris:
+                return self.uris[uri]
+
+        return None
+
+    def to_json(self) -> dict:
+        """
+        Convert the indexes to a JSON compatible dict, the places are saved apart
+        @return:
+        """
+        return {
+            "next_id": self.next_id,
+            "provider_ids": self.provider_ids,
+            "uris": self.uris,
+            "phones": {phone: sorted(keys) for phone, keys in self.phones.items()},
+        }
+
+    def restore(self, places: Dict[str, Restaurant], json: dict):
+        """
+        Restore the places and indexes saved by to_json
+        @param places: merged places, by key
+        @param json:
+        @return:
+        """
+        self.places = places
+        self.version += 1
+        self.next_id = json["next_id"]
+        self.provider_ids = json["provider_ids"]
+        self.uris = json["uris"]
+        self.phones = defaultdict(set)
+        for phone, keys in json["phones"].items():
+            self.phones[phone].update(keys)
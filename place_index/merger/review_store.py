@@ -0,0 +1,152 @@
+import hashlib
+import logging
+from collections import defaultdict
+from enum import Enum
+from typing import Dict, List, Set
+
+from place_index.deduplication.embedding_cache import normalize_text
+from place_index.generic_places import Reviews
+
+
+class ReviewRetention(Enum):
+    NEWEST = "newest"
+    STRATIFIED = "stratified"
+
+
+def review_fingerprint(review: Reviews) -> bytes:
+    """
+    Fingerprint of a review: hash of its provider, author, date and normalized text
+    @param review:
+    @return:
+    """
+    return hashlib.blake2b(
+        "\0".join(
+            [
+                review.provider,
+                normalize_text(review.author or ""),
+                review.publication_date or "",
+                normalize_text(review.content or ""),
+            ]
+        ).encode(),
+        digest_size=8,
+    ).digest()
+
+
+def newest_first(reviews: List[Reviews]) -> List[Reviews]:
+    # Provider dates are ISO 8601, so they sort as strings
+    return sorted(
+        reviews, key=lambda review: review.publication_date or "", reverse=True
+    )
+
+
+class ReviewStore:
+    """
+    Deduplication and retention of the reviews of merged places.
+
+    The fingerprints of the reviews seen for each place are kept, so a review already
+    seen is rejected in O(1), even if it was dropped by the retention policy since.
+    When `max_reviews` is set, each place keeps at most `max_reviews` reviews: the
+    newest ones, or a sample stratified by rating (the newest of each rating).
+    """
+
+    def __init__(
+        self,
+        max_reviews: int | None = None,
+        retention: ReviewRetention = ReviewRetention.NEWEST,
+    ):
+        self.max_reviews = max_reviews
+        self.retention = retention
+        self.fingerprints: Dict[str, Set[bytes]] = {}
+        self.rejected = 0
+
+    def merge(
+        self, key: str, reviews: List[Reviews], new_reviews: List[Reviews]
+    ) -> List[Reviews]:
+        """
+        Add the new reviews of a place to its reviews, without the reviews already seen
+        @param key: key of the place in the merger
+        @param reviews: reviews of the place
+        @param new_reviews:
+        @return: the reviews kept by the retention policy
+        """
+        seen = self.fingerprints.get(key)
+        if seen is None:
+            # Places inserted or loaded before their first merge
+            seen = self.fingerprints[key] = set()
+            reviews = self.unique(seen, reviews)
+
+        reviews = reviews + self.unique(seen, new_reviews)
+
+        return self.retain(reviews)
+
+    def unique(self, seen: Set[bytes], reviews: List[Reviews]) -> List[Reviews]:
+        """
+        Filter the reviews already seen, and add the others to the seen fingerprints
+        @param seen:
+        @param reviews:
+        @return:
+        """
+        unique_reviews = []
+        for review in reviews:
+            fingerprint = review_fingerprint(review)
+            if fingerprint in seen:
+                self.rejected += 1
+                continue
+
+            seen.add(fingerprint)
+            unique_reviews.append(review)
+
+        return unique_reviews
+
+    def retain(self, reviews: List[Reviews]) -> List[Reviews]:
+        """
+        Apply the retention policy to the reviews of a place
+        @param reviews:
+        @return:
+        """
+        if self.max_reviews is None or len(reviews) <= self.max_reviews:
+            return reviews
+
+        if self.retention == ReviewRetention.NEWEST:
+            return newest_first(reviews)[: self.max_reviews]
+
+        return self.stratified_sample(reviews)
+
+    def stratified_sample(self, reviews: List[Reviews]) -> List[Reviews]:
+        """
+        Keep `max_reviews` reviews, the newest of each rating. Each rating keeps one
+        review (when possible), the rest is shared between the ratings in proportion to
+        their number of reviews (largest remainder)
+        @param reviews:
+        @return:
+        """
+        strata: Dict[int, List[Reviews]] = defaultdict(list)
+        for review in reviews:
+            strata[round(review.rating)].append(review)
+
+        base = 1 if len(strata) <= self.max_reviews else 0
+        budget = self.max_reviews - base * len(strata)
+        total = len(reviews) - base * len(strata)
+        quotas = {
+            rating: (len(stratum) - base) * budget / total
+            for rating, stratum in strata.items()
+        }
+        counts = {rating: base + int(quota) for rating, quota in quotas.items()}
+        remaining = self.max_reviews - sum(counts.values())
+        for rating in sorted(
+            quotas,
+            key=lambda rating: (quotas[rating] - int(quotas[rating]), rating),
+            reverse=True,
+        )[:remaining]:
+            counts[rating] += 1
+
+        sample = [
+            review
+            for rating, stratum in strata.items()
+            for review in newest_first(stratum)[: counts[rating]]
+        ]
+        logging.debug(
+            f"Kept {len(sample)} of {len(reviews)} reviews over {len(strata)} ratings"
+        )
+
+        return newest_first(sample)
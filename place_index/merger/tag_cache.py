@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import sqlite3
+from typing import List, Tuple
+
+from place_index.deduplication.embedding_cache import KEY_SIZE, normalize_text
+
+# Number of keys per SQL query, below the SQLite limit of bound parameters
+QUERY_CHUNK_SIZE = 500
+
+
+def canonical_tags(tags: List[str]) -> Tuple[str, ...]:
+    """
+    Canonical form of a tag list: normalized, deduplicated and sorted
+    @param tags:
+    @return:
+    """
+    return tuple(sorted({normalize_text(tag.replace("_", " ")) for tag in tags}))
+
+
+class TagMergeCache:
+    """
+    Persistent cache of LLM tag merges, in a SQLite database.
+
+    Entries are keyed by a hash of the canonical pair of tag lists, which does not depend
+    on the order of the lists nor of their tags, and of the version of the prompt and model.
+    When `max_entries` is exceeded, the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        version: str,
+        max_entries: int = 100_000,
+        eviction_ratio: float = 0.1,
+    ):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.eviction_ratio = eviction_ratio
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS tag_merges "
+            "(key BLOB PRIMARY KEY, tags TEXT NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS tag_merges_last_used ON tag_merges (last_used)"
+        )
+        self.connection.commit()
+        (self._clock,) = self.connection.execute(
+            "SELECT COALESCE(MAX(last_used), 0) FROM tag_merges"
+        ).fetchone()
+
+    def __len__(self):
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM tag_merges").fetchone()
+        return count
+
+    def key(self, tags_1: List[str], tags_2: List[str]) -> bytes:
+        """
+        Get the cache key of a pair of tag lists
+        @param tags_1:
+        @param tags_2:
+        @return:
+        """
+        pair = sorted([canonical_tags(tags_1), canonical_tags(tags_2)])
+        return hashlib.blake2b(
+            json.dumps([self.version, pair]).encode(), digest_size=KEY_SIZE
+        ).digest()
+
+    def get_many(
+        self, pairs: List[Tuple[List[str], List[str]]]
+    ) -> Tuple[List[List[str] | None], List[int]]:
+        """
+        Get the cached merges of several pairs of tag lists
+        @param pairs:
+        @return: merged tags (None for missing pairs) and indexes of missing pairs
+        """
+        keys = [self.key(tags_1, tags_2) for tags_1, tags_2 in pairs]
+        cached = {}
+        for start in range(0, len(keys), QUERY_CHUNK_SIZE):
+            chunk = keys[start : start + QUERY_CHUNK_SIZE]
+            cached.update(
+                self.connection.execute(
+                    f"SELECT key, tags FROM tag_merges WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            )
+
+        results: List[List[str] | None] = [None] * len(pairs)
+        missing = []
+        for idx, key in enumerate(keys):
+            if key in cached:
+                results[idx] = json.loads(cached[key])
+            else:
+                missing.append(idx)
+
+        if cached:
+            self._clock += 1
+            self.connection.executemany(
+                "UPDATE tag_merges SET last_used = ? WHERE key = ?",
+                [(self._clock, key) for key in cached],
+            )
+            self.connection.commit()
+
+        self.hits += len(pairs) - len(missing)
+        self.misses += len(missing)
+
+        return results, missing
+
+    def put_many(
+        self, pairs: List[Tuple[List[str], List[str]]], results: List[List[str] | None]
+    ):
+        """
+        Store the merges of several pairs of tag lists, unusable (None) merges are skipped
+        @param pairs:
+        @param results:
+        @return:
+        """
+        entries = [
+            (self.key(tags_1, tags_2), json.dumps(tags))
+            for (tags_1, tags_2), tags in zip(pairs, results)
+            if tags is not None
+        ]
+        if not entries:
+            return
+
+        self._clock += 1
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO tag_merges (key, tags, last_used) VALUES (?, ?, ?)",
+            [(key, tags, self._clock) for key, tags in entries],
+        )
+        self._evict()
+        self.connection.commit()
+
+    def _evict(self):
+        """
+        Evict the least recently used entries if the cache is over its size
+        @return:
+        """
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return
+
+        # Entries written by the current operation are never evicted
+        to_evict = max(excess, int(self.max_entries * self.eviction_ratio))
+        evicted = self.connection.execute(
+            "DELETE FROM tag_merges WHERE key IN "
+            "(SELECT key FROM tag_merges WHERE last_used < ? ORDER BY last_used LIMIT ?)",
+            (self._clock, to_evict),
+        ).rowcount
+
+        logging.debug(f"Evicted {evicted} tag merges from the cache")
+
+    def close(self):
+        """
+        Close the database
+        @return:
+        """
+        self.connection.close()
@@ -0,0 +1,245 @@
+import re
+from typing import Dict, Iterable, List, Set
+
+from place_index.deduplication.embedding_cache import normalize_text
+
+# Tags describing any place, they carry no information about the cuisine
+GENERIC_TAGS = {
+    "restaurant",
+    "point of interest",
+    "establishment",
+    "food",
+    "place",
+    "store",
+}
+
+# Words removed at the end of a tag (ex: "italian_restaurant" -> "italian")
+GENERIC_SUFFIXES = ["restaurant", "shop", "place", "house"]
+
+# Normalized tag -> canonical tag
+SYNONYMS = {
+    "coffee": "cafe",
+    "coffee shop": "cafe",
+    "cafeteria": "cafe",
+    "pizzeria": "pizza",
+    "sushi bar": "sushi",
+    "steak": "steakhouse",
+    "steak house": "steakhouse",
+    "hamburger": "burger",
+    "burgers": "burger",
+    "ice cream shop": "ice cream",
+    "gelato": "ice cream",
+    "sandwich shop": "sandwich",
+    "sandwiches": "sandwich",
+    "breakfast": "brunch",
+    "brunch restaurant": "brunch",
+    "pub": "bar",
+    "bar and grill": "grill",
+    "barbecue": "bbq",
+    "korean barbecue": "korean",
+    "meal takeaway": "takeaway",
+    "take away": "takeaway",
+    "meal delivery": "delivery",
+    "vegetarian friendly": "vegetarian",
+    "vegan options": "vegan",
+    "gluten free options": "gluten free",
+    "fast food restaurant": "fast food",
+    "seafood restaurant": "seafood",
+    "wine": "wine bar",
+    "bakery shop": "bakery",
+    "patisserie": "bakery",
+    "dessert": "desserts",
+}
+
+# Values of the Google Maps `types` field related to food
+GOOGLE_TYPES = [
+    "american_restaurant",
+    "bakery",
+    "bar",
+    "barbecue_restaurant",
+    "brazilian_restaurant",
+    "breakfast_restaurant",
+    "brunch_restaurant",
+    "cafe",
+    "chinese_restaurant",
+    "coffee_shop",
+    "fast_food_restaurant",
+    "french_restaurant",
+    "greek_restaurant",
+    "hamburger_restaurant",
+    "ice_cream_shop",
+    "indian_restaurant",
+    "indonesian_restaurant",
+    "italian_restaurant",
+    "japanese_restaurant",
+    "korean_restaurant",
+    "lebanese_restaurant",
+    "meal_delivery",
+    "meal_takeaway",
+    "mediterranean_restaurant",
+    "mexican_restaurant",
+    "middle_eastern_restaurant",
+    "pizza_restaurant",
+    "ramen_restaurant",
+    "sandwich_shop",
+    "seafood_restaurant",
+    "spanish_restaurant",
+    "steak_house",
+    "sushi_restaurant",
+    "thai_restaurant",
+    "turkish_restaurant",
+    "vegan_restaurant",
+    "vegetarian_restaurant",
+    "vietnamese_restaurant",
+    "wine_bar",
+]
+
+# Localized names of the TripAdvisor `cuisine` field
+TRIPADVISOR_CUISINES = [
+    "American",
+    "Asian",
+    "Bar",
+    "Barbecue",
+    "Brew Pub",
+    "Cafe",
+    "Chinese",
+    "Contemporary",
+    "Deli",
+    "Diner",
+    "European",
+    "Fast Food",
+    "French",
+    "Fusion",
+    "Gluten Free Options",
+    "Greek",
+    "Grill",
+    "Healthy",
+    "Indian",
+    "International",
+    "Italian",
+    "Japanese",
+    "Korean",
+    "Lebanese",
+    "Mediterranean",
+    "Mexican",
+    "Middle Eastern",
+    "Pizza",
+    "Pub",
+    "Seafood",
+    "Spanish",
+    "Steakhouse",
+    "Street Food",
+    "Sushi",
+    "Thai",
+    "Turkish",
+    "Vegan Options",
+    "Vegetarian Friendly",
+    "Vietnamese",
+    "Wine Bar",
+]
+
+
+class TagVocabulary:
+    """
+    Interned vocabulary of canonical tags, each tag has a stable integer id
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        """
+        Get the id of a canonical tag, adding it to the vocabulary if needed
+        @param name:
+        @return:
+        """
+        tag_id = self.ids.get(name)
+        if tag_id is None:
+            tag_id = len(self.names)
+            self.ids[name] = tag_id
+            self.names.append(name)
+
+        return tag_id
+
+
+class TagCanonicalizer:
+    """
+    Offline canonicalization of place tags, a local alternative to the LLM tag merge.
+
+    Raw tags are normalized (unidecode, case and underscore folding, generic words
+    stripped), mapped through a synonym table and interned as integer ids, so merging
+    tags is a set union of ints. The vocabulary is seeded with the Google Maps types and
+    TripAdvisor cuisines, so the ids of the common tags are stable across runs.
+    """
+
+    def __init__(self, synonyms: Dict[str, str] | None = None):
+        self.synonyms = SYNONYMS if synonyms is None else synonyms
+        self.vocabulary = TagVocabulary()
+        # Raw tag -> canonical id, None for generic tags
+        self._raw_ids: Dict[str, int | None] = {}
+
+        for tag in GOOGLE_TYPES + TRIPADVISOR_CUISINES:
+            self.tag_id(tag)
+
+    def canonical_name(self, tag: str) -> str | None:
+        """
+        Apply the normalization rules and the synonym table to a raw tag
+        @param tag:
+        @return: the canonical tag, None if the tag is generic
+        """
+        name = normalize_text(re.sub(r"[_\-/]", " ", tag))
+        if name in self.synonyms:
+            return self.synonyms[name]
+        if name in GENERIC_TAGS or not name:
+            return None
+
+        for suffix in GENERIC_SUFFIXES:
+            if name.endswith(f" {suffix}"):
+                name = name.removesuffix(f" {suffix}")
+                break
+
+        return self.synonyms.get(name, name)
+
+    def tag_id(self, tag: str) -> int | None:
+        """
+        Get the id of a raw tag
+        @param tag:
+        @return: the id of its canonical tag, None if the tag is generic
+        """
+        if tag in self._raw_ids:
+            return self._raw_ids[tag]
+
+        name = self.canonical_name(tag)
+        tag_id = None if name is None else self.vocabulary.intern(name)
+        self._raw_ids[tag] = tag_id
+
+        return tag_id
+
+    def tag_ids(self, tags: Iterable[str]) -> Set[int]:
+        """
+        Get the ids of raw tags, without the generic tags
+        @param tags:
+        @return:
+        """
+        return {tag_id for tag_id in map(self.tag_id, tags) if tag_id is not None}
+
+    def names(self, tag_ids: Iterable[int]) -> List[str]:
+        """
+        Get the canonical tags of ids, sorted by id
+        @param tag_ids:
+        @return:
+        """
+        return [self.vocabulary.names[tag_id] for tag_id in sorted(tag_ids)]
+
+    def merge(self, tags_1: List[str], tags_2: List[str]) -> List[str]:
+        """
+        Merge two lists of raw tags into canonical tags without duplicates
+        @param tags_1:
+        @param tags_2:
+        @return:
+        """
+        return self.names(self.tag_ids(tags_1) | self.tag_ids(tags_2))
@@ -0,0 +1,26 @@
+from typing import Iterable
+
+import numpy as np
+
+
+def rows_to_bitset(rows: Iterable[int] | np.ndarray, size: int) -> int:
+    """
+    Pack rows in an int bitset, bit i being set when row i is present
+    @param rows:
+    @param size: number of rows of the table
+    @return:
+    """
+    present = np.zeros(size, dtype=bool)
+    present[np.asarray(rows, dtype=np.int64)] = True
+    return int.from_bytes(np.packbits(present, bitorder="little").tobytes(), "little")
+
+
+def bitset_to_rows(bitset: int, size: int) -> np.ndarray:
+    """
+    Unpack an int bitset to the sorted rows it contains
+    @param bitset:
+    @param size: number of rows of the table
+    @return:
+    """
+    packed = np.frombuffer(bitset.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, count=size, bitorder="little"))
@@ -0,0 +1,253 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+from place_index.deduplication.embedding_cache import normalize_text
+from place_index.generic_places import (
+    ATMOSPHERE_BITS,
+    PRICE_LEVEL_BITS,
+    Features,
+    Restaurant,
+)
+from place_index.merger.place_registry import PlaceRegistry
+from place_index.merger.tag_canonicalizer import TagCanonicalizer
+from place_index.metadatas import Atmosphere, PriceLevel
+from place_index.query.bitset import bitset_to_rows, rows_to_bitset
+
+
+@dataclass
+class PlaceQuery:
+    """
+    Filters of a query, empty filters match every place.
+
+    A place matches if it has one of the `types`, every one of the `features`, one of
+    the `price_levels` and one of the `atmospheres`, and if its rating and number of
+    reviews are in the (inclusive) bounds.
+    """
+
+    types: List[str] = field(default_factory=list)
+    features: List[str] = field(default_factory=list)
+    price_levels: List[PriceLevel] = field(default_factory=list)
+    atmospheres: List[Atmosphere] = field(default_factory=list)
+    min_rating: float | None = None
+    max_rating: float | None = None
+    min_reviews: int | None = None
+    max_reviews: int | None = None
+
+
+class SortedColumn:
+    """
+    Numeric column of the places, sorted so that a range filter is two binary searches
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.row_values = values
+        self.order = np.argsort(values, kind="stable")
+        self.values = values[self.order]
+
+    def rows(self, low: float | None, high: float | None) -> np.ndarray:
+        """
+        Get the rows whose value is in [low, high]
+        @param low: no lower bound if None
+        @param high: no upper bound if None
+        @return:
+        """
+        start = 0 if low is None else np.searchsorted(self.values, low, side="left")
+        end = (
+            len(self.values)
+            if high is None
+            else np.searchsorted(self.values, high, side="right")
+        )
+        return self.order[start:end]
+
+
+class QueryEngine:
+    """
+    Attribute queries over the merged places, with inverted indexes.
+
+    Each place is a row, and each tag, feature flag, price level and atmosphere has the
+    bitset of its rows (an int, bit i for row i). The ratings and numbers of reviews are
+    sorted columns. A query is answered by intersecting bitsets, without looking at the
+    places. The indexes are rebuilt on the first query after the registry changed.
+    """
+
+    def __init__(
+        self,
+        registry: PlaceRegistry,
+        tag_canonicalizer: TagCanonicalizer | None = None,
+    ):
+        self.registry = registry
+        self.tag_canonicalizer = tag_canonicalizer
+        self._version: int | None = None
+
+        self.keys: List[str] = []
+        self.places: List[Restaurant] = []
+        self.all_rows = 0
+        self.types: Dict[str, int] = {}
+        self.features: Dict[str, int] = {}
+        self.price_levels: Dict[PriceLevel, int] = {}
+        self.atmospheres: Dict[Atmosphere, int] = {}
+        self.ratings = SortedColumn(np.empty(0))
+        self.review_counts = SortedColumn(np.empty(0))
+
+    def __len__(self):
+        return len(self.places)
+
+    def type_name(self, tag: str) -> str | None:
+        """
+        Get the indexed name of a tag, its canonical name if there is a canonicalizer
+        @param tag:
+        @return: None for generic tags
+        """
+        if self.tag_canonicalizer is not None:
+            return self.tag_canonicalizer.canonical_name(tag)
+
+        return normalize_text(tag.replace("_", " ")) or None
+
+    def refresh(self):
+        """
+        Rebuild the indexes if the places changed since they were built
+        @return:
+        """
+        if self._version != self.registry.version:
+            self.build()
+
+    def build(self):
+        """
+        Build the indexes of the places of the registry
+        @return:
+        """
+        self.keys = list(self.registry.places)
+        self.places = list(self.registry.places.values())
+        size = len(self.places)
+        self.all_rows = (1 << size) - 1
+
+        type_rows: Dict[str, List[int]] = defaultdict(list)
+        for row, place in enumerate(self.places):
+            for name in {self.type_name(str(tag)) for tag in place.types}:
+                if name is not None:
+                    type_rows[name].append(row)
+        self.types = {
+            name: rows_to_bitset(rows, size) for name, rows in type_rows.items()
+        }
+
+        def flag_bitsets(masks: List[int], bits: Dict) -> Dict:
+            masks = np.array(masks, dtype=np.int64)
+            return {
+                member: rows_to_bitset(np.flatnonzero(masks & bit), size)
+                for member, bit in bits.items()
+            }
+
+        self.features = flag_bitsets(
+            [place.features.mask for place in self.places],
+            {flag: 1 << bit for bit, flag in enumerate(Features.FLAGS)},
+        )
+        self.price_levels = flag_bitsets(
+            [place.price_level_bits for place in self.places], PRICE_LEVEL_BITS
+        )
+        self.atmospheres = flag_bitsets(
+            [place.atmosphere_bits for place in self.places], ATMOSPHERE_BITS
+        )
+
+        self.ratings = SortedColumn(
+            np.array([place.rating for place in self.places], dtype=np.float64)
+        )
+        self.review_counts = SortedColumn(
+            np.array([place.number_of_reviews for place in self.places], dtype=np.int64)
+        )
+
+        self._version = self.registry.version
+        logging.debug(f"Indexed {size} places with {len(self.types)} tags")
+
+    @staticmethod
+    def any_of(index: Dict, values: List) -> int:
+        """
+        Union of the bitsets of several values of an index
+        @param index:
+        @param values:
+        @return:
+        """
+        bitset = 0
+        for value in values:
+            bitset |= index.get(value, 0)
+        return bitset
+
+    def filter(self, query: PlaceQuery) -> int:
+        """
+        Get the bitset of the rows matching a query
+        @param query:
+        @return:
+        """
+        self.refresh()
+        size = len(self.places)
+        bitset = self.all_rows
+
+        if query.types:
+            bitset &= self.any_of(
+                self.types, [self.type_name(place_type) for place_type in query.types]
+            )
+
+        for feature in query.features:
+            if feature not in self.features:
+                raise ValueError(
+                    f"Unknown feature {feature}, expected one of {Features.FLAGS}"
+                )
+            bitset &= self.features[feature]
+
+        if query.price_levels:
+            bitset &= self.any_of(
+                self.price_levels, [PriceLevel(level) for level in query.price_levels]
+            )
+
+        if query.atmospheres:
+            bitset &= self.any_of(
+                self.atmospheres,
+                [Atmosphere(atmosphere) for atmosphere in query.atmospheres],
+            )
+
+        # The range filters are the costliest ones, they are skipped when no place is left
+        if bitset and (query.min_rating is not None or query.max_rating is not None):
+            bitset &= rows_to_bitset(
+                self.ratings.rows(query.min_rating, query.max_rating), size
+            )
+
+        if bitset and (query.min_reviews is not None or query.max_reviews is not None):
+            bitset &= rows_to_bitset(
+                self.review_counts.rows(query.min_reviews, query.max_reviews), size
+            )
+
+        return bitset
+
+    def count(self, query: PlaceQuery) -> int:
+        """
+        Count the places matching a query
+        @param query:
+        @return:
+        """
+        return self.filter(query).bit_count()
+
+    def keys_of(self, query: PlaceQuery, limit: int | None = None) -> List[str]:
+        """
+        Get the keys of the places matching a query, the best rated first
+        @param query:
+        @param limit: maximum number of places, all of them if None
+        @return:
+        """
+        rows = bitset_to_rows(self.filter(query), len(self.places))
+        ratings = self.ratings.row_values[rows]
+        # Stable sort, places with the same rating stay in insertion order
+        rows = rows[np.argsort(-ratings, kind="stable")][:limit]
+
+        return [self.keys[row] for row in rows.tolist()]
+
+    def search(self, query: PlaceQuery, limit: int | None = None) -> List[Restaurant]:
+        """
+        Get the places matching a query, the best rated first
+        @param query:
+        @param limit: maximum number of places, all of them if None
+        @return:
+        """
+        return [self.registry.places[key] for key in self.keys_of(query, limit)]
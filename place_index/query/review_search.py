@@ -0,0 +1,380 @@
+import logging
+import math
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from place_index.generic_places import Restaurant, Reviews
+from place_index.merger.place_registry import PlaceRegistry
+from place_index.query.tokenizer import tokenize
+
+# Number of postings of a compressed block
+BLOCK_SIZE = 128
+
+
+def smallest_dtype(max_value: int) -> np.dtype:
+    """
+    Get the smallest unsigned integer type holding a value
+    @param max_value:
+    @return:
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class PostingList:
+    """
+    Postings of a term: increasing review ids and their term frequencies.
+
+    Postings are compressed in blocks of BLOCK_SIZE: the ids are delta-encoded and both
+    columns are stored in the smallest integer type fitting the block. The highest
+    frequency and the shortest review of each block bound the score of its reviews, so
+    the blocks which cannot change the top places are not decoded. The last postings
+    stay in an uncompressed tail until it is full.
+    """
+
+    __slots__ = (
+        "first_ids",
+        "last_ids",
+        "max_frequencies",
+        "min_lengths",
+        "deltas",
+        "frequencies",
+        "tail_ids",
+        "tail_frequencies",
+        "tail_lengths",
+        "size",
+    )
+
+    def __init__(self):
+        self.first_ids: List[int] = []
+        self.last_ids: List[int] = []
+        self.max_frequencies: List[int] = []
+        self.min_lengths: List[int] = []
+        self.deltas: List[np.ndarray] = []
+        self.frequencies: List[np.ndarray] = []
+        self.tail_ids: List[int] = []
+        self.tail_frequencies: List[int] = []
+        self.tail_lengths: List[int] = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, review_id: int, frequency: int, length: int):
+        """
+        Add a posting, review ids must be increasing
+        @param review_id:
+        @param frequency: number of occurrences of the term in the review
+        @param length: number of terms of the review
+        @return:
+        """
+        self.tail_ids.append(review_id)
+        self.tail_frequencies.append(frequency)
+        self.tail_lengths.append(length)
+        self.size += 1
+
+        if len(self.tail_ids) == BLOCK_SIZE:
+            self._compress_tail()
+
+    def _compress_tail(self):
+        ids = np.array(self.tail_ids, dtype=np.int64)
+        deltas = np.diff(ids, prepend=ids[0])
+        self.first_ids.append(self.tail_ids[0])
+        self.last_ids.append(self.tail_ids[-1])
+        self.max_frequencies.append(max(self.tail_frequencies))
+        self.min_lengths.append(min(self.tail_lengths))
+        self.deltas.append(deltas.astype(smallest_dtype(int(deltas.max()))))
+        self.frequencies.append(
+            np.array(
+                self.tail_frequencies, dtype=smallest_dtype(max(self.tail_frequencies))
+            )
+        )
+        self.tail_ids, self.tail_frequencies, self.tail_lengths = [], [], []
+
+    def block_bounds(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the bounds of the blocks, the tail being the last block
+        @return: first and last review ids, highest frequency and shortest review length
+        """
+        if not self.tail_ids:
+            return (
+                np.array(self.first_ids),
+                np.array(self.last_ids),
+                np.array(self.max_frequencies),
+                np.array(self.min_lengths),
+            )
+
+        return (
+            np.array(self.first_ids + [self.tail_ids[0]]),
+            np.array(self.last_ids + [self.tail_ids[-1]]),
+            np.array(self.max_frequencies + [max(self.tail_frequencies)]),
+            np.array(self.min_lengths + [min(self.tail_lengths)]),
+        )
+
+    def decode(self, blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode some blocks
+        @param blocks: indexes of the blocks, the tail being the last one
+        @return: review ids and frequencies of the postings of the blocks
+        """
+        ids, frequencies = [], []
+        for block in blocks.tolist():
+            if block == len(self.first_ids):
+                ids.append(np.array(self.tail_ids, dtype=np.int64))
+                frequencies.append(np.array(self.tail_frequencies, dtype=np.int64))
+            else:
+                ids.append(
+                    self.first_ids[block]
+                    + np.cumsum(self.deltas[block], dtype=np.int64)
+                )
+                frequencies.append(self.frequencies[block].astype(np.int64))
+
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        return np.concatenate(ids), np.concatenate(frequencies)
+
+
+@dataclass
+class ReviewMatch:
+    key: str
+    score: float
+    # Best matching review of the place
+    review: Reviews
+
+
+class ReviewSearch:
+    """
+    Full-text search over the reviews of the merged places, with a BM25 inverted index.
+
+    Each review (title and content) is a document, tokenized according to its language.
+    A place scores as its best review. The index follows the registry incrementally: the
+    places whose reviews changed are re-indexed on the first search after a merge, their
+    previous reviews being marked as deleted until the index is rebuilt.
+
+    Top-k searches terminate early (MaxScore): the terms are scored from the most to the
+    least selective one, and once the remaining terms cannot lift an unseen review above
+    the k-th best place, only the reviews already scored are updated, skipping the
+    blocks of postings without any of them.
+    """
+
+    def __init__(self, registry: PlaceRegistry, k1: float = 1.2, b: float = 0.75):
+        self.registry = registry
+        self.k1 = k1
+        self.b = b
+        self._version: int | None = None
+        self._reset()
+
+    def _reset(self):
+        self.postings: Dict[str, PostingList] = {}
+        self.review_lengths = array("I")
+        # Row of the place of each review, -1 for deleted reviews
+        self.review_places = array("i")
+        self.reviews: List[Reviews] = []
+        self.place_keys: List[str] = []
+        self.place_rows: Dict[str, int] = {}
+        # Reviews of each place, as a range of review ids
+        self.place_reviews: Dict[str, Tuple[int, int]] = {}
+        # Review lists indexed, to detect the places whose reviews changed
+        self.indexed_reviews: Dict[str, List[Reviews]] = {}
+        self.live_reviews = 0
+        self.deleted_reviews = 0
+        self.total_length = 0
+
+    def __len__(self):
+        return self.live_reviews
+
+    def refresh(self):
+        """
+        Index the reviews of the places which changed since the last refresh
+        @return:
+        """
+        if self._version == self.registry.version:
+            return
+
+        if self.deleted_reviews > max(self.live_reviews, BLOCK_SIZE):
+            self.rebuild()
+            return
+
+        for key, place in self.registry.places.items():
+            if self.indexed_reviews.get(key) is not place.reviews:
+                self.index_place(key, place)
+        self._version = self.registry.version
+
+    def rebuild(self):
+        """
+        Index the reviews of every place from scratch, dropping the deleted reviews
+        @return:
+        """
+        self._reset()
+        for key, place in self.registry.places.items():
+            self.index_place(key, place)
+        self._version = self.registry.version
+
+        logging.info(
+            f"Indexed {self.live_reviews} reviews with {len(self.postings)} terms"
+        )
+
+    def remove_place(self, key: str):
+        """
+        Mark the reviews of a place as deleted
+        @param key:
+        @return:
+        """
+        start, end = self.place_reviews.pop(key, (0, 0))
+        for review_id in range(start, end):
+            self.review_places[review_id] = -1
+            self.total_length -= self.review_lengths[review_id]
+        self.live_reviews -= end - start
+        self.deleted_reviews += end - start
+        self.indexed_reviews.pop(key, None)
+
+    def index_place(self, key: str, restaurant: Restaurant):
+        """
+        Index the reviews of a place, replacing its previous reviews
+        @param key: key of the place in the registry
+        @param restaurant:
+        @return:
+        """
+        self.remove_place(key)
+        if key not in self.place_rows:
+            self.place_rows[key] = len(self.place_keys)
+            self.place_keys.append(key)
+        row = self.place_rows[key]
+
+        start = len(self.reviews)
+        for review in restaurant.reviews:
+            terms = tokenize(f"{review.title} {review.content}", review.lang)
+            if not terms:
+                continue
+
+            review_id = len(self.reviews)
+            self.reviews.append(review)
+            self.review_lengths.append(len(terms))
+            self.review_places.append(row)
+            self.total_length += len(terms)
+            for term, frequency in Counter(terms).items():
+                if term not in self.postings:
+                    self.postings[term] = PostingList()
+                self.postings[term].add(review_id, frequency, len(terms))
+
+        self.place_reviews[key] = (start, len(self.reviews))
+        self.live_reviews += len(self.reviews) - start
+        self.indexed_reviews[key] = restaurant.reviews
+
+    def idf(self, term: str) -> float:
+        """
+        Inverse document frequency of a term. The deleted reviews still count until the
+        index is rebuilt
+        @param term:
+        @return:
+        """
+        frequency = len(self.postings[term])
+        return math.log(1 + (self.live_reviews - frequency + 0.5) / (frequency + 0.5))
+
+    def search(self, query: str, k: int = 10, lang: str = "en") -> List[ReviewMatch]:
+        """
+        Get the k places whose reviews best match a query
+        @param query:
+        @param k:
+        @param lang: language of the query
+        @return: the best places first, with their best review
+        """
+        self.refresh()
+        terms = [
+            term
+            for term in dict.fromkeys(tokenize(query, lang))
+            if term in self.postings
+        ]
+        if not terms or k <= 0 or self.live_reviews == 0:
+            return []
+
+        lengths = np.frombuffer(self.review_lengths, dtype=np.uint32)
+        review_places = np.frombuffer(self.review_places, dtype=np.int32)
+        average_length = self.total_length / self.live_reviews
+        k1, b = self.k1, self.b
+
+        def bm25(idf, frequencies, review_lengths):
+            return (
+                idf
+                * frequencies
+                * (k1 + 1)
+                / (frequencies + k1 * (1 - b + b * review_lengths / average_length))
+            )
+
+        # Upper bound of the score of each block, from its highest frequency and shortest review
+        bounds = {}
+        for term in terms:
+            idf = self.idf(term)
+            first_ids, last_ids, max_frequencies, min_lengths = self.postings[
+                term
+            ].block_bounds()
+            bounds[term] = (
+                idf,
+                first_ids,
+                last_ids,
+                bm25(idf, max_frequencies, min_lengths).max(),
+            )
+        terms.sort(key=lambda term: bounds[term][3], reverse=True)
+
+        scores = np.zeros(len(lengths))
+        scored = np.empty(0, dtype=np.int64)
+        remaining = sum(bounds[term][3] for term in terms)
+        threshold = 0.0
+        pruning = False
+        for term in terms:
+            idf, first_ids, last_ids, bound = bounds[term]
+            posting_list = self.postings[term]
+
+            if pruning:
+                # Only the reviews which can still lift their place into the top k
+                candidates = scored[scores[scored] + remaining >= threshold]
+                if len(candidates) == 0:
+                    break
+                with_candidates = np.searchsorted(
+                    candidates, last_ids, side="right"
+                ) > np.searchsorted(candidates, first_ids, side="left")
+                review_ids, frequencies = posting_list.decode(
+                    np.flatnonzero(with_candidates)
+                )
+                positions = np.minimum(
+                    np.searchsorted(candidates, review_ids), len(candidates) - 1
+                )
+                keep = candidates[positions] == review_ids
+            else:
+                review_ids, frequencies = posting_list.decode(np.arange(len(first_ids)))
+                keep = review_places[review_ids] >= 0
+
+            review_ids, frequencies = review_ids[keep], frequencies[keep]
+            scores[review_ids] += bm25(idf, frequencies, lengths[review_ids])
+            remaining -= bound
+            if not pruning:
+                scored = np.union1d(scored, review_ids)
+
+            place_scores = np.zeros(len(self.place_keys))
+            np.maximum.at(place_scores, review_places[scored], scores[scored])
+            if np.count_nonzero(place_scores) >= k:
+                threshold = np.partition(place_scores, -k)[-k]
+            # Unseen reviews score at most `remaining`, they cannot enter the top k
+            pruning = remaining < threshold
+
+        # Best review of each place, then the best places
+        order = scored[np.argsort(-scores[scored], kind="stable")]
+        places, first = np.unique(review_places[order], return_index=True)
+        best_reviews = order[first]
+        best = np.argsort(-scores[best_reviews], kind="stable")[:k]
+
+        return [
+            ReviewMatch(
+                key=self.place_keys[places[idx]],
+                score=float(scores[best_reviews[idx]]),
+                review=self.reviews[best_reviews[idx]],
+            )
+            for idx in best.tolist()
+        ]
@@ -0,0 +1,152 @@
+import logging
+from typing import Collection, Dict, List, Set, Tuple
+
+import numpy as np
+
+from place_index.deduplication.deduplication import VectorDb
+from place_index.deduplication.vector_index import VectorIndex
+from place_index.generic_places import Restaurant
+from place_index.merger.place_registry import PlaceRegistry
+from place_index.merger.review_store import newest_first
+
+
+class SemanticSearch:
+    """
+    Free-text search over the merged places, by embedding similarity.
+
+    Each place has a profile (name, tags and its newest review snippets) embedded with
+    the model (and cache) of the VectorDb used for deduplication, in a long-lived
+    VectorIndex searched approximately once it is large. Profiles are embedded once:
+    on the first search after a merge, only the places whose profile changed are
+    embedded again, their new vector being appended and the previous one marked stale
+    until the index is compacted.
+    """
+
+    def __init__(
+        self,
+        registry: PlaceRegistry,
+        vector_db: VectorDb,
+        snippets: int = 3,
+        snippet_length: int = 200,
+        ann_threshold: int = 5000,
+        target_recall: float = 0.9,
+        max_k: int = 50,
+    ):
+        self.registry = registry
+        self.vector_db = vector_db
+        self.snippets = snippets
+        self.snippet_length = snippet_length
+        self.ann_threshold = ann_threshold
+        self.target_recall = target_recall
+        # Searches of up to max_k places (stale rows included) use the approximate index
+        self.max_k = max_k
+        self._version: int | None = None
+
+        self.index = self._new_index()
+        self.rows: Dict[str, int] = {}
+        self.profiles: Dict[str, str] = {}
+        self.stale_rows: Set[int] = set()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _new_index(self) -> VectorIndex:
+        return VectorIndex(
+            ann_threshold=self.ann_threshold,
+            target_recall=self.target_recall,
+            ann_k=self.max_k,
+        )
+
+    def profile_text(self, restaurant: Restaurant) -> str:
+        """
+        Text describing a place: its name, tags and newest review snippets
+        @param restaurant:
+        @return:
+        """
+        snippets = [
+            review.content[: self.snippet_length]
+            for review in newest_first(restaurant.reviews)
+            if review.content
+        ][: self.snippets]
+
+        return ". ".join(
+            [restaurant.name, ", ".join(map(str, restaurant.types))] + snippets
+        )
+
+    def refresh(self):
+        """
+        Embed the profiles of the places which changed since the last refresh
+        @return:
+        """
+        if self._version == self.registry.version:
+            return
+
+        changed: List[Tuple[str, str]] = []
+        for key, place in self.registry.places.items():
+            profile = self.profile_text(place)
+            if self.profiles.get(key) != profile:
+                changed.append((key, profile))
+
+        if changed:
+            vectors = self.vector_db.embed_cached([profile for _, profile in changed])
+            rows = self.index.add_batch(vectors, [key for key, _ in changed])
+            for (key, profile), row in zip(changed, rows.tolist()):
+                if key in self.rows:
+                    self.stale_rows.add(self.rows[key])
+                self.rows[key] = row
+                self.profiles[key] = profile
+
+            logging.debug(f"Embedded the profiles of {len(changed)} places")
+
+        if len(self.stale_rows) > len(self.rows) * 0.25:
+            self.compact()
+        self._version = self.registry.version
+
+    def compact(self):
+        """
+        Rebuild the index without the stale rows, the vectors are not embedded again
+        @return:
+        """
+        keys = list(self.rows)
+        live_rows = np.array([self.rows[key] for key in keys], dtype=np.int64)
+        vectors = np.asarray(self.index.vectors[live_rows], dtype=np.float32)
+
+        self.index = self._new_index()
+        self.index.add_batch(vectors, keys)
+        self.rows = {key: row for row, key in enumerate(keys)}
+        self.stale_rows = set()
+
+    def search(
+        self, text: str, k: int = 10, among: Collection[str] | None = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Get the k places whose profile is the most similar to a free-text query
+        @param text:
+        @param k:
+        @param among: keys of the candidate places (ex: the result of spatial or
+        attribute queries), every place if None. Candidates are searched exactly
+        @return: keys of the places and their embedding distance, the nearest first
+        """
+        self.refresh()
+        if k <= 0 or not self.rows:
+            return []
+
+        query = self.vector_db.embed_cached([text])
+        if among is not None:
+            candidates = np.array(
+                [self.rows[key] for key in among if key in self.rows], dtype=np.int64
+            )
+            rows, distances = self.index.search_among_k(query[0], candidates, k)
+        else:
+            # Stale rows are skipped, enough neighbours are fetched to still get k places
+            rows, distances = self.index.search_batch_k(
+                query, min(k + len(self.stale_rows), len(self.index))
+            )
+            rows, distances = rows[0], distances[0]
+
+        keys = self.index.keys
+        return [
+            (keys[row], distance)
+            for row, distance in zip(rows.tolist(), distances.tolist())
+            if row >= 0 and row not in self.stale_rows
+        ][:k]
@@ -0,0 +1,272 @@
+import logging
+import math
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from place_index.deduplication.spatial_index import METERS_PER_DEGREE, haversine
+from place_index.merger.place_registry import PlaceRegistry
+
+# Maximum number of origin / place distances computed at once by the batched queries
+BATCH_DISTANCES = 4_000_000
+
+
+class SpatialQuery:
+    """
+    Radius and nearest neighbour queries over the located merged places.
+
+    The coordinates are kept in numpy arrays sorted by cell of a regular grid, each cell
+    being a slice of the arrays. The grid is static: it is rebuilt on the first query
+    after the registry changed. Places without coordinates are never returned.
+    """
+
+    def __init__(self, registry: PlaceRegistry, cell_size_meters: float = 500):
+        self.registry = registry
+        self.cell_size = cell_size_meters / METERS_PER_DEGREE
+        self._version: int | None = None
+
+        self.keys: List[str] = []
+        self.latitudes = np.empty(0)
+        self.longitudes = np.empty(0)
+        self.cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+    def __len__(self):
+        self.refresh()
+        return len(self.keys)
+
+    def refresh(self):
+        """
+        Rebuild the grid if the places changed since it was built
+        @return:
+        """
+        if self._version != self.registry.version:
+            self.build()
+
+    def build(self):
+        """
+        Build the grid of the located places of the registry
+        @return:
+        """
+        located = [
+            (key, place.latitude, place.longitude)
+            for key, place in self.registry.places.items()
+            if place.has_location()
+        ]
+        keys = [key for key, _, _ in located]
+        latitudes = np.array([latitude for _, latitude, _ in located], dtype=np.float64)
+        longitudes = np.array(
+            [longitude for _, _, longitude in located], dtype=np.float64
+        )
+
+        cell_latitudes = np.floor(latitudes / self.cell_size).astype(np.int64)
+        cell_longitudes = np.floor(longitudes / self.cell_size).astype(np.int64)
+        order = np.lexsort((cell_longitudes, cell_latitudes))
+
+        self.keys = [keys[idx] for idx in order.tolist()]
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+
+        self.cells = {}
+        if len(order) > 0:
+            cells, starts, counts = np.unique(
+                np.stack([cell_latitudes[order], cell_longitudes[order]], axis=1),
+                axis=0,
+                return_index=True,
+                return_counts=True,
+            )
+            for (cell_latitude, cell_longitude), start, count in zip(
+                cells.tolist(), starts.tolist(), counts.tolist()
+            ):
+                self.cells[(cell_latitude, cell_longitude)] = (start, start + count)
+
+        self._version = self.registry.version
+        logging.debug(
+            f"Indexed {len(self.keys)} located places in {len(self.cells)} cells"
+        )
+
+    def candidates(
+        self, latitude: float, longitude: float, radius: float
+    ) -> np.ndarray:
+        """
+        Get the positions of the places of the cells overlapping a circle, or of every
+        place when the circle covers more cells than there are occupied cells
+        @param latitude:
+        @param longitude:
+        @param radius: radius in meters
+        @return:
+        """
+        latitude_span = math.ceil(radius / METERS_PER_DEGREE / self.cell_size)
+        # A cell is narrower in meters along the longitude away from the equator
+        longitude_span = math.ceil(
+            radius
+            / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+            / self.cell_size
+        )
+        if (2 * latitude_span + 1) * (2 * longitude_span + 1) >= len(self.cells):
+            return np.arange(len(self.keys))
+
+        center_latitude = math.floor(latitude / self.cell_size)
+        center_longitude = math.floor(longitude / self.cell_size)
+        slices = [
+            self.cells[(cell_latitude, cell_longitude)]
+            for cell_latitude in range(
+                center_latitude - latitude_span, center_latitude + latitude_span + 1
+            )
+            for cell_longitude in range(
+                center_longitude - longitude_span, center_longitude + longitude_span + 1
+            )
+            if (cell_latitude, cell_longitude) in self.cells
+        ]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+
+        return np.concatenate([np.arange(start, end) for start, end in slices])
+
+    def _sorted_results(
+        self, positions: np.ndarray, distances: np.ndarray, limit: int | None = None
+    ) -> List[Tuple[str, float]]:
+        order = np.argsort(distances, kind="stable")[:limit]
+        return [
+            (self.keys[position], distance)
+            for position, distance in zip(
+                positions[order].tolist(), distances[order].tolist()
+            )
+        ]
+
+    def within_radius(
+        self, latitude: float, longitude: float, meters: float
+    ) -> List[Tuple[str, float]]:
+        """
+        Get the places within a radius
+        @param latitude:
+        @param longitude:
+        @param meters: radius in meters
+        @return: keys of the places and their distance in meters, the nearest first
+        """
+        self.refresh()
+        positions = self.candidates(latitude, longitude, meters)
+        distances = haversine(
+            latitude, longitude, self.latitudes[positions], self.longitudes[positions]
+        )
+        in_radius = distances <= meters
+
+        return self._sorted_results(positions[in_radius], distances[in_radius])
+
+    def nearest(
+        self, latitude: float, longitude: float, k: int
+    ) -> List[Tuple[str, float]]:
+        """
+        Get the k nearest places, by searching circles of growing radius
+        @param latitude:
+        @param longitude:
+        @param k:
+        @return: keys of the places and their distance in meters, the nearest first
+        """
+        self.refresh()
+        radius = self.cell_size * METERS_PER_DEGREE
+        while True:
+            positions = self.candidates(latitude, longitude, radius)
+            distances = haversine(
+                latitude,
+                longitude,
+                self.latitudes[positions],
+                self.longitudes[positions],
+            )
+            # Every place within the radius is a candidate, so k places within the
+            # radius are the k nearest ones
+            within = distances <= radius
+            if within.sum() >= k or len(positions) == len(self.keys):
+                return self._sorted_results(positions, distances, k)
+
+            radius *= 2
+
+    def _distance_chunks(
+        self, latitudes: Sequence[float], longitudes: Sequence[float]
+    ) -> Iterator[np.ndarray]:
+        """
+        Get the distances between several origins and every located place, by chunks of
+        origins bounding the memory used
+        @param latitudes: latitudes of the origins
+        @param longitudes: longitudes of the origins
+        @return: distances in meters, one row per origin of the chunk and one column per
+        place
+        """
+        self.refresh()
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        chunk_size = max(1, BATCH_DISTANCES // max(len(self.keys), 1))
+        for start in range(0, len(latitudes), chunk_size):
+            end = start + chunk_size
+            yield haversine(
+                latitudes[start:end, None],
+                longitudes[start:end, None],
+                self.latitudes[None, :],
+                self.longitudes[None, :],
+            )
+
+    def distances(
+        self, latitudes: Sequence[float], longitudes: Sequence[float]
+    ) -> np.ndarray:
+        """
+        Get the distances between several origins and every located place. The whole
+        matrix is returned, the batched queries only keep the results of each origin
+        @param latitudes: latitudes of the origins
+        @param longitudes: longitudes of the origins
+        @return: distances in meters, one row per origin and one column per place
+        """
+        chunks = list(self._distance_chunks(latitudes, longitudes))
+        if not chunks:
+            return np.empty((0, len(self.keys)))
+
+        return np.concatenate(chunks)
+
+    def within_radius_batch(
+        self, latitudes: Sequence[float], longitudes: Sequence[float], meters: float
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Get the places within a radius of several origins. Origins are compared with
+        every place, by chunks bounding the memory used
+        @param latitudes: latitudes of the origins
+        @param longitudes: longitudes of the origins
+        @param meters: radius in meters
+        @return: for each origin, the keys of the places and their distance in meters
+        """
+        results = []
+        for distances in self._distance_chunks(latitudes, longitudes):
+            for origin_distances in distances:
+                positions = np.flatnonzero(origin_distances <= meters)
+                results.append(
+                    self._sorted_results(positions, origin_distances[positions])
+                )
+
+        return results
+
+    def nearest_batch(
+        self, latitudes: Sequence[float], longitudes: Sequence[float], k: int
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Get the k nearest places of several origins. Origins are compared with every
+        place, by chunks bounding the memory used
+        @param latitudes: latitudes of the origins
+        @param longitudes: longitudes of the origins
+        @param k:
+        @return: for each origin, the keys of the places and their distance in meters
+        """
+        self.refresh()
+        k = min(k, len(self.keys))
+        if k <= 0:
+            return [[] for _ in range(len(latitudes))]
+
+        results = []
+        for distances in self._distance_chunks(latitudes, longitudes):
+            # Partial sort: only the k nearest places of each origin are sorted
+            positions = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            results.extend(
+                self._sorted_results(
+                    origin_positions, origin_distances[origin_positions]
+                )
+                for origin_positions, origin_distances in zip(positions, distances)
+            )
+
+        return results
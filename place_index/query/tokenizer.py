@@ -0,0 +1,80 @@
+import re
+from typing import Dict, FrozenSet, List
+
+from place_index.deduplication.embedding_cache import normalize_text
+
+# Most frequent words of the languages of the reviews, they are not indexed
+STOPWORDS: Dict[str, FrozenSet[str]] = {
+    "en": frozenset(
+        "a an and are as at be but by for from had has have i in is it its my of on "
+        "or our so that the their there they this to was we were with you your".split()
+    ),
+    "fr": frozenset(
+        "a au aux avec ce ces c cette d dans de des du elle en est et il ils j je l la "
+        "le les leur lui m ma mais me mes n ne nous on ou par pas pour qu que qui s sa "
+        "se ses son sont sur t ta te tres un une vous y".split()
+    ),
+    "es": frozenset(
+        "a al con de del el en es esta la las lo los muy no para pero por que se su "
+        "un una y".split()
+    ),
+    "it": frozenset(
+        "a al che con da del della di e gli il in la le lo molto non per si un una".split()
+    ),
+    "de": frozenset(
+        "aber auch das dem den der des die ein eine einen es ist mit nicht sehr sich "
+        "sind und war wir zu".split()
+    ),
+}
+
+# Languages whose plural is marked by a final "s" (or "x"), stripped from long words
+PLURAL_S_LANGUAGES = {"en", "fr", "es", "it", "pt"}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def language(lang: str | None) -> str:
+    """
+    Get the language of a language code (ex: "fr-FR" -> "fr")
+    @param lang:
+    @return: empty if unknown
+    """
+    return (lang or "").split("-")[0].split("_")[0].lower()
+
+
+def stem(token: str, lang: str) -> str:
+    """
+    Light stemming: fold the plural of the words of a language to their singular
+    @param token:
+    @param lang: language, from `language`
+    @return:
+    """
+    if lang not in PLURAL_S_LANGUAGES or len(token) <= 3 or token.isdigit():
+        return token
+
+    if lang == "en" and token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if lang == "fr" and token.endswith("x"):
+        return token[:-1]
+    if token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+
+    return token
+
+
+def tokenize(text: str, lang: str | None = None) -> List[str]:
+    """
+    Split a text into index terms: ascii folded, lower-cased, without the stopwords of
+    its language and stemmed. Texts of unknown language are only folded
+    @param text:
+    @param lang: language code of the text (ex: "en", "fr-FR")
+    @return:
+    """
+    lang = language(lang)
+    stopwords = STOPWORDS.get(lang, frozenset())
+
+    return [
+        stem(token, lang)
+        for token in TOKEN_PATTERN.findall(normalize_text(text))
+        if token not in stopwords
+    ]
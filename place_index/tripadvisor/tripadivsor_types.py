@@ -33,6 +33,8 @@ class TripadvisorLocationDetailsHandler(BaseTripadvisorContent):
     types: List[str]
     trip_types: List[Atmosphere]
     number_of_reviews: int
+    latitude: float | None
+    longitude: float | None
 
     @classmethod
     def from_place(cls, place_details):
@@ -60,8 +62,22 @@ class TripadvisorLocationDetailsHandler(BaseTripadvisorContent):
                 if "localized_name" in trip_type
             ],
             int(place_details.get("num_reviews", 0)),
+            cls.parse_coordinate(place_details.get("latitude", None)),
+            cls.parse_coordinate(place_details.get("longitude", None)),
         )
 
+    @staticmethod
+    def parse_coordinate(coordinate) -> float | None:
+        """
+        Parse a coordinate, the tripadvisor api returns them as strings
+        :param coordinate:
+        :return:
+        """
+        try:
+            return float(coordinate)
+        except (TypeError, ValueError):
+            return None
+
     @staticmethod
     def merge_features(features, subcategories):
         """
@@ -86,6 +102,7 @@ class TripadvisorReview:
     title: str
     content: str
     trip_type: Atmosphere
+    author: str
 
     @classmethod
     def from_place(cls, review):
@@ -104,6 +121,7 @@ class TripadvisorReview:
             review["title"],
             review["text"],
             trip_type_enum,
+            review.get("user", {}).get("username", ""),
         )
 
 
@@ -1,5 +1,9 @@
 import logging
-from typing import List, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+import requests
 
 from place_index.generic_places import Restaurant
 from place_index.tripadvisor.tripadivsor_types import (
@@ -13,8 +17,19 @@ from place_index.tripadvisor.tripadvisor_integrator import tripadvisor_place_con
 
 
 class TripadvisorApiHandler:
-    def __init__(self):
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        request_slots: threading.BoundedSemaphore | None = None,
+    ):
+        """
+        :param max_in_flight: maximum number of concurrent requests of the handler
+        :param request_slots: semaphore bounding the requests in flight, shared by the
+        handlers of a provider so that the bound holds across its points
+        """
         self.tripadvisor = TripAdvisorApi()
+        self.max_in_flight = max_in_flight
+        self.request_slots = request_slots or threading.BoundedSemaphore(max_in_flight)
         self.location_reviews_error = 0
         self.location_details_error = 0
         self.location_search_error = 0
@@ -27,28 +42,90 @@ class TripadvisorApiHandler:
         :param lat:
         :param long:
         :param distance:
-        :return:
+        :return: the places in the order of the nearby search
         """
-        tripadvisor_restaurants = {}
         nearby_places = self.search_nearby(lat, long, distance)
-        location_details = self.location_details(list(nearby_places.keys()))
-        location_reviews = self.location_reviews(list(nearby_places.keys()))
-
-        for place in nearby_places.values():
-            current_details = location_details.get(place.location_id, None)
-            current_reviews = location_reviews.get(place.location_id, None)
+        contents = dict(self.iter_full_content(list(nearby_places.keys())))
 
-            if not current_details or not current_reviews:
-                logging.error(
-                    f"Tripadvisor API request failed: {self.location_details_error}, {self.location_reviews_error}"
-                )
-                continue
+        return {
+            location_id: contents[location_id]
+            for location_id in nearby_places
+            if location_id in contents
+        }
 
-            tripadvisor_restaurants[place.location_id] = TripadvisorFullContent(
-                current_details, current_reviews
-            )
+    def iter_all(
+        self, lat: float, long: float, distance: int
+    ) -> Iterator[TripadvisorFullContent]:
+        """
+        Fetch all the data from the tripadvisor api, yielding each place as soon as its
+        details and reviews are fetched
+        :param lat:
+        :param long:
+        :param distance:
+        :return:
+        """
+        nearby_places = self.search_nearby(lat, long, distance)
+        for _, content in self.iter_full_content(list(nearby_places.keys())):
+            yield content
 
-        return tripadvisor_restaurants
+    def iter_full_content(
+        self, location_ids: List[int]
+    ) -> Iterator[Tuple[int, TripadvisorFullContent]]:
+        """
+        Fetch the details and reviews of locations concurrently, the requests in flight
+        being bounded by request_slots. The two requests of a location are sent together,
+        and the location is yielded once both are answered, in completion order
+        :param location_ids:
+        :return: the location ids and their content, the failed locations are skipped
+        """
+        self.location_details_error = 0
+        self.location_reviews_error = 0
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="tripadvisor"
+        )
+        try:
+            requests_by_future = {}
+            for location_id in location_ids:
+                for part, fetch in (
+                    ("details", self.location_detail),
+                    ("reviews", self.location_review),
+                ):
+                    requests_by_future[executor.submit(fetch, location_id)] = (
+                        location_id,
+                        part,
+                    )
+
+            answers: Dict[int, dict] = {}
+            for future in as_completed(requests_by_future):
+                location_id, part = requests_by_future[future]
+                try:
+                    answer = future.result()
+                except requests.RequestException as error:
+                    logging.error(f"Tripadvisor API request failed: {error}")
+                    answer = None
+
+                location_answers = answers.setdefault(location_id, {})
+                location_answers[part] = answer
+                if len(location_answers) < 2:
+                    continue
+
+                del answers[location_id]
+                details, reviews = (
+                    location_answers["details"],
+                    location_answers["reviews"],
+                )
+                self.location_details_error += details is None
+                self.location_reviews_error += reviews is None
+                if not details or not reviews:
+                    logging.error(
+                        f"Tripadvisor API request failed: {self.location_details_error}, {self.location_reviews_error}"
+                    )
+                    continue
+
+                yield location_id, TripadvisorFullContent(details, reviews)
+        finally:
+            # A consumer stopping early does not wait for the remaining locations
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def search_nearby(
         self, lat, long, distance: int
@@ -61,7 +138,8 @@ class TripadvisorApiHandler:
         :return:
         """
         self.location_search_error = 0
-        response = self.tripadvisor.api_nearby_wrapper(lat, long, distance)
+        with self.request_slots:
+            response = self.tripadvisor.api_nearby_wrapper(lat, long, distance)
         if not response.ok:
             logging.error(
                 f"Tripadvisor API request failed: {response.status_code}, response: {response.text}"
@@ -69,64 +147,68 @@ class TripadvisorApiHandler:
             self.location_search_error += 1
             return {}
 
-        places = [
-            TripadvisorNearbyHandler.from_place(place)
-            for place in response.json()["data"]
-        ]
+        try:
+            places = [
+                TripadvisorNearbyHandler.from_place(place)
+                for place in response.json()["data"]
+            ]
+        except (KeyError, ValueError) as error:
+            logging.error(f"Invalid Tripadvisor nearby search answer: {error!r}")
+            self.location_search_error += 1
+            return {}
 
         return {place.location_id: place for place in places}
 
-    def location_details(
-        self, place_locations: List[int]
-    ) -> Dict[int, TripadvisorLocationDetailsHandler]:
+    def location_detail(
+        self, location_id: int
+    ) -> TripadvisorLocationDetailsHandler | None:
         """
         Get the details of a location using the tripadvisor details api
-        :param place_locations:
-        :return:
+        :param location_id:
+        :return: None if the request failed
         """
-        self.location_details_error = 0
-        results = {}
-        for location_id in place_locations:
+        with self.request_slots:
             response = self.tripadvisor.api_details_wrapper(location_id)
-            if not response.ok:
-                logging.error(
-                    f"Tripadvisor API request failed: {response.status_code}, response: {response.text}"
-                )
-                self.location_details_error += 1
-                continue
+        if not response.ok:
+            logging.error(
+                f"Tripadvisor API request failed: {response.status_code}, response: {response.text}"
+            )
+            return None
 
-            place_detail = TripadvisorLocationDetailsHandler.from_place(response.json())
-            results[place_detail.location_id] = place_detail
-        return results
+        try:
+            return TripadvisorLocationDetailsHandler.from_place(response.json())
+        except (KeyError, ValueError) as error:
+            # ex: an HTML error page instead of JSON, only this location is skipped
+            logging.error(
+                f"Invalid Tripadvisor details of location {location_id}: {error!r}"
+            )
+            return None
 
-    def location_reviews(
-        self, place_details: List[int]
-    ) -> Dict[int, TripadvisorReviewHandler]:
+    def location_review(self, location_id: int) -> TripadvisorReviewHandler | None:
         """
-        Get reviews from tripadvisor using the location id
-        :param place_details:
-        :return:
+        Get the reviews of a location using the tripadvisor reviews api
+        :param location_id:
+        :return: None if the request failed
         """
-        self.location_reviews_error = 0
-        results = {}
-        for location_id in place_details:
+        with self.request_slots:
             response = self.tripadvisor.api_tripadvisor_reviews(location_id)
-            if not response.ok:
-                logging.error(
-                    f"Tripadvisor API request failed: {response.status_code}, response: {response.text}"
-                )
-                self.location_reviews_error += 1
-                continue
+        if not response.ok:
+            logging.error(
+                f"Tripadvisor API request failed: {response.status_code}, response: {response.text}"
+            )
+            return None
 
+        try:
             response_content = response.json()
             if "data" not in response_content:
-                self.location_reviews_error += 1
-                continue
-
-            place = TripadvisorReviewHandler.from_place(location_id, response_content)
-            results[place.location_id] = place
+                return None
 
-        return results
+            return TripadvisorReviewHandler.from_place(location_id, response_content)
+        except (KeyError, ValueError) as error:
+            logging.error(
+                f"Invalid Tripadvisor reviews of location {location_id}: {error!r}"
+            )
+            return None
 
 
 def tripadvisor_place_handler(trip_places: Dict[int, TripadvisorFullContent]):
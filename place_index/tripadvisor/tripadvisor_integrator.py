@@ -1,6 +1,7 @@
 from typing import List
 
 from place_index.generic_places import Restaurant, Contact, Features, Reviews
+from place_index.fetcher.provider import ProviderSource
 from place_index.metadatas import PriceLevel
 from place_index.tripadvisor.tripadvisor_api_handler import (
     TripadvisorFullContent,
@@ -127,6 +128,8 @@ def tripadvisor_place_convertor(
             title=review.title,
             content=review.content,
             publication_date=review.publication_date,
+            author=review.author,
+            provider=ProviderSource.TRIPADVISOR.value,
         )
         for review in trip_reviews.reviews
     ]
@@ -142,4 +145,6 @@ def tripadvisor_place_convertor(
         reviews=place_reviews,
         atmosphere_target=trip_details.trip_types,
         number_of_reviews=trip_details.number_of_reviews,
+        latitude=trip_details.latitude,
+        longitude=trip_details.longitude,
     )
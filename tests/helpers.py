@@ -0,0 +1,91 @@
+import numpy as np
+
+from place_index.generic_places import Contact, Features, Restaurant, Reviews
+from place_index.metadatas import Atmosphere, PriceLevel
+
+
+class LookupModel:
+    """
+    Embedding model returning a fixed vector per place name
+    """
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.texts = []
+
+    def embed(self, texts, batch_size=None):
+        for text in [texts] if isinstance(texts, str) else texts:
+            self.texts.append(text)
+            yield np.asarray(self.vectors[text.split(" + ")[0]], dtype=np.float32)
+
+
+def make_restaurant(
+    name: str = "",
+    phone: str = "",
+    website: str = "",
+    address: str = "",
+    uri: str = "",
+    **fields,
+) -> Restaurant:
+    """
+    Build a restaurant, empty unless given
+    @param name:
+    @param phone:
+    @param website:
+    @param address:
+    @param uri: google maps and specific uri
+    @param fields: other fields of the restaurant (types, latitude...)
+    @return:
+    """
+    return Restaurant(
+        **{
+            "id": "",
+            "name": name,
+            "rating": -1,
+            "types": [],
+            "price_level": [],
+            "atmosphere_target": [],
+            "contact": Contact(
+                phone=phone,
+                email="",
+                website=website,
+                address=address,
+                gmaps_uri=uri,
+                tripadvisor_uri=None,
+                specific_uri=uri,
+            ),
+            "features": None,
+            "reviews": [],
+            "number_of_reviews": 0,
+            **fields,
+        }
+    )
+
+
+def make_place(
+    idx: int, latitude: float | None = 48.85, longitude: float | None = 2.35
+) -> Restaurant:
+    """
+    Build a complete restaurant, its name, contact and review numbered by idx
+    @param idx:
+    @param latitude:
+    @param longitude: ignored without latitude
+    @return:
+    """
+    return make_restaurant(
+        f"Restaurant {idx}",
+        phone=f"+33 1 45 55 {idx:05d}",
+        website=f"https://restaurant-{idx}.fr",
+        address=f"{idx} rue du test, Paris",
+        uri=f"https://maps.google.com/?cid={idx}",
+        id=f"place {idx}",
+        rating=4.5,
+        types=["italian"],
+        price_level=[PriceLevel.LOW, PriceLevel.MEDIUM],
+        atmosphere_target=[Atmosphere.FAMILY],
+        features=Features(credit_card=True, wifi=idx % 2 == 0),
+        reviews=[Reviews(4, "fr", "", f"Review {idx}", "2025-01-01")],
+        number_of_reviews=1,
+        latitude=latitude,
+        longitude=None if latitude is None else longitude,
+    )
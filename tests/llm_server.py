@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMServer:
+    """
+    Local stand-in for an OpenAI compatible chat completion API.
+
+    The answers are the sorted union of each pair of tag lists, after a fixed latency,
+    so the throughput of a client only depends on its batching and concurrency.
+    The server records the number of requests and the maximum number of requests in flight.
+    Requests containing failing_tag are rejected with the failing_status error.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        failing_tag: str | None = None,
+        failing_status: int = 429,
+    ):
+        self.latency = latency
+        self.failing_tag = failing_tag
+        self.failing_status = failing_status
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    @staticmethod
+    def answer(content: str) -> str:
+        pairs = json.loads(content)["pairs"]
+        return json.dumps(
+            {
+                "results": [
+                    {"tags": sorted(set(pair["list_1"]) | set(pair["list_2"]))}
+                    for pair in pairs
+                ]
+            }
+        )
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+
+                time.sleep(stub.latency)
+                content = body["messages"][-1]["content"]
+                status = 200
+                if stub.failing_tag is not None and stub.failing_tag in content:
+                    status = stub.failing_status
+                    response = json.dumps(
+                        {"error": {"message": "rejected", "type": "invalid_request"}}
+                    ).encode()
+                else:
+                    response = stub.completion(body["model"], content)
+
+                with stub.lock:
+                    stub.in_flight -= 1
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                # Failed requests are retried by the client without waiting
+                self.send_header("retry-after-ms", "1")
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def completion(self, model: str, content: str) -> bytes:
+        return json.dumps(
+            {
+                "id": f"stub-{self.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": self.answer(content),
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        ).encode()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,117 @@
+import itertools
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from place_index.deduplication.deduplication import VectorDb
+from place_index.merger.clustering import UnionFind
+from place_index.merger.merger import Merger
+from tests.helpers import LookupModel, make_place
+
+
+@pytest.mark.parametrize(
+    "edges, expected",
+    [
+        ([], [[0], [1], [2], [3], [4]]),
+        ([(0, 1), (3, 4)], [[0, 1], [2], [3, 4]]),
+        ([(0, 1), (1, 2), (2, 3), (3, 4)], [[0, 1, 2, 3, 4]]),
+        ([(4, 0), (0, 4), (2, 2)], [[0, 4], [1], [2], [3]]),
+    ],
+)
+def test_clusters(edges, expected):
+    union_find = UnionFind(5)
+    for first, second in edges:
+        union_find.union(first, second)
+
+    assert sorted(union_find.clusters()) == expected
+
+
+def test_anchored_sets_are_never_united():
+    union_find = UnionFind(4)
+
+    assert union_find.anchor(0, "existing a")
+    assert union_find.anchor(2, "existing b")
+    assert union_find.union(0, 1)
+    assert not union_find.union(1, 2)
+    assert not union_find.anchor(1, "existing b")
+    assert union_find.union(2, 3)
+    assert union_find.union(3, 2) is False
+
+    assert union_find.anchor_of(1) == "existing a"
+    assert union_find.anchor_of(3) == "existing b"
+    assert sorted(union_find.clusters()) == [[0, 1], [2, 3]]
+
+
+def test_anchor_of_a_smaller_set_is_kept():
+    union_find = UnionFind(4)
+    union_find.union(1, 2)
+    union_find.union(2, 3)
+
+    assert union_find.anchor(0, "existing")
+    assert union_find.union(0, 3)
+    assert union_find.anchor_of(0) == union_find.anchor_of(1) == "existing"
+    assert not union_find.anchor(2, "other")
+
+
+def cluster_in_order(order):
+    vector_db = VectorDb()
+    vector_db._embedding_model = LookupModel(
+        {
+            "Restaurant 0": [0, 0, 0],
+            "Restaurant 1": [1, 0, 0],
+            "Restaurant 2": [0, 1, 0],
+            "Restaurant 5": [0, 0, 1],
+        }
+    )
+    merger = Merger(use_llm=False, use_lexical_prefilter=False, vector_db=vector_db)
+    merger.add_restaurants({0: make_place(0, 48.85)})
+
+    # Place 3 matches the stored place 0 and place 4 matches place 1 by embedding,
+    # place 5 matches place 2 by phone number
+    batch = {idx: make_place(idx, 48.85) for idx in range(1, 6)}
+    batch[3].name, batch[4].name = "Restaurant 0", "Restaurant 1"
+    batch[2].contact.phone = batch[5].contact.phone = "+33 1 45 55 00 02"
+    merger.add_restaurants({idx: batch[idx] for idx in order}, cluster=True)
+
+    ids_by_key = defaultdict(set)
+    for provider_id, key in merger.registry.provider_ids.items():
+        ids_by_key[key].add(provider_id)
+    return {
+        (merger.places[key].name, frozenset(provider_ids))
+        for key, provider_ids in ids_by_key.items()
+    }
+
+
+def test_clusters_do_not_depend_on_the_order_of_the_places():
+    expected = {
+        ("Restaurant 0", frozenset({"place 0", "place 3"})),
+        ("Restaurant 1", frozenset({"place 1", "place 4"})),
+        ("Restaurant 2", frozenset({"place 2", "place 5"})),
+    }
+
+    for order in itertools.permutations(range(1, 6)):
+        assert cluster_in_order(order) == expected
+
+
+def test_cluster_joining_an_anchored_place_merges_into_it():
+    vector_db = VectorDb()
+    vector_db._embedding_model = LookupModel(
+        {f"Restaurant {idx}": vector for idx, vector in zip((0, 1, 2, 9), np.eye(4))}
+    )
+    merger = Merger(use_llm=False, use_lexical_prefilter=False, vector_db=vector_db)
+    stored = make_place(0, 48.85)
+    merger.add_restaurants({0: stored})
+
+    # Place 9 matches the stored place by URI. Places 1 and 2 share a website, and
+    # are united before the anchored place 9 joins them through a phone number
+    anchored, first, second = (make_place(idx, 48.85) for idx in (9, 1, 2))
+    anchored.contact.gmaps_uri = stored.contact.gmaps_uri
+    anchored.contact.phone = second.contact.phone
+    first.contact.website = second.contact.website
+    merger.add_restaurants({9: anchored, 1: first, 2: second}, cluster=True)
+
+    assert list(merger.places) == ["place-0"]
+    assert {merger.registry.provider_ids[f"place {idx}"] for idx in (0, 1, 2, 9)} == {
+        "place-0"
+    }
@@ -0,0 +1,89 @@
+import numpy as np
+
+from place_index.deduplication.deduplication import VectorDb
+from tests.helpers import LookupModel, make_place
+
+
+def make_vector_db(vectors, **options) -> VectorDb:
+    vector_db = VectorDb(**options)
+    vector_db._embedding_model = LookupModel(
+        {f"Restaurant {idx}": vector for idx, vector in enumerate(vectors)}
+    )
+    return vector_db
+
+
+def test_batch_candidates_are_reranked_as_stored_ones():
+    # Place 2 is 0.1 away from the stored place 0 and 0.2 away from place 1 of its
+    # batch. Its phone and website differ from both: the stored place scores 0.3 once
+    # re-ranked, which the batch candidate beats raw (0.2) but not re-ranked (0.4)
+    vector_db = make_vector_db(
+        [[0, 0, 0], [0.1, 0.2, 0], [0.1, 0, 0]], blocking_radius=None, k=5
+    )
+    vector_db.add_restaurant(make_place(0), key="place-0")
+
+    results, _ = vector_db.get_restaurants([make_place(1), make_place(2)], 0.35)
+
+    assert results[0].distance >= 0.35
+    assert results[1].match == "place-0" and results[1].batch_match == -1
+    assert results[1].distance < 0.35
+
+
+def test_nearest_previous():
+    vectors = np.array([[0, 0], [1, 0], [0.1, 0], [1, 0.2]], dtype=np.float32)
+    rows, distances = VectorDb.nearest_previous(vectors, chunk_size=2)
+
+    assert rows.tolist() == [-1, 0, 0, 1]
+    assert np.allclose(distances, [np.inf, 1, 0.1, 0.2])
+
+    # Rows further than the radius are not candidates, unknown coordinates are
+    coordinates = np.array(
+        [[48.85, 2.35], [45.76, 4.83], [45.76, 4.83], [np.nan, np.nan]]
+    )
+    rows, _ = VectorDb.nearest_previous(vectors, coordinates=coordinates, radius=250)
+
+    assert rows.tolist() == [-1, -1, 1, 1]
+
+
+def test_get_restaurants_matches_earlier_places_of_the_batch():
+    vector_db = make_vector_db([[0, 0, 0], [1, 0, 0], [0, 1, 0]])
+    duplicate = make_place(3)
+    duplicate.name = "Restaurant 1"
+
+    results, vectors = vector_db.get_restaurants(
+        [make_place(1), make_place(2), duplicate], 0.35
+    )
+
+    assert vectors.shape == (3, 3)
+    # Place 1 is not stored yet, its key is only known once the batch is inserted
+    assert results[2].match == "" and results[2].batch_match == 0
+    assert results[2].distance < 0.35
+    assert results[1].batch_match == -1 and results[1].distance >= 0.35
+
+
+def test_get_restaurants_matches_stored_places():
+    vector_db = make_vector_db([[0, 0, 0], [1, 0, 0], [0, 1, 0]])
+    vector_db.add_restaurant(make_place(0), key="place-0")
+    duplicate, second_duplicate = make_place(3), make_place(4)
+    duplicate.name = second_duplicate.name = "Restaurant 0"
+
+    results, _ = vector_db.get_restaurants(
+        [duplicate, make_place(1), second_duplicate], 0.35
+    )
+
+    assert results[0].match == results[2].match == "place-0"
+    assert results[0].batch_match == results[2].batch_match == -1
+    assert results[0].distance < 0.35 and results[2].distance < 0.35
+    assert results[1].distance >= 0.35
+
+
+def test_places_far_apart_in_embedding_do_not_match_by_default():
+    # Same phone, website and types, but 0.5 apart in embedding
+    vector_db = make_vector_db([[1, 0, 0], [0.5, 0.866, 0]], blocking_radius=None)
+    vector_db.add_restaurant(make_place(0), key="place-0")
+    duplicate = make_place(1)
+    duplicate.contact = make_place(0).contact
+
+    results, _ = vector_db.get_restaurants([duplicate], 0.35)
+
+    assert vector_db.reranker is None
+    assert results[0].distance >= 0.35
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from place_index.deduplication.embedding_cache import EmbeddingCache, normalize_text
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Café de Flore", "cafe de flore"),
+        ("  Le   Procope\n13 Rue ", "le procope 13 rue"),
+        ("CHEZ L'AMI JEAN", "chez l'ami jean"),
+    ],
+)
+def test_normalize_text(text, expected):
+    assert normalize_text(text) == expected
+
+
+def test_cache_persistence(tmp_path):
+    vectors = np.random.default_rng(0).random((10, 8), dtype=np.float32)
+    texts = [f"place {idx}" for idx in range(10)]
+
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many(texts, vectors)
+    cache.flush()
+
+    reloaded = EmbeddingCache(str(tmp_path), "model")
+    cached, missing = reloaded.get_many(["PLACE  3", "unknown place"])
+
+    assert missing == [1]
+    assert np.array_equal(cached[0], vectors[3])
+    assert "place 3" not in EmbeddingCache(str(tmp_path), "other model")
+
+
+def test_cache_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model", max_entries=4, eviction_ratio=0.5)
+    vectors = np.eye(6, dtype=np.float32)
+
+    for idx, text in enumerate(["a", "b", "c", "d"]):
+        cache.put_many([text], vectors[idx : idx + 1])
+    cache.get_many(["a"])
+    cache.put_many(["e"], vectors[4:5])
+
+    assert len(cache) == 3
+    assert "a" in cache and "e" in cache
+    assert "b" not in cache and "c" not in cache
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import requests
+
+from place_index.fetcher.fetcher import Fetcher, Provider
+from tests.helpers import make_place
+
+LATENCY = 0.2
+
+
+class SlowProvider(Provider):
+    """
+    Provider answering after a fixed latency, with a place per point and a shared place
+    """
+
+    def __init__(self, name: str, failing_point=None):
+        self.name = name
+        self.failing_point = failing_point
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def fetch_one(self, latitude, longitude, distance):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(LATENCY)
+        with self.lock:
+            self.in_flight -= 1
+
+        if (latitude, longitude) == self.failing_point:
+            raise requests.ConnectionError("connection reset")
+
+        point, shared = make_place(0), make_place(1)
+        point.id, point.name = f"{self.name} {latitude}", f"{self.name} {latitude}"
+        shared.id, shared.name = "shared", f"{self.name} {latitude}"
+        return {point.id: point, shared.id: shared}
+
+
+def make_fetcher(*providers, max_concurrency=4) -> Fetcher:
+    fetcher = Fetcher(max_concurrency=max_concurrency)
+    fetcher.providers = list(providers)
+    return fetcher
+
+
+def test_fetch_all_is_concurrent_and_deterministic():
+    providers = [SlowProvider("gmaps"), SlowProvider("tripadvisor")]
+    coordinates = [(float(idx), 2.35) for idx in range(4)]
+
+    start = time.perf_counter()
+    results = make_fetcher(*providers).fetch_all(coordinates)
+    elapsed = time.perf_counter() - start
+
+    # 8 requests of LATENCY, 4 at a time per provider: a single wave
+    assert elapsed < 3 * LATENCY
+    assert [provider.max_in_flight for provider in providers] == [4, 4]
+    assert list(results) == [
+        "gmaps 0.0",
+        "shared",
+        "gmaps 1.0",
+        "gmaps 2.0",
+        "gmaps 3.0",
+        "tripadvisor 0.0",
+        "tripadvisor 1.0",
+        "tripadvisor 2.0",
+        "tripadvisor 3.0",
+    ]
+    # As in a sequential fetch, the last provider and point win
+    assert results["shared"].name == "tripadvisor 3.0"
+
+
+def test_concurrency_is_bounded_per_provider():
+    provider = SlowProvider("gmaps")
+    make_fetcher(provider, max_concurrency=2).fetch_all(
+        [(float(idx), 2.35) for idx in range(6)]
+    )
+
+    assert provider.max_in_flight == 2
+
+
+def test_failed_requests_are_skipped():
+    provider = SlowProvider("gmaps", failing_point=(1.0, 2.35))
+    results = make_fetcher(provider).fetch_all([(0.0, 2.35), (1.0, 2.35)])
+
+    assert list(results) == ["gmaps 0.0", "shared"]
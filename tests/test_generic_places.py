@@ -0,0 +1,59 @@
+import tracemalloc
+
+import pytest
+
+from place_index.generic_places import Features, Restaurant
+from place_index.metadatas import Atmosphere, PriceLevel
+from tests.helpers import make_place
+
+# Memory budget of a place with its contact, features and one review, in bytes
+# (about 930 bytes, against 1330 with the previous dataclasses)
+PLACE_FOOTPRINT_BUDGET = 1100
+
+
+@pytest.mark.parametrize(
+    "flags, mask",
+    [
+        ({}, 0),
+        ({"credit_card": True}, 0b1),
+        ({"serve_alcohol": True, "dog_allowed": True}, 0b100000010),
+    ],
+)
+def test_features_mask(flags, mask):
+    features = Features(**flags)
+
+    assert features.mask == mask
+    assert Features.from_json(features.to_json()) == features
+    assert all(getattr(features, flag) == (flag in flags) for flag in Features.FLAGS)
+
+
+def test_features_merge():
+    features = Features(wifi=True)
+    features |= Features(parking=True)
+    features.takeout = True
+    features.wifi = False
+
+    assert features == Features(parking=True, takeout=True)
+
+
+@pytest.fixture
+def place():
+    return make_place(0)
+
+
+def test_bitset_attributes(place):
+    place.price_level = ["HIGH", PriceLevel.LOW, None]
+
+    assert place.price_level == [PriceLevel.LOW, PriceLevel.HIGH]
+    assert place.atmosphere_target == [Atmosphere.FAMILY]
+    assert Restaurant.from_json(place.to_json()) == place
+
+
+def test_place_footprint():
+    tracemalloc.start()
+    places = [make_place(idx) for idx in range(1000)]
+    footprint, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert not hasattr(places[0], "__dict__")
+    assert footprint / len(places) < PLACE_FOOTPRINT_BUDGET
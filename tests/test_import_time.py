@@ -0,0 +1,60 @@
+import subprocess
+import sys
+from typing import Dict, Set
+
+import pytest
+
+# Modules only needed once a model, an ANN index or the LLM is used
+LAZY_MODULES = {"fastembed", "onnxruntime", "mrpt", "openai", "tensorflow_hub"}
+
+# Modules the package itself does not need, before a submodule is imported
+PACKAGE_LAZY_MODULES = LAZY_MODULES | {"numpy", "dotenv", "requests"}
+
+# Cumulative import time budget of an entry point, in microseconds (about 5 times
+# the time measured on a laptop, so the test only fails on real regressions)
+IMPORT_BUDGET_US = 1_000_000
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """
+    Import a module in a fresh interpreter with `python -X importtime`
+    @param module:
+    @return: cumulative import time of every imported module, in microseconds
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def imported_packages(times: Dict[str, int]) -> Set[str]:
+    return {name.split(".")[0] for name in times}
+
+
+def test_package_import_is_light():
+    times = import_times("place_index")
+
+    assert not imported_packages(times) & PACKAGE_LAZY_MODULES
+    assert times["place_index"] < IMPORT_BUDGET_US
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["place_index.merger.merger", "place_index.fetcher.fetcher"],
+)
+def test_import_time(module):
+    times = import_times(module)
+
+    assert not imported_packages(times) & LAZY_MODULES
+    assert times[module] < IMPORT_BUDGET_US
@@ -0,0 +1,59 @@
+import pytest
+
+from place_index.deduplication.key_matcher import (
+    KeyMatcher,
+    normalize_phone,
+    registrable_domain,
+)
+from tests.helpers import make_restaurant
+
+
+@pytest.mark.parametrize(
+    "phone, country_code, expected",
+    [
+        ("+33 1 45 55 61 44", None, "+33145556144"),
+        ("0033 1-45-55-61-44", None, "+33145556144"),
+        ("01 45 55 61 44", "33", "+33145556144"),
+        ("01 45 55 61 44", None, None),
+        ("+33 12", None, None),
+        ("", "33", None),
+    ],
+)
+def test_normalize_phone(phone, country_code, expected):
+    assert normalize_phone(phone, country_code) == expected
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://www.example.com/menu", "example.com"),
+        ("http://paris.example.co.uk", "example.co.uk"),
+        ("example.fr", "example.fr"),
+        ("", None),
+    ],
+)
+def test_registrable_domain(url, expected):
+    assert registrable_domain(url) == expected
+
+
+def test_key_matcher():
+    matcher = KeyMatcher()
+    matcher.add(make_restaurant(uri="gmaps/1"), "first")
+    matcher.add(
+        make_restaurant(phone="+33 1 45 55 61 44", latitude=48.85, longitude=2.29),
+        "second",
+    )
+    matcher.add(make_restaurant(website="https://chain.com/a"), "chain a")
+    matcher.add(make_restaurant(website="https://chain.com/b"), "chain b")
+
+    assert matcher.match(make_restaurant(uri="gmaps/1")) == "first"
+    assert matcher.match(make_restaurant(phone="0033145556144")) == "second"
+    # Same phone number, but in another district
+    assert (
+        matcher.match(
+            make_restaurant(phone="+33145556144", latitude=48.87, longitude=2.35)
+        )
+        is None
+    )
+    # A domain shared by several places is ambiguous
+    assert matcher.match(make_restaurant(website="chain.com")) is None
@@ -0,0 +1,132 @@
+import asyncio
+import math
+import time
+
+import pytest
+
+from place_index.merger.llm_handler import LLMHandler
+from place_index.merger.merger import Merger
+from tests.helpers import make_restaurant
+from tests.llm_server import StubLLMServer
+
+
+@pytest.fixture
+def llm_server():
+    with StubLLMServer(latency=0.05) as server:
+        yield server
+
+
+def make_handler(server, pairs_per_request=4, max_concurrency=4):
+    return LLMHandler(
+        base_url=server.base_url,
+        api_key="test",
+        pairs_per_request=pairs_per_request,
+        max_concurrency=max_concurrency,
+    )
+
+
+@pytest.mark.parametrize(
+    "nb_pairs, pairs_per_request, max_concurrency",
+    [(1, 4, 4), (10, 4, 2), (32, 2, 4)],
+)
+def test_merge_tags_batch(llm_server, nb_pairs, pairs_per_request, max_concurrency):
+    handler = make_handler(llm_server, pairs_per_request, max_concurrency)
+    pairs = [([f"tag {idx}", "common"], ["common", "other"]) for idx in range(nb_pairs)]
+
+    merged = handler.merge_tags_batch(pairs)
+
+    assert merged == [
+        sorted({f"tag {idx}", "common", "other"}) for idx in range(nb_pairs)
+    ]
+    assert llm_server.requests == math.ceil(nb_pairs / pairs_per_request)
+    assert llm_server.max_in_flight <= max_concurrency
+
+
+def test_merge_tags_batch_is_concurrent():
+    with StubLLMServer(latency=0.2) as llm_server:
+        handler = make_handler(llm_server, pairs_per_request=1, max_concurrency=8)
+
+        start = time.perf_counter()
+        handler.merge_tags_batch([(["a"], ["b"])] * 16)
+        elapsed = time.perf_counter() - start
+
+    # 16 serial requests would take 16 times the latency, 2 rounds are expected
+    assert elapsed < 8 * llm_server.latency
+    assert llm_server.max_in_flight > 1
+
+
+def test_failed_requests_only_lose_their_pairs():
+    with StubLLMServer(latency=0.01, failing_tag="rejected") as llm_server:
+        handler = make_handler(llm_server, pairs_per_request=2)
+        pairs = [([f"tag {idx}"], ["other"]) for idx in range(6)]
+        pairs[3] = (["rejected"], ["other"])
+
+        merged = handler.merge_tags_batch(pairs)
+
+    # The request of pairs 2 and 3 is rate limited, the other requests are kept
+    assert merged[2] is None and merged[3] is None
+    assert merged[:2] + merged[4:] == [["other", f"tag {idx}"] for idx in (0, 1, 4, 5)]
+
+
+@pytest.mark.parametrize(
+    "status, error",
+    [(401, "Invalid LLM API key"), (403, "rejected")],
+)
+def test_authentication_errors_are_raised(status, error):
+    with StubLLMServer(
+        latency=0.01, failing_tag="rejected", failing_status=status
+    ) as llm_server:
+        handler = make_handler(llm_server, pairs_per_request=1)
+
+        with pytest.raises(Exception, match=error):
+            handler.merge_tags_batch([(["a"], ["b"]), (["rejected"], ["other"])])
+
+
+def test_merge_tags_batch_in_a_running_event_loop(llm_server):
+    handler = make_handler(llm_server)
+    pairs = [(["a"], ["b"]), (["c"], ["d"])]
+
+    async def merge():
+        return handler.merge_tags_batch(pairs), await handler.merge_tags_batch_async(
+            pairs
+        )
+
+    merged, merged_async = asyncio.run(merge())
+
+    assert merged == merged_async == [["a", "b"], ["c", "d"]]
+
+
+def test_merger_merges_pending_tags_asynchronously():
+    with StubLLMServer(latency=0.01, failing_tag="rejected") as llm_server:
+        merger = Merger(
+            use_llm=True, llm_handler=make_handler(llm_server, pairs_per_request=1)
+        )
+        restaurants = [
+            make_restaurant(types=["italian"]),
+            make_restaurant(types=["rejected"]),
+        ]
+        for restaurant in restaurants:
+            merger.merge_tags(restaurant, make_restaurant(types=["pizza"]))
+
+        asyncio.run(merger.merge_pending_tags_async())
+
+    assert restaurants[0].types == ["italian", "pizza"]
+    # The failed merge keeps the union of the tags
+    assert sorted(restaurants[1].types) == ["pizza", "rejected"]
+    assert merger.tag_merge_jobs == {}
+
+
+def test_merger_queues_llm_tag_merges(llm_server):
+    merger = Merger(use_llm=True, llm_handler=make_handler(llm_server))
+    existing_restaurant = make_restaurant(types=["italian"])
+    for types in (["pizza"], ["pasta"]):
+        merger.merge_tags(existing_restaurant, make_restaurant(types=types))
+
+    assert llm_server.requests == 0
+    assert sorted(existing_restaurant.types) == ["italian", "pasta", "pizza"]
+
+    merger.merge_pending_tags()
+
+    assert llm_server.requests == 1
+    assert existing_restaurant.types == ["italian", "pasta", "pizza"]
+    assert merger.tag_merge_jobs == {}
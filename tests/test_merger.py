@@ -1,8 +1,15 @@
+import json
+
+import numpy as np
 import pytest
 from pygments.lexer import default
 
-from place_index.generic_places import Restaurant
-from place_index.merger.merger import Merger
+from place_index.deduplication.deduplication import QueryResult, VectorDb
+from place_index.deduplication.key_matcher import KeyMatcher
+from place_index.generic_places import Contact, Features, Restaurant
+from place_index.fetcher.provider import ProviderSource
+from place_index.merger.merger import Merger, PlaceSource
+from tests.helpers import LookupModel, make_place
 from tests.test_fixture import (
     tags_data,
     contact_data,
@@ -29,8 +36,8 @@ def test_merge_tags_without_llm(no_llm_merger, existing_tags, new_tags, expected
         id="",
         name="",
         rating=default,
-        price_level=default,
-        atmosphere_target=default,
+        price_level=[],
+        atmosphere_target=[],
         types=existing_tags,
         contact=default,
         features=default,
@@ -41,8 +48,8 @@ def test_merge_tags_without_llm(no_llm_merger, existing_tags, new_tags, expected
         id="",
         name="",
         rating=default,
-        price_level=default,
-        atmosphere_target=default,
+        price_level=[],
+        atmosphere_target=[],
         types=new_tags,
         contact=default,
         features=default,
@@ -60,8 +67,8 @@ def test_merge_contacts(no_llm_merger, existing_contact, new_contact, expected):
         id="",
         name="",
         rating=default,
-        price_level=default,
-        atmosphere_target=default,
+        price_level=[],
+        atmosphere_target=[],
         types=default,
         contact=existing_contact,
         features=default,
@@ -72,8 +79,8 @@ def test_merge_contacts(no_llm_merger, existing_contact, new_contact, expected):
         id="",
         name="",
         rating=default,
-        price_level=default,
-        atmosphere_target=default,
+        price_level=[],
+        atmosphere_target=[],
         types=default,
         contact=new_contact,
         features=default,
@@ -91,8 +98,8 @@ def test_merge_features(no_llm_merger, existing_feature, new_feature, expected):
         id="",
         name="",
         rating=default,
-        price_level=default,
-        atmosphere_target=default,
+        price_level=[],
+        atmosphere_target=[],
         types=default,
         contact=default,
         features=existing_feature,
@@ -103,8 +110,8 @@ def test_merge_features(no_llm_merger, existing_feature, new_feature, expected):
         id="",
         name="",
         rating=default,
-        price_level=default,
-        atmosphere_target=default,
+        price_level=[],
+        atmosphere_target=[],
         types=default,
         contact=default,
         features=new_feature,
@@ -125,3 +132,178 @@ def test_merge_rating(
     merged_rating = no_llm_merger.merge_rating(rating1, rating2, nb_review1, nb_review2)
 
     assert abs(merged_rating - expected_rating) < 0.01
+
+
+def add_batches(bulk: bool) -> Merger:
+    vectors = {
+        "Restaurant 0": [0, 0, 0],
+        "Restaurant 1": [1, 0, 0],
+        "Restaurant 2": [0, 1, 0],
+        "Restaurant 5": [0, 0, 1],
+    }
+    vector_db = VectorDb()
+    vector_db._embedding_model = LookupModel(vectors)
+    merger = Merger(use_llm=False, use_lexical_prefilter=False, vector_db=vector_db)
+    merger.add_restaurants({0: make_place(0, 48.85), 1: make_place(1, 48.85)}, bulk)
+
+    # A duplicate of a stored place, and a new place followed by its duplicate
+    batch = [make_place(idx, 48.85) for idx in (3, 2, 4, 5)]
+    batch[0].name, batch[2].name = "Restaurant 0", "Restaurant 2"
+    merger.add_restaurants(dict(enumerate(batch)), bulk)
+
+    return merger
+
+
+def test_bulk_add_matches_one_by_one():
+    bulk, one_by_one = add_batches(bulk=True), add_batches(bulk=False)
+
+    assert {key: place.name for key, place in bulk.places.items()} == {
+        "place-0": "Restaurant 0",
+        "place-1": "Restaurant 1",
+        "place-2": "Restaurant 2",
+        "place-3": "Restaurant 5",
+    }
+    assert bulk.registry.by_provider_id("place 3") is bulk.places["place-0"]
+    assert bulk.registry.by_provider_id("place 4") is bulk.places["place-2"]
+    assert bulk.places == one_by_one.places
+    assert bulk.merged_places == one_by_one.merged_places
+
+
+def test_save_and_load(tmp_path):
+    merger = Merger(use_llm=False)
+    vectors = np.eye(3, 8, dtype=np.float32)
+    for idx, latitude in enumerate([48.85, None, 48.86]):
+        merger.insert_restaurant(
+            make_place(idx, latitude), QueryResult("", 1), vectors[idx]
+        )
+
+    merger.save(str(tmp_path))
+    loaded = Merger.load(str(tmp_path))
+
+    assert loaded.places == merger.places
+    assert loaded.vector_db.index.keys == ["place-0", "place-1", "place-2"]
+    assert isinstance(loaded.vector_db.index.store.matrix, np.memmap)
+    assert loaded.vector_db.unlocated_rows == [1]
+    assert loaded.vector_db.search(make_place(2, 48.86), vectors[2])[0] == 2
+    assert loaded.key_matcher.match(make_place(1, None)) == "place-1"
+    assert loaded.registry.by_provider_id("place 2") is loaded.places["place-2"]
+    assert (
+        loaded.insert_restaurant(make_place(3, None), QueryResult("", 1), vectors[0])
+        == "place-3"
+    )
+
+
+def test_load_leaves_the_snapshot_unchanged(tmp_path):
+    merger = Merger(use_llm=False)
+    vectors = np.eye(4, 8, dtype=np.float32)
+    for idx in range(2):
+        merger.insert_restaurant(
+            make_place(idx, 48.85), QueryResult("", 1), vectors[idx]
+        )
+    merger.save(str(tmp_path))
+    vectors_file = tmp_path / "vectors" / "vectors.bin"
+    saved_vectors = vectors_file.read_bytes()
+
+    # Places added after loading, without saving
+    loaded = Merger.load(str(tmp_path))
+    for idx in range(2, 4):
+        loaded.insert_restaurant(
+            make_place(idx, 48.85), QueryResult("", 1), vectors[idx]
+        )
+    loaded.vector_db.flush()
+
+    assert vectors_file.read_bytes() == saved_vectors
+    reloaded = Merger.load(str(tmp_path))
+    assert reloaded.vector_db.index.keys == ["place-0", "place-1"]
+    assert reloaded.vector_db.search(make_place(1, 48.85), vectors[1])[0] == 1
+
+    # Saving over the loaded snapshot replaces it
+    loaded.save(str(tmp_path))
+    assert Merger.load(str(tmp_path)).vector_db.index.keys == [
+        "place-0",
+        "place-1",
+        "place-2",
+        "place-3",
+    ]
+
+
+def test_save_and_load_provider_sources(tmp_path):
+    merger = Merger(use_llm=False)
+    merger.merged_places["1"] = PlaceSource(
+        gmaps_id="gmaps 1",
+        tripadvisor_id="tripadvisor 1",
+        source_provider=ProviderSource.TRIPADVISOR,
+    )
+    merger.merged_places["2"] = PlaceSource(
+        gmaps_id="gmaps 2", tripadvisor_id="", source_provider=None
+    )
+    merger.save(str(tmp_path))
+
+    assert Merger.load(str(tmp_path)).merged_places == merger.merged_places
+
+
+def test_restore_rejects_vectors_without_place():
+    merger = Merger(use_llm=False)
+    merger.vector_db.index.add_batch(np.eye(1, 8, dtype=np.float32), ["place-0"])
+
+    with pytest.raises(ValueError):
+        merger.vector_db.restore_restaurants({})
+
+
+def test_load_rejects_other_versions(tmp_path):
+    merger = Merger(use_llm=False)
+    merger.save(str(tmp_path))
+
+    with open(tmp_path / "metadata.json") as metadata_file:
+        metadata = json.load(metadata_file)
+    with open(tmp_path / "metadata.json", "w") as metadata_file:
+        json.dump({**metadata, "version": 0}, metadata_file)
+
+    with pytest.raises(ValueError):
+        Merger.load(str(tmp_path))
+
+
+def test_places_with_the_same_name_are_kept_apart():
+    merger = Merger(use_llm=False)
+    vectors = np.eye(2, 8, dtype=np.float32)
+    first, second = make_place(0, 48.85), make_place(1, 45.76)
+    second.name = first.name
+
+    first_key = merger.insert_restaurant(first, QueryResult("", 1), vectors[0])
+    second_key = merger.insert_restaurant(second, QueryResult("", 1), vectors[1])
+
+    assert first_key != second_key
+    assert merger.places == {first_key: first, second_key: second}
+    assert Merger(use_llm=False).places == {}
+
+
+def test_merged_records_are_resolved_to_their_place():
+    merger = Merger(use_llm=False)
+    key = merger.insert_restaurant(
+        make_place(0, 48.85), QueryResult("", 1), np.eye(1, 8, dtype=np.float32)[0]
+    )
+    record = make_place(1, 48.85)
+    record.contact.tripadvisor_uri = "tripadvisor 1"
+    merger.merge_restaurant(record, QueryResult(key, 0.1))
+
+    assert merger.registry.resolve(make_place(1, None)) == key
+    assert merger.registry.by_uri("tripadvisor 1") is merger.places[key]
+    assert merger.known_match(record) == key
+
+
+def test_key_edges_skip_keys_shared_by_a_chain(no_llm_merger):
+    places = [make_place(idx, 48.85) for idx in range(4)] + [make_place(4, None)]
+    # A switchboard number shared by three branches, a website shared by two
+    # nearby places, and a phone shared with an unlocated place
+    for place in places[:3]:
+        place.contact.phone = "+33 1 45 55 00 00"
+    places[3].contact.website = places[2].contact.website
+    places[4].contact.phone = places[3].contact.phone
+
+    assert no_llm_merger.key_edges(places) == {(2, 3): 0}
+
+
+def test_reranker_normalizes_phones_like_the_key_matcher():
+    merger = Merger(key_matcher=KeyMatcher("33"), vector_db=VectorDb(k=5))
+
+    assert merger.vector_db.reranker.default_country_code == "33"
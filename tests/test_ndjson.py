@@ -0,0 +1,47 @@
+import tracemalloc
+import types
+
+import pytest
+
+from place_index.exporter.ndjson import export_places, load_places
+from tests.helpers import make_place
+
+
+@pytest.mark.parametrize("file_name", ["places.ndjson", "places.ndjson.gz"])
+def test_export_and_load(tmp_path, file_name):
+    places = [make_place(idx) for idx in range(10)]
+    places[3].name = "Café « Flore »"
+    places[4].latitude = places[4].longitude = None
+    path = str(tmp_path / file_name)
+
+    assert export_places(iter(places), path) == 10
+
+    loaded = load_places(path)
+    assert isinstance(loaded, types.GeneratorType)
+    assert list(loaded) == places
+
+
+def test_export_and_load_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    path = str(tmp_path / "places.ndjson.zst")
+
+    export_places((make_place(idx) for idx in range(10)), path)
+
+    assert list(load_places(path)) == [make_place(idx) for idx in range(10)]
+
+
+def test_streaming_memory(tmp_path):
+    path = str(tmp_path / "places.ndjson.gz")
+
+    tracemalloc.start()
+    export_places((make_place(idx) for idx in range(5000)), path)
+    _, export_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    count = sum(1 for _ in load_places(path))
+    _, load_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # 5000 places would take several megabytes in memory
+    assert count == 5000
+    assert export_peak < 1_000_000
+    assert load_peak < 1_000_000
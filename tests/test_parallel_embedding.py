@@ -0,0 +1,123 @@
+import os
+import re
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from place_index.deduplication.deduplication import VectorDb
+from place_index.deduplication.parallel_embedding import ParallelEmbedder
+from place_index.merger.merger import Merger
+from tests.helpers import make_place
+
+
+class NumberModel:
+    """
+    Embedding model encoding the first number of a text and the process embedding it
+    """
+
+    def embed(self, texts, batch_size=None):
+        for text in texts:
+            number = re.search(r"\d+", text)
+            yield np.array(
+                [int(number.group()) if number else -1, os.getpid(), 1],
+                dtype=np.float32,
+            )
+
+
+def load_number_model(model_name, threads):
+    return NumberModel()
+
+
+class RecordingSharedMemory(shared_memory.SharedMemory):
+    """
+    Shared memory block recording the names of the blocks created
+    """
+
+    created = []
+
+    def __init__(self, name=None, create=False, size=0):
+        super().__init__(name=name, create=create, size=size)
+        if create:
+            self.created.append(self.name)
+
+
+@pytest.fixture(scope="module")
+def embedder():
+    embedder = ParallelEmbedder(
+        "number-model", workers=2, chunk_size=3, model_loader=load_number_model
+    )
+    yield embedder
+    embedder.close()
+
+
+@pytest.fixture
+def recorded_memory(monkeypatch):
+    RecordingSharedMemory.created = []
+    monkeypatch.setattr(shared_memory, "SharedMemory", RecordingSharedMemory)
+    return RecordingSharedMemory.created
+
+
+def assert_unlinked(names):
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_rows_are_in_text_order(embedder, recorded_memory):
+    texts = [f"Restaurant {idx}" for idx in range(20)]
+    vectors = embedder.embed(texts)
+
+    assert embedder.dim == 3
+    assert vectors[:, 0].tolist() == list(range(20))
+    # The chunks are embedded by the workers, not by the main process
+    assert os.getpid() not in vectors[:, 1].tolist()
+    assert len(recorded_memory) == 1
+    assert_unlinked(recorded_memory)
+
+
+def test_shared_memory_is_unlinked_on_error(embedder, recorded_memory):
+    with pytest.raises(RuntimeError):
+        with embedder.shared_embeddings(["Restaurant 1", "Restaurant 2"]) as vectors:
+            assert vectors[:, 0].tolist() == [1, 2]
+            raise RuntimeError("consumer failure")
+
+    assert len(recorded_memory) == 1
+    assert_unlinked(recorded_memory)
+
+
+def test_deferred_places_are_added_from_shared_memory(embedder, recorded_memory):
+    vector_db = VectorDb(workers=2, batch_size=4, blocking_radius=None, k=1)
+    vector_db._parallel_embedder = embedder
+    for idx in range(6):
+        vector_db.add_restaurant(make_place(idx), defer=True, key=f"place-{idx}")
+
+    vectors = vector_db.embed_deferred([make_place(6), make_place(7)])
+
+    assert vectors[:, 0].tolist() == [6, 7]
+    assert vector_db.index.keys == [f"place-{idx}" for idx in range(6)]
+    assert vector_db.index.store.matrix[:, 0].tolist() == list(range(6))
+    assert len(recorded_memory) == 1
+    assert_unlinked(recorded_memory)
+
+
+def test_closing_the_merger_stops_the_workers(recorded_memory):
+    vector_db = VectorDb(workers=2, batch_size=2, blocking_radius=None)
+    embedder = ParallelEmbedder(
+        "number-model", workers=2, chunk_size=2, model_loader=load_number_model
+    )
+    vector_db._parallel_embedder = embedder
+
+    with Merger(vector_db=vector_db) as merger:
+        for idx in range(4):
+            merger.vector_db.add_restaurant(
+                make_place(idx), defer=True, key=f"place-{idx}"
+            )
+        workers = list(embedder.pool._pool)
+
+    # The deferred places are embedded before the workers are stopped
+    assert vector_db.index.store.matrix[:, 0].tolist() == list(range(4))
+    assert vector_db._parallel_embedder is None
+    assert not any(worker.is_alive() for worker in workers)
+    assert len(recorded_memory) == 1
+    assert_unlinked(recorded_memory)
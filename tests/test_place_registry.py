@@ -0,0 +1,55 @@
+from place_index.merger.place_registry import PlaceRegistry
+from tests.helpers import make_place
+
+
+def test_insert_gives_stable_keys():
+    registry = PlaceRegistry()
+    places = [make_place(idx) for idx in range(3)]
+    places[1].name = places[0].name
+
+    keys = [registry.insert(place) for place in places]
+
+    assert keys == ["place-0", "place-1", "place-2"]
+    assert [registry[key] for key in keys] == places
+    assert len(registry) == 3 and "place-1" in registry
+
+
+def test_lookups_by_provider_keys():
+    registry = PlaceRegistry(default_country_code="33")
+    place, record = make_place(0), make_place(1)
+    record.contact.phone = "01 45 55 61 44"
+    key = registry.insert(place)
+    registry.register(key, record)
+
+    assert registry.by_provider_id(place.id) is place
+    assert registry.by_provider_id(record.id) is place
+    assert registry.by_uri(record.contact.gmaps_uri) is place
+    assert registry.by_phone("+33 1 45 55 61 44") == [place]
+    assert registry.by_provider_id("unknown") is None
+    assert registry.by_phone("") == []
+    assert registry.resolve(make_place(1)) == key
+    assert registry.resolve(make_place(2)) is None
+
+
+def test_phone_shared_by_several_places():
+    registry = PlaceRegistry()
+    places = [make_place(idx) for idx in range(2)]
+    for place in places:
+        place.contact.phone = "+33 1 45 55 61 44"
+        registry.insert(place)
+
+    assert registry.by_phone("+33145556144") == places
+
+
+def test_restore():
+    registry = PlaceRegistry()
+    place = make_place(0)
+    place.contact.phone = "+33 1 45 55 61 44"
+    key = registry.insert(place)
+
+    restored = PlaceRegistry()
+    restored.restore({key: place}, registry.to_json())
+
+    assert restored.by_phone("+33145556144") == [place]
+    assert restored.resolve(place) == key
+    assert restored.insert(make_place(1)) == "place-1"
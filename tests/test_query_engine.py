@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from place_index.generic_places import Features
+from place_index.merger.place_registry import PlaceRegistry
+from place_index.merger.tag_canonicalizer import TagCanonicalizer
+from place_index.metadatas import Atmosphere, PriceLevel
+from place_index.query.bitset import bitset_to_rows, rows_to_bitset
+from place_index.query.query_engine import PlaceQuery, QueryEngine
+from tests.helpers import make_place
+
+
+@pytest.mark.parametrize("rows, size", [([], 0), ([0, 3, 8], 9), ([63, 64], 130)])
+def test_bitset_round_trip(rows, size):
+    bitset = rows_to_bitset(rows, size)
+
+    assert bitset == sum(1 << row for row in rows)
+    assert bitset_to_rows(bitset, size).tolist() == rows
+
+
+@pytest.fixture
+def engine():
+    registry = PlaceRegistry()
+    specs = [
+        # types, features, price level, rating, number of reviews
+        (
+            ["italian_restaurant"],
+            Features(reservation=True, credit_card=True),
+            "LOW",
+            4.5,
+            120,
+        ),
+        (["Italian"], Features(reservation=True), "MEDIUM", 4.4, 30),
+        (
+            ["pizza_restaurant"],
+            Features(reservation=True, credit_card=True),
+            "LOW",
+            4.8,
+            10,
+        ),
+        (
+            ["italian_restaurant"],
+            Features(reservation=True, credit_card=True),
+            "HIGH",
+            4.6,
+            80,
+        ),
+        (["italian"], Features(reservation=True, credit_card=True), "MEDIUM", 4.2, 300),
+        (["Italian"], Features(reservation=True, credit_card=True), "MEDIUM", 4.3, 50),
+    ]
+    for idx, (types, features, price_level, rating, number_of_reviews) in enumerate(
+        specs
+    ):
+        place = make_place(idx)
+        place.types = types
+        place.features = features
+        place.price_level = [PriceLevel(price_level)]
+        place.rating = rating
+        place.number_of_reviews = number_of_reviews
+        registry.insert(place)
+
+    return QueryEngine(registry, TagCanonicalizer())
+
+
+def test_query_intersects_every_filter(engine):
+    query = PlaceQuery(
+        types=["Italian"],
+        features=["reservation", "credit_card"],
+        price_levels=[PriceLevel.LOW, PriceLevel.MEDIUM],
+        min_rating=4.3,
+    )
+
+    assert engine.keys_of(query) == ["place-0", "place-5"]
+    assert engine.count(query) == 2
+
+
+def test_ranges_and_limit(engine):
+    assert engine.keys_of(PlaceQuery(min_reviews=50, max_reviews=120)) == [
+        "place-3",
+        "place-0",
+        "place-5",
+    ]
+    assert engine.keys_of(PlaceQuery(), limit=2) == ["place-2", "place-3"]
+    assert engine.keys_of(PlaceQuery(types=["sushi"])) == []
+    assert engine.count(PlaceQuery(atmospheres=[Atmosphere.FAMILY])) == 6
+
+
+def test_unknown_feature(engine):
+    with pytest.raises(ValueError):
+        engine.count(PlaceQuery(features=["pool"]))
+
+
+def test_indexes_follow_the_registry(engine):
+    assert engine.count(PlaceQuery(types=["sushi"])) == 0
+
+    place = make_place(6)
+    place.types = ["sushi_restaurant"]
+    engine.registry.insert(place)
+
+    assert engine.search(PlaceQuery(types=["sushi"])) == [place]
+    assert len(engine) == 7
+
+
+def test_query_matches_a_scan():
+    registry = PlaceRegistry()
+    rng = np.random.default_rng(0)
+    for idx in range(500):
+        place = make_place(idx)
+        place.features = Features.from_mask(int(rng.integers(0, 512)))
+        place.price_level = [rng.choice(list(PriceLevel))]
+        place.rating = float(rng.integers(0, 50)) / 10
+        registry.insert(place)
+    engine = QueryEngine(registry)
+    query = PlaceQuery(
+        features=["wifi", "takeout"],
+        price_levels=[PriceLevel.LOW, PriceLevel.MEDIUM],
+        min_rating=3.5,
+    )
+
+    expected = [
+        key
+        for key, place in registry.places.items()
+        if place.features.wifi
+        and place.features.takeout
+        and set(place.price_level) & {PriceLevel.LOW, PriceLevel.MEDIUM}
+        and place.rating >= 3.5
+    ]
+
+    assert sorted(engine.keys_of(query)) == sorted(expected)
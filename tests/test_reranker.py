@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from place_index.deduplication.reranker import Reranker
+from tests.helpers import make_restaurant
+
+
+@pytest.fixture
+def reranker():
+    reranker = Reranker(radius=250, default_country_code="33")
+    reranker.add(0, make_restaurant("Other", phone="+33100000000"), "place-0")
+    reranker.add(1, make_restaurant("Le Bistrot", phone="+33145556144"), "place-1")
+    reranker.add(2, make_restaurant("Far", latitude=48.0, longitude=2.0), "place-2")
+    return reranker
+
+
+def test_phone_agreement_beats_closer_embedding(reranker):
+    query = make_restaurant("Le Bistrot", phone="+33 1 45 55 61 44")
+
+    row, score = reranker.rerank(query, np.array([0, 1]), np.array([0.20, 0.25]))
+
+    assert row == 1
+    assert score == pytest.approx(0.25 - reranker.weights.phone)
+
+
+def test_geographic_distance_is_penalized(reranker):
+    query = make_restaurant("Near", latitude=48.9, longitude=2.0)
+
+    row, _ = reranker.rerank(query, np.array([2, 1]), np.array([0.20, 0.22]))
+
+    assert row == 1
+
+
+def test_national_phone_numbers_agree(reranker):
+    query = make_restaurant("Le Bistrot", phone="01 45 55 61 44")
+
+    row, score = reranker.rerank(query, np.array([0, 1]), np.array([0.20, 0.25]))
+
+    assert row == 1
+    assert score == pytest.approx(0.25 - reranker.weights.phone)
+
+
+@pytest.mark.parametrize(
+    "rows, distances, expected",
+    [
+        (np.array([-1, -1]), np.array([np.inf, np.inf]), (-1, float("inf"))),
+        (np.array([1, -1]), np.array([0.3, np.inf]), (1, 0.3)),
+    ],
+)
+def test_missing_candidates_are_ignored(reranker, rows, distances, expected):
+    row, score = reranker.rerank(make_restaurant("Unknown"), rows, distances)
+
+    assert (row, score) == pytest.approx(expected)
+
+
+def test_update_refreshes_signals(reranker):
+    reranker.update("place-2", make_restaurant("Far", phone="+33145556144"))
+
+    assert reranker.phones[2] == "+33145556144"
+    assert np.isnan(reranker.latitudes[2])
+
+
+def test_places_sharing_a_name_keep_their_rows(reranker):
+    reranker.add(3, make_restaurant("Le Bistrot", phone="+33100000003"), "place-3")
+    reranker.update("place-1", make_restaurant("Le Bistrot", website="bistrot.fr"))
+
+    assert reranker.phones[1] is None and reranker.domains[1] == "bistrot.fr"
+    assert reranker.phones[3] == "+33100000003"
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from place_index.generic_places import Reviews
+from place_index.merger.place_registry import PlaceRegistry
+from place_index.query.review_search import BLOCK_SIZE, PostingList, ReviewSearch
+from place_index.query.tokenizer import tokenize
+from tests.helpers import make_place
+
+
+@pytest.mark.parametrize(
+    "text, lang, expected",
+    [
+        ("The terraces were lovely!", "en", ["terrace", "lovely"]),
+        ("Une belle terrasse, très calme", "fr-FR", ["belle", "terrasse", "calme"]),
+        ("Les gâteaux", "fr", ["gateau"]),
+        ("Gluten-free options", "en", ["gluten", "free", "option"]),
+        ("The bus", "", ["the", "bus"]),
+    ],
+)
+def test_tokenize(text, lang, expected):
+    assert tokenize(text, lang) == expected
+
+
+def test_posting_list_round_trip():
+    posting_list = PostingList()
+    review_ids = np.cumsum(np.random.default_rng(0).integers(1, 1000, 300))
+    for idx, review_id in enumerate(review_ids.tolist()):
+        posting_list.add(review_id, idx % 7 + 1, 10)
+
+    first_ids, last_ids, max_frequencies, _ = posting_list.block_bounds()
+    decoded, frequencies = posting_list.decode(np.arange(len(first_ids)))
+
+    assert len(first_ids) == 300 // BLOCK_SIZE + 1
+    assert decoded.tolist() == review_ids.tolist()
+    assert frequencies.tolist() == [idx % 7 + 1 for idx in range(300)]
+    assert posting_list.deltas[0].dtype == np.uint16
+
+
+def make_reviews(*contents, lang="en"):
+    return [Reviews(4, lang, "", content, None) for content in contents]
+
+
+@pytest.fixture
+def search():
+    registry = PlaceRegistry()
+    contents = [
+        ["Lovely terrace in the sun", "Slow service"],
+        ["Quick lunch, friendly staff, nice desserts and coffee"],
+        ["Gluten free options and a quiet terrace", "Great terrace, quick lunch"],
+        ["Une très belle terrasse"],
+    ]
+    for idx, reviews in enumerate(contents):
+        place = make_place(idx)
+        place.reviews = make_reviews(*reviews, lang="fr" if idx == 3 else "en")
+        registry.insert(place)
+
+    return ReviewSearch(registry)
+
+
+def test_search(search):
+    matches = search.search("terraces", k=5)
+
+    assert [match.key for match in matches] == ["place-0", "place-2"]
+    assert matches[1].review.content == "Great terrace, quick lunch"
+    assert [match.key for match in search.search("quick lunch", k=1)] == ["place-2"]
+    assert search.search("terrasse", lang="fr")[0].key == "place-3"
+    assert search.search("pool") == []
+
+
+def test_index_follows_merges(search):
+    place = search.registry.places["place-1"]
+    assert len(search.search("terrace")) == 2
+
+    place.reviews = place.reviews + make_reviews("Terrace on the roof")
+    search.registry.version += 1
+
+    assert [match.key for match in search.search("roof")] == ["place-1"]
+    assert len(search) == 7 and search.deleted_reviews == 1
+
+
+def test_early_termination_keeps_the_best_places():
+    registry = PlaceRegistry()
+    rng = np.random.default_rng(0)
+    vocabulary = [f"word{idx}" for idx in range(200)]
+    for idx in range(400):
+        place = make_place(idx)
+        place.reviews = make_reviews(
+            *[
+                " ".join(rng.choice(vocabulary, rng.integers(3, 30), p=None))
+                for _ in range(rng.integers(1, 6))
+            ]
+        )
+        registry.insert(place)
+    search = ReviewSearch(registry)
+    query = "word1 word2 word3 word150 word199"
+
+    exhaustive = search.search(query, k=len(registry))
+    top = search.search(query, k=10)
+
+    assert [match.score for match in top] == pytest.approx(
+        [match.score for match in exhaustive[:10]]
+    )
@@ -0,0 +1,74 @@
+import pytest
+
+from place_index.generic_places import Reviews
+from place_index.merger.review_store import (
+    ReviewRetention,
+    ReviewStore,
+    review_fingerprint,
+)
+
+
+def make_review(idx: int, rating: float = 4, author: str = "Jean", provider="google"):
+    return Reviews(
+        rating=rating,
+        lang="fr",
+        title="",
+        content=f"Très bon restaurant {idx}",
+        publication_date=f"2025-01-{idx + 1:02d}",
+        author=author,
+        provider=provider,
+    )
+
+
+def test_review_fingerprint():
+    review = make_review(0)
+    same_review = make_review(0, author=" JEAN ")
+    same_review.content = "TRES  bon restaurant 0"
+
+    assert review_fingerprint(review) == review_fingerprint(same_review)
+    assert review_fingerprint(review) != review_fingerprint(make_review(1))
+    assert review_fingerprint(review) != review_fingerprint(
+        make_review(0, provider="tripadvisor")
+    )
+
+
+def test_duplicates_are_rejected():
+    store = ReviewStore()
+    reviews = store.merge("place", [], [make_review(0), make_review(1), make_review(0)])
+
+    for _ in range(3):
+        reviews = store.merge("place", reviews, [make_review(1), make_review(2)])
+
+    assert [review.content[-1] for review in reviews] == ["0", "1", "2"]
+    assert store.rejected == 1 + 1 + 2 * 2
+
+
+def test_dropped_reviews_are_not_added_back():
+    store = ReviewStore(max_reviews=2)
+    reviews = store.merge("place", [], [make_review(idx) for idx in range(4)])
+
+    assert [review.publication_date for review in reviews] == [
+        "2025-01-04",
+        "2025-01-03",
+    ]
+    assert store.merge("place", reviews, [make_review(0)]) == reviews
+
+
+@pytest.mark.parametrize(
+    "ratings, max_reviews, expected",
+    [
+        ([5] * 8 + [1] * 2, 5, {5: 4, 1: 1}),
+        ([5] * 6 + [3] * 3 + [1], 4, {5: 2, 3: 1, 1: 1}),
+        ([4, 4], 5, {4: 2}),
+    ],
+)
+def test_stratified_retention(ratings, max_reviews, expected):
+    store = ReviewStore(max_reviews=max_reviews, retention=ReviewRetention.STRATIFIED)
+    reviews = [make_review(idx, rating) for idx, rating in enumerate(ratings)]
+
+    kept = store.merge("place", [], reviews)
+
+    counts = {}
+    for review in kept:
+        counts[review.rating] = counts.get(review.rating, 0) + 1
+    assert counts == expected
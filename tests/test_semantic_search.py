@@ -0,0 +1,86 @@
+import zlib
+
+import numpy as np
+
+from place_index.deduplication.deduplication import VectorDb
+from place_index.generic_places import Reviews
+from place_index.merger.place_registry import PlaceRegistry
+from place_index.query.semantic_search import SemanticSearch
+from place_index.query.tokenizer import tokenize
+from tests.helpers import make_place
+
+
+class BagOfWordsModel:
+    """
+    Embedding model hashing the words of a text, so similar texts share dimensions
+    """
+
+    def __init__(self):
+        self.texts = []
+
+    def embed(self, texts, batch_size=None):
+        for text in [texts] if isinstance(texts, str) else texts:
+            self.texts.append(text)
+            vector = np.zeros(64, dtype=np.float32)
+            for token in tokenize(text, "en"):
+                vector[zlib.crc32(token.encode()) % 64] += 1
+            yield vector / max(np.linalg.norm(vector), 1)
+
+
+def make_search(**options) -> SemanticSearch:
+    registry = PlaceRegistry()
+    profiles = [
+        (["italian"], "Homemade pasta and wood fired pizza"),
+        (["japanese"], "Fresh sushi and ramen bowls"),
+        (["cafe"], "Great coffee, croissants for breakfast"),
+        (["italian"], "Pizza by the slice, quick lunch"),
+    ]
+    for idx, (types, review) in enumerate(profiles):
+        place = make_place(idx)
+        place.types = types
+        place.reviews = [Reviews(5, "en", "", review, "2025-01-01")]
+        registry.insert(place)
+
+    vector_db = VectorDb()
+    vector_db._embedding_model = BagOfWordsModel()
+    return SemanticSearch(registry, vector_db, **options)
+
+
+def test_search():
+    search = make_search()
+
+    assert search.search("sushi ramen", k=1)[0][0] == "place-1"
+    assert {key for key, _ in search.search("pizza", k=2)} == {"place-0", "place-3"}
+    assert search.search("pizza", k=2, among=["place-3", "place-1"])[0][0] == "place-3"
+    assert search.search("pizza", among=[]) == []
+
+
+def test_profiles_are_embedded_once():
+    search = make_search()
+    model = search.vector_db.embedding_model
+    search.search("coffee")
+    embedded = len(model.texts)
+
+    place = search.registry.places["place-2"]
+    place.reviews = place.reviews + [
+        Reviews(5, "en", "", "Matcha latte and sushi", "2025-02-01")
+    ]
+    search.registry.version += 1
+    result = search.search("matcha latte", k=4)
+
+    # The changed profile and the two queries only
+    assert len(model.texts) == embedded + 2
+    assert result[0][0] == "place-2"
+    assert len(result) == 4 and len({key for key, _ in result}) == 4
+
+
+def test_compaction_keeps_the_vectors():
+    search = make_search()
+    search.search("coffee")
+    for key in ["place-0", "place-1"]:
+        search.registry.places[key].name += " Bis"
+    search.registry.version += 1
+
+    assert len(search.search("sushi", k=10)) == 4
+    assert search.stale_rows == set() and len(search.index) == 4
+    assert search.search("sushi", k=1)[0][0] == "place-1"
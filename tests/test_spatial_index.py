@@ -0,0 +1,33 @@
+import pytest
+
+from place_index.deduplication.spatial_index import GridIndex, haversine
+
+EIFFEL_TOWER = (48.858265, 2.294494)
+TROCADERO = (48.861980, 2.288750)
+NOTRE_DAME = (48.852968, 2.349902)
+
+
+@pytest.mark.parametrize(
+    "first, second, expected",
+    [
+        (EIFFEL_TOWER, EIFFEL_TOWER, 0),
+        (EIFFEL_TOWER, TROCADERO, 600),
+        (EIFFEL_TOWER, NOTRE_DAME, 4100),
+    ],
+)
+def test_haversine(first, second, expected):
+    assert haversine(*first, *second) == pytest.approx(expected, rel=0.05, abs=1)
+
+
+@pytest.mark.parametrize(
+    "radius, expected", [(100, [0]), (1000, [0, 1]), (10_000, [0, 1, 2])]
+)
+def test_grid_within_radius(radius, expected):
+    grid = GridIndex(cell_size_meters=250)
+    for item, coordinates in enumerate([EIFFEL_TOWER, TROCADERO, NOTRE_DAME]):
+        grid.add(item, *coordinates)
+
+    items, distances = grid.within_radius(*EIFFEL_TOWER, radius)
+
+    assert sorted(items.tolist()) == expected
+    assert all(distance <= radius for distance in distances)
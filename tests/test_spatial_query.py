@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from place_index.deduplication.spatial_index import haversine
+from place_index.merger.place_registry import PlaceRegistry
+from place_index.query import spatial_query
+from place_index.query.spatial_query import SpatialQuery
+from tests.helpers import make_place
+
+EIFFEL_TOWER = (48.858265, 2.294494)
+
+
+@pytest.fixture
+def places():
+    registry = PlaceRegistry()
+    rng = np.random.default_rng(0)
+    for idx in range(300):
+        place = make_place(idx)
+        place.latitude = EIFFEL_TOWER[0] + rng.uniform(-0.05, 0.05)
+        place.longitude = EIFFEL_TOWER[1] + rng.uniform(-0.08, 0.08)
+        registry.insert(place)
+
+    unlocated = make_place(300)
+    unlocated.latitude = unlocated.longitude = None
+    registry.insert(unlocated)
+
+    return SpatialQuery(registry, cell_size_meters=250)
+
+
+def brute_force(registry, latitude, longitude):
+    distances = {
+        key: haversine(latitude, longitude, place.latitude, place.longitude)
+        for key, place in registry.places.items()
+        if place.has_location()
+    }
+    return sorted(distances.items(), key=lambda item: item[1])
+
+
+@pytest.mark.parametrize("meters", [0, 300, 1500, 20_000])
+def test_within_radius(places, meters):
+    expected = [
+        key
+        for key, distance in brute_force(places.registry, *EIFFEL_TOWER)
+        if distance <= meters
+    ]
+
+    assert [key for key, _ in places.within_radius(*EIFFEL_TOWER, meters)] == expected
+
+
+@pytest.mark.parametrize("k", [1, 5, 50, 400])
+def test_nearest(places, k):
+    expected = brute_force(places.registry, *EIFFEL_TOWER)[:k]
+    result = places.nearest(*EIFFEL_TOWER, k)
+
+    assert [key for key, _ in result] == [key for key, _ in expected]
+    assert [distance for _, distance in result] == pytest.approx(
+        [distance for _, distance in expected]
+    )
+
+
+@pytest.mark.parametrize("batch_distances", [spatial_query.BATCH_DISTANCES, 1000])
+def test_batch_queries_match_single_queries(places, monkeypatch, batch_distances):
+    # With 1000 distances at once, the origins are processed 3 at a time
+    monkeypatch.setattr(spatial_query, "BATCH_DISTANCES", batch_distances)
+    rng = np.random.default_rng(1)
+    latitudes = EIFFEL_TOWER[0] + rng.uniform(-0.05, 0.05, 20)
+    longitudes = EIFFEL_TOWER[1] + rng.uniform(-0.08, 0.08, 20)
+
+    nearest = places.nearest_batch(latitudes, longitudes, 10)
+    within = places.within_radius_batch(latitudes, longitudes, 800)
+
+    for idx, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+        assert [key for key, _ in nearest[idx]] == [
+            key for key, _ in places.nearest(latitude, longitude, 10)
+        ]
+        assert [key for key, _ in within[idx]] == [
+            key for key, _ in places.within_radius(latitude, longitude, 800)
+        ]
+    assert places.distances(latitudes, longitudes).shape == (20, 300)
+
+
+def test_grid_follows_the_registry(places):
+    assert len(places) == 300
+
+    place = make_place(301)
+    place.latitude, place.longitude = 45.76, 4.83
+    key = places.registry.insert(place)
+
+    assert places.nearest(45.76, 4.83, 1) == [(key, 0.0)]
+    assert SpatialQuery(PlaceRegistry()).nearest_batch([45.76], [4.83], 3) == [[]]
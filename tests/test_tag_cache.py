@@ -0,0 +1,78 @@
+import pytest
+
+from place_index.merger.llm_handler import LLMHandler
+from place_index.merger.tag_cache import TagMergeCache, canonical_tags
+from tests.llm_server import StubLLMServer
+
+
+@pytest.mark.parametrize(
+    "tags, expected",
+    [
+        (["italian_restaurant", "Pizza"], ("italian restaurant", "pizza")),
+        (["Café", "cafe", " CAFE "], ("cafe",)),
+        ([], ()),
+    ],
+)
+def test_canonical_tags(tags, expected):
+    assert canonical_tags(tags) == expected
+
+
+def test_cache_key_is_order_independent(tmp_path):
+    cache = TagMergeCache(str(tmp_path / "tags.db"), "v1")
+
+    key = cache.key(["Italian", "Pizza"], ["italian_restaurant"])
+
+    assert key == cache.key(["italian restaurant"], ["pizza", "italian"])
+    assert key != TagMergeCache(str(tmp_path / "other.db"), "v2").key(
+        ["Italian", "Pizza"], ["italian_restaurant"]
+    )
+
+
+def test_cache_persistence(tmp_path):
+    path = str(tmp_path / "tags.db")
+    cache = TagMergeCache(path, "v1")
+    cache.put_many([(["cafe"], ["Cafe"]), (["bar"], ["pub"])], [["Cafe"], None])
+    cache.close()
+
+    reloaded = TagMergeCache(path, "v1")
+    results, missing = reloaded.get_many([(["CAFE"], ["cafe"]), (["bar"], ["pub"])])
+
+    assert results == [["Cafe"], None]
+    assert missing == [1]
+    assert (reloaded.hits, reloaded.misses) == (1, 1)
+    assert TagMergeCache(path, "v2").get_many([(["cafe"], ["Cafe"])])[1] == [0]
+
+
+def test_cache_eviction(tmp_path):
+    cache = TagMergeCache(
+        str(tmp_path / "tags.db"), "v1", max_entries=4, eviction_ratio=0.5
+    )
+
+    for tag in ["a", "b", "c", "d"]:
+        cache.put_many([([tag], [])], [[tag]])
+    # Touch "a" so "b" and "c" are the least recently used
+    cache.get_many([(["a"], [])])
+    cache.put_many([(["e"], [])], [["e"]])
+
+    _, missing = cache.get_many([([tag], []) for tag in ["a", "b", "c", "d", "e"]])
+
+    assert len(cache) == 3
+    assert missing == [1, 2]
+
+
+def test_llm_handler_cache(tmp_path):
+    pairs = [(["italian_restaurant"], ["Pizza"]), (["cafe"], ["Bar"])] * 3
+
+    with StubLLMServer(latency=0) as server:
+        handler = LLMHandler(
+            base_url=server.base_url,
+            api_key="test",
+            pairs_per_request=1,
+            cache_path=str(tmp_path / "tags.db"),
+        )
+        first = handler.merge_tags_batch(pairs)
+        second = handler.merge_tags_batch(list(reversed(pairs)))
+
+    assert server.requests == 2
+    assert second == list(reversed(first))
+    assert handler.cache.hits == 6
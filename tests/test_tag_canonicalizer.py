@@ -0,0 +1,56 @@
+import pytest
+
+from place_index.merger.tag_canonicalizer import TagCanonicalizer
+
+
+@pytest.fixture
+def canonicalizer():
+    return TagCanonicalizer()
+
+
+@pytest.mark.parametrize(
+    "tag, expected",
+    [
+        ("italian_restaurant", "italian"),
+        ("Italian restaurant", "italian"),
+        ("Italian", "italian"),
+        ("coffee_shop", "cafe"),
+        ("Café", "cafe"),
+        ("steak_house", "steakhouse"),
+        ("breakfast_restaurant", "brunch"),
+        ("Vegan Options", "vegan"),
+        ("point_of_interest", None),
+        ("establishment", None),
+        ("", None),
+    ],
+)
+def test_canonical_name(canonicalizer, tag, expected):
+    assert canonicalizer.canonical_name(tag) == expected
+
+
+def test_tag_ids_are_interned(canonicalizer):
+    size = len(canonicalizer.vocabulary)
+
+    first = canonicalizer.tag_id("pizza_restaurant")
+    assert first == canonicalizer.tag_id("Pizza") == canonicalizer.tag_id("pizzeria")
+    assert len(canonicalizer.vocabulary) == size
+
+    new_id = canonicalizer.tag_id("Basque")
+    assert new_id == size
+    assert canonicalizer.tag_id("basque") == new_id
+
+
+@pytest.mark.parametrize(
+    "tags_1, tags_2, expected",
+    [
+        (
+            ["italian_restaurant", "restaurant", "point_of_interest"],
+            ["Italian", "Pizza"],
+            ["italian", "pizza"],
+        ),
+        (["cafe", "coffee_shop"], ["Cafe"], ["cafe"]),
+        ([], ["establishment"], []),
+    ],
+)
+def test_merge(canonicalizer, tags_1, tags_2, expected):
+    assert sorted(canonicalizer.merge(tags_1, tags_2)) == expected
@@ -0,0 +1,59 @@
+import pytest
+
+from place_index.deduplication.trigram_index import (
+    LexicalDecision,
+    LexicalPrefilter,
+    TrigramIndex,
+    trigrams,
+)
+from tests.helpers import make_restaurant
+
+# Coordinates of the Eiffel Tower
+LATITUDE, LONGITUDE = 48.8582, 2.2945
+
+
+def test_trigrams():
+    assert trigrams("Café") == {"  c", " ca", "caf", "afe", "fe "}
+    assert trigrams("  ") == set()
+
+
+def test_trigram_candidates():
+    index = TrigramIndex()
+    for item, name in enumerate(["Le Jules Verne", "Café de l'Homme", "Les Ombres"]):
+        index.add(item, name)
+
+    candidates = index.candidates("le jules verne")
+
+    assert candidates[0] == (0, 1)
+    assert 1 not in [item for item, _ in candidates]
+
+
+@pytest.mark.parametrize(
+    "name, address, latitude, expected",
+    [
+        ("Le Jules Verne", "Tour Eiffel, 75007 Paris", 48.8582, LexicalDecision.MATCH),
+        ("Jules Verne", "Av. Gustave Eiffel", 48.8582, LexicalDecision.AMBIGUOUS),
+        ("Le Jules Verne", "Tour Eiffel, 75007 Paris", 48.87, LexicalDecision.NEW),
+        ("Pizza Pino", "Tour Eiffel, 75007 Paris", 48.8582, LexicalDecision.NEW),
+    ],
+)
+def test_lexical_prefilter(name, address, latitude, expected):
+    prefilter = LexicalPrefilter()
+    prefilter.add(
+        make_restaurant(
+            "Le Jules Verne",
+            address="Tour Eiffel, Av. Gustave Eiffel, 75007 Paris",
+            latitude=LATITUDE,
+            longitude=LONGITUDE,
+        ),
+        "jules verne",
+    )
+
+    assert (
+        prefilter.check(
+            make_restaurant(
+                name, address=address, latitude=latitude, longitude=LONGITUDE
+            )
+        ).decision
+        == expected
+    )
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+
+import requests
+
+from place_index.fetcher.fetcher import Fetcher, TripadvisorProvider
+from place_index.tripadvisor import tripadvisor_api_handler
+from place_index.tripadvisor.tripadvisor_api_handler import TripadvisorApiHandler
+
+LATENCY = 0.1
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.ok = status_code == 200
+        self.text = str(content)
+
+    def json(self):
+        if not isinstance(self.content, str):
+            return self.content
+        return json.loads(self.content)
+
+
+class SlowTripAdvisorApi:
+    """
+    Tripadvisor api answering after a fixed latency, the details of the first location
+    being slower than the other requests
+    """
+
+    def __init__(self, location_ids, failing_reviews=None, malformed_details=None):
+        self.location_ids = location_ids
+        self.failing_reviews = failing_reviews
+        self.malformed_details = malformed_details
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _wait(self, latency):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(latency)
+        with self.lock:
+            self.in_flight -= 1
+
+    def api_nearby_wrapper(self, lat, long, distance):
+        return FakeResponse(
+            {
+                "data": [
+                    {"location_id": location_id, "name": f"Place {location_id}"}
+                    for location_id in self.location_ids
+                ]
+            }
+        )
+
+    def api_details_wrapper(self, location_id):
+        self._wait(3 * LATENCY if location_id == self.location_ids[0] else LATENCY)
+        if location_id == self.malformed_details:
+            return FakeResponse("<html>Service unavailable</html>")
+
+        return FakeResponse(
+            {
+                "location_id": location_id,
+                "name": f"Place {location_id}",
+                "address_obj": {"address_string": "1 rue de Rivoli, Paris"},
+                "rating": "4.5",
+                "num_reviews": "1",
+            }
+        )
+
+    def api_tripadvisor_reviews(self, location_id):
+        self._wait(LATENCY)
+        if location_id == self.failing_reviews:
+            raise requests.ConnectionError("connection reset")
+
+        # Reviews are parsed by the tripadvisor types, only their location matters here
+        return FakeResponse({"data": []})
+
+
+def make_handler(api, max_in_flight=8) -> TripadvisorApiHandler:
+    handler = TripadvisorApiHandler(max_in_flight=max_in_flight)
+    handler.tripadvisor = api
+    return handler
+
+
+def test_fetch_all_is_concurrent_and_ordered():
+    location_ids = list(range(1, 5))
+    api = SlowTripAdvisorApi(location_ids)
+
+    start = time.perf_counter()
+    places = make_handler(api).fetch_all(48.85, 2.35, 100)
+    elapsed = time.perf_counter() - start
+
+    # 8 requests in flight at once: the slowest request bounds the fetch
+    assert elapsed < 5 * LATENCY
+    assert api.max_in_flight == 8
+    assert list(places) == location_ids
+    for location_id, place in places.items():
+        assert place.details.location_id == location_id
+        assert place.reviews.location_id == location_id
+
+
+def test_concurrency_is_bounded():
+    api = SlowTripAdvisorApi(list(range(1, 7)))
+    places = make_handler(api, max_in_flight=3).fetch_all(48.85, 2.35, 100)
+
+    assert len(places) == 6
+    assert api.max_in_flight == 3
+
+
+def test_places_are_yielded_as_they_complete():
+    api = SlowTripAdvisorApi([1, 2, 3])
+    yielded = [
+        content.details.location_id
+        for content in make_handler(api).iter_all(48.85, 2.35, 100)
+    ]
+
+    # The details of the first location are the slowest
+    assert yielded[-1] == 1
+    assert sorted(yielded) == [1, 2, 3]
+
+
+def test_failed_locations_are_skipped():
+    api = SlowTripAdvisorApi([1, 2, 3], failing_reviews=2)
+    handler = make_handler(api)
+    places = handler.fetch_all(48.85, 2.35, 100)
+
+    assert list(places) == [1, 3]
+    assert handler.location_reviews_error == 1
+    assert handler.location_details_error == 0
+
+
+def test_malformed_answers_are_skipped(monkeypatch):
+    api = SlowTripAdvisorApi([1, 2, 3], malformed_details=2)
+    monkeypatch.setattr(tripadvisor_api_handler, "TripAdvisorApi", lambda: api)
+    fetcher = Fetcher()
+    fetcher.providers = [TripadvisorProvider()]
+
+    places = fetcher.fetch_all([(48.85, 2.35), (48.86, 2.35)])
+
+    assert sorted(place.id for place in places.values()) == ["1", "3"]
+
+
+def test_concurrency_is_bounded_across_the_points_of_a_provider(monkeypatch):
+    api = SlowTripAdvisorApi(list(range(1, 5)))
+    monkeypatch.setattr(tripadvisor_api_handler, "TripAdvisorApi", lambda: api)
+    fetcher = Fetcher(max_concurrency=3)
+    fetcher.providers = [TripadvisorProvider(max_in_flight=3)]
+
+    fetcher.fetch_all([(48.85 + idx / 100, 2.35) for idx in range(3)])
+
+    # 3 points of 8 requests each, with 3 requests in flight for the provider
+    assert api.max_in_flight == 3
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from place_index.deduplication.deduplication import VectorDb
+from place_index.deduplication.vector_index import VectorIndex
+
+
+@pytest.fixture
+def random_vectors():
+    rng = np.random.default_rng(0)
+    return rng.random((600, 16), dtype=np.float32)
+
+
+def test_search_empty_index():
+    index = VectorIndex()
+    row, distance = index.search(np.zeros(4, dtype=np.float32))
+
+    assert row == -1
+    assert distance == float("inf")
+
+
+def test_capacity_doubling(random_vectors):
+    index = VectorIndex(initial_capacity=4)
+    for idx, vector in enumerate(random_vectors[:9]):
+        index.add(vector, str(idx))
+
+    assert len(index) == 9
+    assert index.store._matrix.shape[0] == 16
+    assert np.array_equal(index.vectors, random_vectors[:9])
+
+
+def test_dimension_mismatch(random_vectors):
+    index = VectorIndex()
+    index.add(random_vectors[0], "0")
+
+    with pytest.raises(ValueError):
+        index.add(np.zeros(3, dtype=np.float32), "1")
+
+
+@pytest.mark.parametrize("ann_threshold", [10_000, 200])
+def test_search_finds_nearest(random_vectors, ann_threshold):
+    index = VectorIndex(initial_capacity=8, ann_threshold=ann_threshold)
+    for idx, vector in enumerate(random_vectors):
+        index.add(vector, str(idx))
+
+    # The most recent vectors live in the exactly-searched tail
+    for idx in [0, 150, len(random_vectors) - 1]:
+        row, distance = index.search(random_vectors[idx])
+        assert index.keys[row] == str(idx)
+        assert distance == pytest.approx(0, abs=1e-3)
+
+
+@pytest.mark.parametrize("ann_threshold", [10_000, 200])
+def test_search_batch_matches_search(random_vectors, ann_threshold):
+    index = VectorIndex(ann_threshold=ann_threshold)
+    index.add_batch(random_vectors, [str(idx) for idx in range(len(random_vectors))])
+
+    queries = random_vectors[::50] + 0.001
+    rows, distances = index.search_batch(queries)
+
+    for query, row, distance in zip(queries, rows, distances):
+        expected_row, expected_distance = index.search(query)
+        assert row == expected_row
+        assert distance == pytest.approx(expected_distance, abs=1e-3)
+
+
+def test_nearest_previous():
+    vectors = np.array([[0, 0], [10, 0], [0, 1], [10, 2]], dtype=np.float32)
+    rows, distances = VectorDb.nearest_previous(vectors, chunk_size=2)
+
+    assert rows.tolist() == [-1, 0, 0, 1]
+    assert distances.tolist() == pytest.approx([np.inf, 10, 1, 2])
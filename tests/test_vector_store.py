@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from place_index.deduplication.vector_index import VectorIndex
+from place_index.deduplication.vector_store import VectorStore
+
+
+@pytest.fixture
+def embeddings():
+    vectors = np.random.default_rng(0).normal(size=(300, 32)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_quantized_search(embeddings, dtype):
+    index = VectorIndex(store=VectorStore(dtype=dtype), ann_threshold=100)
+    index.add_batch(embeddings, [str(idx) for idx in range(len(embeddings))])
+
+    rows, distances = index.search_batch(embeddings[:20])
+
+    assert index.vectors.dtype == np.dtype(dtype)
+    assert rows.tolist() == list(range(20))
+    assert np.all(distances < 0.05)
+
+
+def test_projected_search(embeddings):
+    store = VectorStore(dtype="int8")
+    store.fit(embeddings, projection_dim=16)
+    index = VectorIndex(store=store)
+    index.add_batch(embeddings, [str(idx) for idx in range(len(embeddings))])
+
+    row, _ = index.search(embeddings[42])
+
+    assert index.vectors.shape == (len(embeddings), 16)
+    assert row == 42
+
+
+def test_memmap_store_reopen(tmp_path, embeddings):
+    store = VectorStore(path=str(tmp_path), dtype="float16", initial_capacity=16)
+    index = VectorIndex(store=store)
+    index.add_batch(embeddings[:100], [f"place {idx}" for idx in range(100)])
+    index.add(embeddings[100], "place 100")
+    store.flush()
+
+    reopened = VectorIndex(store=VectorStore.open(str(tmp_path)))
+    row, distance = reopened.search(embeddings[100])
+
+    assert isinstance(reopened.vectors, np.memmap)
+    assert len(reopened) == 101
+    assert reopened.keys[row] == "place 100"
+    assert distance < 0.01
+    assert np.array_equal(reopened.vectors, index.vectors)